@@ -12,23 +12,54 @@ from pathlib import Path
 import sys
 sys.path.insert(0, str(Path(__file__).parent))
 
-from config import DATA_DIR, HIGH_PRIORITY_KEYWORDS
+from config import DATA_DIR, HIGH_PRIORITY_KEYWORDS, EVENT_PAGE_SIZE, BACKGROUND_JOBS, BACKGROUND_POLL_SECONDS
 from core.database import (
     init_database, 
-    get_all_facilities, 
-    get_upcoming_events, 
-    get_statistics,
-    get_events,
     load_initial_facilities
 )
-from core.scorer import get_priority_label, get_priority_color, rank_events
-from core.dormant_checker import (
-    get_facility_health_report, 
-    update_all_facility_statuses,
-    get_active_facilities,
-    get_dormant_facilities,
-    get_new_facilities
+from core.scorer import get_priority_label, get_priority_color
+from core.background_jobs import (
+    ACTIVE_STATUSES,
+    launch_background_job,
+    list_background_jobs,
+    cancel_background_job,
+    read_log_tail
 )
+from core.event_query import EventFilter, SORT_DATE_ASC, SORT_DATE_DESC, SORT_SCORE
+from core.calendar_view import month_range, months_html, year_heatmap_html
+from core.app_cache import (
+    cached_statistics,
+    cached_upcoming_events,
+    cached_day_summary,
+    cached_events_on_date,
+    cached_event_page,
+    cached_event_count,
+    cached_event_filter_options,
+    cached_facilities,
+    cached_health_report,
+    cached_job_runs,
+    cached_scheduler_jobs
+)
+
+
+# イベント一覧の並べ替え
+EVENT_SORT_LABELS = {
+    SORT_DATE_ASC: "開催日が近い順",
+    SORT_SCORE: "スコアが高い順",
+    SORT_DATE_DESC: "開催日が新しい順",
+}
+
+
+# バックグラウンド実行の状態の表示
+BACKGROUND_STATUS_LABELS = {
+    "queued": "⏳ 待機中",
+    "running": "▶ 実行中",
+    "success": "✅ 完了",
+    "failed": "✗ 失敗",
+    "skipped": "⏭ スキップ",
+    "cancelled": "⏹ 中止",
+    "interrupted": "⚠ 中断",
+}
 
 
 # ページ設定
@@ -117,16 +148,15 @@ def main():
         
         page = st.radio(
             "ページ選択",
-            ["📊 ダッシュボード", "📅 イベント一覧", "📆 カレンダー", "🏢 施設管理", "📈 分析", "📖 Tips"]
+            ["📊 ダッシュボード", "📅 イベント一覧", "📆 カレンダー", "🏢 施設管理", "📈 分析", "🛠 運用", "📖 Tips"]
         )
         
         st.markdown("---")
         st.caption(f"最終更新: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
         
-        if st.button("🔄 データ更新", use_container_width=True):
-            with st.spinner("更新中..."):
-                update_all_facility_statuses()
-            st.success("更新完了!")
+        if st.button("🔄 データ更新", use_container_width=True, help="全施設の休眠チェックをバックグラウンドで実行します"):
+            start_background_job("dormant_check")
+        show_background_jobs()
     
     # ページ表示
     if page == "📊 ダッシュボード":
@@ -139,10 +169,54 @@ def main():
         show_facilities()
     elif page == "📈 分析":
         show_analytics()
+    elif page == "🛠 運用":
+        show_operations()
     elif page == "📖 Tips":
         show_tips()
 
 
+def start_background_job(job: str):
+    """ジョブをバックグラウンドで開始（実行中なら知らせるだけ）"""
+    label = BACKGROUND_JOBS[job]["label"]
+    job_id = launch_background_job(job)
+    if job_id is None:
+        st.warning(f"{label} はすでに実行中です")
+    else:
+        st.toast(f"{label} を開始しました（実行#{job_id}）")
+
+
+@st.fragment(run_every=BACKGROUND_POLL_SECONDS)
+def show_background_jobs():
+    """実行中のバックグラウンドジョブ（この部分だけを一定間隔で読み直し、ページ本体は再実行しない）"""
+    jobs = list_background_jobs(limit=10)
+    active = [job for job in jobs if job['status'] in ACTIVE_STATUSES]
+    
+    # 終了したジョブがあればページ全体を読み直して結果を反映
+    active_ids = {job['id'] for job in active}
+    finished = st.session_state.get('background_job_ids', set()) - active_ids
+    st.session_state.background_job_ids = active_ids
+    if finished:
+        st.rerun()
+    
+    for job in active:
+        label = BACKGROUND_JOBS.get(job['job'], {}).get('label', job['job'])
+        done, total = job['progress_done'] or 0, job['progress_total']
+        if total:
+            st.progress(min(done / total, 1.0), text=f"{label} {done}/{total}")
+        else:
+            st.caption(f"▶ {label} 実行中（{done}件）")
+        if job['message']:
+            st.caption(job['message'])
+        if st.button("⏹ 中止", key=f"cancel_job_{job['id']}"):
+            cancel_background_job(job['id'])
+    
+    last = next((job for job in jobs if job['status'] not in ACTIVE_STATUSES), None)
+    if last and not active:
+        label = BACKGROUND_JOBS.get(last['job'], {}).get('label', last['job'])
+        st.caption(f"前回: {label} {BACKGROUND_STATUS_LABELS.get(last['status'], last['status'])}"
+                   f"（{(last['finished_at'] or '')[5:16].replace('T', ' ')}）")
+
+
 def show_dashboard():
     """ダッシュボード表示"""
     st.markdown('<h1 class="main-header">📊 ダッシュボード</h1>', unsafe_allow_html=True)
@@ -151,7 +225,7 @@ def show_dashboard():
     # 統計カード
     col1, col2, col3, col4 = st.columns(4)
     
-    stats = get_statistics()
+    stats = cached_statistics()
     facility_stats = stats.get('facility_stats', {})
     
     with col1:
@@ -171,8 +245,7 @@ def show_dashboard():
     # 今後のおすすめイベント
     st.subheader("🔥 今後のおすすめイベント（高プライオリティ）")
     
-    events = get_upcoming_events(days=30, min_score=50)
-    ranked_events = rank_events(events) if events else []
+    ranked_events = cached_upcoming_events(days=30, min_score=50)
     
     if ranked_events:
         for event in ranked_events[:10]:
@@ -212,139 +285,154 @@ def show_dashboard():
 
 
 def show_events():
-    """イベント一覧表示"""
+    """イベント一覧表示（絞り込み・並べ替えはSQL、1ページずつ取得）"""
     st.markdown('<h1 class="main-header">📅 イベント一覧</h1>', unsafe_allow_html=True)
     
+    options = cached_event_filter_options()
+    
     # フィルター
-    col1, col2, col3 = st.columns(3)
+    text = st.text_input("🔍 キーワード", placeholder="タイトル・会場で検索（例: ピッチ、補助金）")
     
+    col1, col2, col3, col4 = st.columns(4)
     with col1:
-        min_score = st.slider("最低スコア", 0, 100, 30, step=10)
+        sources = st.multiselect("ソース", options['sources'])
+    with col2:
+        prefectures = st.multiselect("都道府県", options['prefectures'])
+    with col3:
+        event_types = st.multiselect("種別", options['event_types'])
+    with col4:
+        online = st.radio("開催形式", ["すべて", "オンライン", "会場"], horizontal=True)
     
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        min_score = st.slider("最低スコア", 0, 100, 30, step=10)
     with col2:
         from_date = st.date_input("開始日", datetime.now())
-    
     with col3:
         to_date = st.date_input("終了日", datetime.now() + timedelta(days=60))
+    with col4:
+        sort = st.selectbox("並べ替え", list(EVENT_SORT_LABELS), format_func=EVENT_SORT_LABELS.get)
     
-    # イベント取得
-    events = get_events(
+    condition = EventFilter(
         from_date=from_date.strftime("%Y-%m-%d"),
         to_date=to_date.strftime("%Y-%m-%d"),
-        min_score=min_score
+        min_score=min_score,
+        sources=tuple(sources),
+        prefectures=tuple(prefectures),
+        event_types=tuple(event_types),
+        online={"オンライン": True, "会場": False}.get(online),
+        text=text.strip(),
     )
     
-    ranked_events = rank_events(events) if events else []
+    # 条件が変わったら先頭ページに戻る（cursors は各ページの開始位置）
+    if st.session_state.get('event_grid_key') != (condition, sort):
+        st.session_state.event_grid_key = (condition, sort)
+        st.session_state.event_cursors = [None]
+    cursors = st.session_state.event_cursors
     
-    if ranked_events:
-        # DataFrameで表示
-        df = pd.DataFrame([
-            {
-                "優先度": e.get('priority_label', '-'),
-                "スコア": e.get('priority_score', 0),
-                "タイトル": e.get('title', '')[:40],
-                "日付": e.get('event_date', ''),
-                "場所": e.get('venue', '')[:20],
-                "ソース": e.get('source', ''),
-                "URL": e.get('source_url', '')
-            }
-            for e in ranked_events
-        ])
-        
-        st.dataframe(
-            df,
-            column_config={
-                "URL": st.column_config.LinkColumn("リンク")
-            },
-            hide_index=True,
-            use_container_width=True
-        )
-    else:
+    total = cached_event_count(condition)
+    page = cached_event_page(condition, sort, cursors[-1], EVENT_PAGE_SIZE)
+    
+    if not page.rows:
         st.info("条件に一致するイベントがありません。")
+        return
+    
+    first = (len(cursors) - 1) * EVENT_PAGE_SIZE + 1
+    st.caption(f"全 {total:,} 件中 {first:,}〜{first + len(page.rows) - 1:,} 件目")
+    
+    df = pd.DataFrame([
+        {
+            "優先度": get_priority_label(e.get('priority_score') or 0),
+            "スコア": e.get('priority_score', 0),
+            "タイトル": (e.get('title') or '')[:40],
+            "日付": e.get('event_date', ''),
+            "場所": (e.get('venue') or '')[:20],
+            "都道府県": e.get('prefecture') or '',
+            "形式": "オンライン" if e.get('is_online') else "会場",
+            "ソース": e.get('source', ''),
+            "URL": e.get('source_url', '')
+        }
+        for e in page.rows
+    ])
+    
+    st.dataframe(
+        df,
+        column_config={
+            "URL": st.column_config.LinkColumn("リンク")
+        },
+        hide_index=True,
+        use_container_width=True
+    )
+    
+    # ページ送り
+    col1, col2, col3 = st.columns([1, 1, 6])
+    with col1:
+        if st.button("← 前へ", disabled=len(cursors) == 1, use_container_width=True):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        if st.button("次へ →", disabled=page.next_cursor is None, use_container_width=True):
+            cursors.append(page.next_cursor)
+            st.rerun()
 
 
 def show_calendar():
-    """カレンダー表示"""
+    """カレンダー表示（日別の集計から1つのHTMLとして描画し、日の詳細は選んだときだけ取得）"""
     st.markdown('<h1 class="main-header">📆 イベントカレンダー</h1>', unsafe_allow_html=True)
     
-    import calendar
+    today = datetime.now()
     
-    # 月選択
-    col1, col2 = st.columns(2)
+    # 表示範囲
+    col1, col2, col3, col4 = st.columns(4)
     with col1:
-        year = st.selectbox("年", [2025, 2026, 2027], index=1)
+        view = st.radio("表示", ["月", "3か月", "6か月", "年間ヒートマップ"], horizontal=True)
     with col2:
-        month = st.selectbox("月", list(range(1, 13)), index=datetime.now().month - 1)
-    
-    # イベント取得
-    first_day = f"{year}-{month:02d}-01"
-    last_day = f"{year}-{month:02d}-{calendar.monthrange(year, month)[1]:02d}"
-    
-    events = get_events(from_date=first_day, to_date=last_day)
-    
-    # 日付ごとにグループ化
-    events_by_date = {}
-    for event in events:
-        date = event.get('event_date', '')
-        if date not in events_by_date:
-            events_by_date[date] = []
-        events_by_date[date].append(event)
-    
-    st.markdown(f"### {year}年{month}月")
-    
-    # カレンダーグリッド表示
-    cal = calendar.Calendar(firstweekday=6)  # 日曜始まり
-    weeks = cal.monthdayscalendar(year, month)
-    
-    # ヘッダー
-    header_cols = st.columns(7)
-    for i, day_name in enumerate(['日', '月', '火', '水', '木', '金', '土']):
-        color = '#ff6b6b' if i == 0 else '#4dabf7' if i == 6 else '#333'
-        header_cols[i].markdown(f"<div style='text-align:center;color:{color};font-weight:bold;'>{day_name}</div>", unsafe_allow_html=True)
-    
-    # カレンダー本体
-    for week in weeks:
-        cols = st.columns(7)
-        for i, day in enumerate(week):
-            if day == 0:
-                cols[i].markdown("")
-            else:
-                date_str = f"{year}-{month:02d}-{day:02d}"
-                day_events = events_by_date.get(date_str, [])
-                
-                # スタイル決定
-                if day_events:
-                    bg_color = '#e8f5e9'
-                    badge = f"<span style='background:#4caf50;color:white;border-radius:4px;padding:2px 6px;font-size:0.8em;'>{len(day_events)}</span>"
-                else:
-                    bg_color = '#fff'
-                    badge = ""
-                
-                with cols[i]:
-                    st.markdown(f"""
-                    <div style='background:{bg_color};padding:8px;border-radius:8px;min-height:60px;border:1px solid #eee;'>
-                        <strong>{day}</strong> {badge}
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # イベントがあればポップオーバー的に表示
-                    if day_events:
-                        with st.expander(f"📅 {len(day_events)}件", expanded=False):
-                            for ev in day_events[:3]:
-                                st.caption(f"• {ev.get('title', '')[:30]}")
+        year = st.selectbox("年", list(range(today.year - 1, today.year + 2)), index=1)
+    with col3:
+        month = st.selectbox("月", list(range(1, 13)), index=today.month - 1, disabled=view == "年間ヒートマップ")
+    with col4:
+        min_score = st.slider("最低スコア", 0, 100, 0, step=10)
+    
+    if view == "年間ヒートマップ":
+        first_day, last_day = f"{year}-01-01", f"{year}-12-31"
+        days = cached_day_summary(first_day, last_day, min_score)
+        st.markdown(f"### {year}年")
+        st.markdown(year_heatmap_html(year, days), unsafe_allow_html=True)
+    else:
+        months = {"月": 1, "3か月": 3, "6か月": 6}[view]
+        first_day, last_day = month_range(year, month, months)
+        days = cached_day_summary(first_day, last_day, min_score)
+        st.markdown(months_html(year, month, months, days, today.date()), unsafe_allow_html=True)
+    
+    total = sum(summary.count for summary in days.values())
+    st.caption(f"{first_day} 〜 {last_day}: {total:,}件（{len(days)}日）")
     
     st.markdown("---")
     
-    # 今月のイベントリスト
-    st.subheader("📋 今月のイベント一覧")
-    if events:
-        for event in sorted(events, key=lambda x: x.get('event_date', ''))[:20]:
-            st.markdown(f"""
-            **{event.get('event_date', '')}** - {event.get('title', '')}  
-            🏢 {event.get('venue', '会場不明')[:30]}
-            """)
-    else:
-        st.info("今月のイベントはありません。")
+    # 選んだ日のイベント
+    st.subheader("📋 日別のイベント")
+    if not days:
+        st.info("この期間のイベントはありません。")
+        return
+    
+    event_days = sorted(days)
+    default_day = next((d for d in event_days if d >= today.strftime("%Y-%m-%d")), event_days[0])
+    selected = st.selectbox(
+        "日付",
+        event_days,
+        index=event_days.index(default_day),
+        format_func=lambda d: f"{d}（{days[d].count}件・最高 {days[d].max_score}点）"
+    )
+    
+    for event in cached_events_on_date(selected, min_score):
+        st.markdown(f"""
+        **{get_priority_label(event.get('priority_score') or 0)}** [{event.get('priority_score', 0)}点] **{event.get('title', '')}**  
+        🏢 {(event.get('venue') or event.get('facility_name') or '会場不明')[:30]} | 📍 {event.get('prefecture') or ''}
+        """)
+        if event.get('source_url'):
+            st.caption(event['source_url'])
+    if days[selected].count > EVENT_PAGE_SIZE:
+        st.caption(f"※ スコアの高い {EVENT_PAGE_SIZE} 件を表示しています")
 
 
 def show_facilities():
@@ -355,12 +443,11 @@ def show_facilities():
     col1, col2, col3 = st.columns([2, 2, 4])
     with col1:
         if st.button("🔍 活動状況をチェック", use_container_width=True):
-            st.info("活動チェックはコマンドラインから実行してください:")
-            st.code("python3 scripts/check_all_facilities.py", language="bash")
-            st.caption("※ 122施設のチェックに約5〜10分かかります")
+            start_background_job("facility_check")
+        st.caption("※ 122施設のチェックに約5〜10分かかります。バックグラウンドで実行されるため、進捗はサイドバーで確認できます")
     
     with col2:
-        total_count = len(get_all_facilities())
+        total_count = len(cached_facilities())
         st.metric("登録施設数", total_count)
     
     st.markdown("---")
@@ -368,7 +455,7 @@ def show_facilities():
     tab1, tab2, tab3 = st.tabs(["✅ アクティブ", "💤 休眠", "🆕 新規（監視中）"])
     
     with tab1:
-        facilities = get_active_facilities()
+        facilities = cached_facilities("active")
         if facilities:
             df = pd.DataFrame(facilities)
             # ソースカラムを追加
@@ -381,7 +468,7 @@ def show_facilities():
             st.info("アクティブな施設はありません。")
     
     with tab2:
-        facilities = get_dormant_facilities()
+        facilities = cached_facilities("dormant")
         if facilities:
             st.warning("⚠️ 以下の施設は2ヶ月以上イベントがありません")
             
@@ -399,7 +486,7 @@ def show_facilities():
             st.success("休眠施設はありません！")
     
     with tab3:
-        facilities = get_new_facilities()
+        facilities = cached_facilities("new")
         if facilities:
             st.info("🔍 以下の施設は監視中です（イベント実績なし）")
             df = pd.DataFrame(facilities)
@@ -414,7 +501,7 @@ def show_analytics():
     """分析表示"""
     st.markdown('<h1 class="main-header">📈 分析</h1>', unsafe_allow_html=True)
     
-    report = get_facility_health_report()
+    report = cached_health_report()
     
     col1, col2 = st.columns(2)
     
@@ -438,6 +525,101 @@ def show_analytics():
             st.dataframe(pref_df, hide_index=True)
 
 
+def show_operations():
+    """運用（ジョブの実行履歴）表示"""
+    st.markdown('<h1 class="main-header">🛠 運用</h1>', unsafe_allow_html=True)
+    st.markdown('<p class="sub-header">ジョブごとの所要時間・取得件数・HTTPリクエスト数の推移</p>', unsafe_allow_html=True)
+    
+    # バックグラウンド実行
+    st.subheader("バックグラウンド実行")
+    cols = st.columns(len(BACKGROUND_JOBS))
+    for col, (job, spec) in zip(cols, BACKGROUND_JOBS.items()):
+        with col:
+            if st.button(spec["label"], key=f"launch_{job}", use_container_width=True):
+                start_background_job(job)
+    
+    background_jobs = list_background_jobs(limit=20)
+    if background_jobs:
+        st.dataframe(pd.DataFrame([
+            {"実行": job['id'], "ジョブ": BACKGROUND_JOBS.get(job['job'], {}).get('label', job['job']),
+             "状態": BACKGROUND_STATUS_LABELS.get(job['status'], job['status']),
+             "進捗": f"{job['progress_done'] or 0}/{job['progress_total'] or '?'}",
+             "開始": (job['started_at'] or job['created_at'])[:16], "終了": (job['finished_at'] or '')[:16],
+             "メッセージ": job['error'] or job['message'] or ''}
+            for job in background_jobs
+        ]), hide_index=True, use_container_width=True)
+        with st.expander(f"実行#{background_jobs[0]['id']} の出力"):
+            st.code(read_log_tail(background_jobs[0]) or "（出力なし）", language="text")
+    
+    days = st.selectbox("期間", [7, 30, 90, 365], index=1, format_func=lambda d: f"直近{d}日")
+    runs = cached_job_runs(since=(datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d"), limit=5000)
+    
+    if not runs:
+        st.info("まだジョブの実行履歴がありません。")
+        return
+    
+    df = pd.DataFrame(runs)
+    df['started_at'] = pd.to_datetime(df['started_at'])
+    finished = df[df['finished_at'].notna()]
+    
+    # ジョブごとの最新の実行
+    st.subheader("最新の実行")
+    jobs = cached_scheduler_jobs()
+    latest = df.sort_values('started_at').groupby('job').tail(1)
+    cols = st.columns(max(len(latest), 1))
+    for col, (_, run) in zip(cols, latest.iterrows()):
+        mark = {"success": "✅", "running": "▶", "failed": "✗"}.get(run['status'], "⏱")
+        duration = f"{run['duration_seconds']:.0f}秒" if pd.notna(run['duration_seconds']) else "実行中"
+        with col:
+            st.metric(f"{mark} {run['job']}", duration, help=f"開始 {run['started_at']:%m/%d %H:%M}")
+            scheduled = jobs.get(run['job'], {}).get('last_status')
+            if scheduled:
+                st.caption(f"スケジューラー: {scheduled}")
+    
+    # 所要時間の推移
+    st.subheader("所要時間の推移（秒）")
+    if not finished.empty:
+        durations = finished.pivot_table(index='started_at', columns='job', values='duration_seconds', aggfunc='max')
+        st.line_chart(durations)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("HTTPリクエスト数")
+        if not finished.empty:
+            st.line_chart(finished.pivot_table(index='started_at', columns='job', values='http_requests', aggfunc='sum'))
+    
+    with col2:
+        st.subheader("キャッシュヒット率（%）")
+        lookups = finished['cache_hits'] + finished['cache_misses']
+        hit_rate = finished.assign(hit_rate=(finished['cache_hits'] / lookups.where(lookups > 0) * 100).round(1))
+        if hit_rate['hit_rate'].notna().any():
+            st.line_chart(hit_rate.pivot_table(index='started_at', columns='job', values='hit_rate', aggfunc='mean'))
+        else:
+            st.caption("キャッシュを参照した実行がありません。")
+    
+    # ソース別件数
+    st.subheader("ソース別件数")
+    source_rows = [
+        {"開始": run['started_at'][:16], "ジョブ": run['job'], "ソース": source,
+         "取得": counts['fetched'], "書き込み": counts['inserted'], "変更": counts['changed'], "エラー": counts['errors']}
+        for run in runs for source, counts in run['sources'].items()
+    ]
+    if source_rows:
+        st.dataframe(pd.DataFrame(source_rows), hide_index=True, use_container_width=True)
+    
+    # 失敗した実行
+    failures = df[df['error'].notna()]
+    if not failures.empty:
+        st.subheader("⚠ エラー")
+        st.dataframe(
+            failures[['started_at', 'job', 'status', 'error']].rename(
+                columns={'started_at': '開始', 'job': 'ジョブ', 'status': '状態', 'error': 'エラー'}),
+            hide_index=True,
+            use_container_width=True
+        )
+
+
 def show_tips():
     """行政書士向けTips表示"""
     st.markdown('<h1 class="main-header">📖 行政書士向けTips</h1>', unsafe_allow_html=True)
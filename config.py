@@ -61,3 +61,165 @@ REGIONS = {
     "shikoku": ["徳島県", "香川県", "愛媛県", "高知県"],
     "kyushu": ["福岡県", "佐賀県", "長崎県", "熊本県", "大分県", "宮崎県", "鹿児島県", "沖縄県"],
 }
+
+# 収集パイプライン設定
+PIPELINE_QUEUE_SIZE = 500       # ステージ間キューの上限（メモリ使用量の上限）
+PIPELINE_WORKERS = 4            # 正規化・スコアリングのワーカー数
+PIPELINE_BATCH_SIZE = 200       # DB書き込みのバッチサイズ
+PIPELINE_FLUSH_SECONDS = 2.0    # バッチが溜まらなくても書き込む間隔
+PIPELINE_REPORT_SECONDS = 10    # メトリクス表示間隔
+
+# ブラウザ（Playwright）設定
+BROWSER_USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
+BROWSER_POOL_SIZE = 4               # 同時に貸し出すページ数
+BROWSER_CONTEXT_MAX_USES = 20       # コンテキストを作り直すまでの利用回数（メモリ肥大化防止）
+BROWSER_HEALTH_CHECK_SECONDS = 60   # ブラウザ死活確認の間隔
+
+# 施設チェックの並行実行設定
+CHECK_CONCURRENCY = 6                # 全体の同時チェック数
+CHECK_PER_DOMAIN_CONCURRENCY = 1     # 同一ホストへの同時アクセス数
+CHECK_CRAWL_DELAY_SECONDS = 2.0      # 同一ホストへのアクセス間隔
+CHECK_DEADLINE_SECONDS = 120         # 1施設あたりの制限時間
+
+# HTTP優先取得（Playwrightはフォールバック）設定
+HTTP_TIMEOUT_SECONDS = 15
+HTTP_POOL_MAXSIZE = 16            # ホストごとの保持コネクション数
+HTTP_MAX_BYTES = 5 * 1024 * 1024  # 1ページの最大取得サイズ
+FETCH_TIER_REPROBE_DAYS = 30      # ブラウザ必須と判定した施設もこの日数ごとにHTTPを再試行
+
+# ブラウザ描画の軽量化設定
+BROWSER_BLOCK_RESOURCES = True
+BROWSER_BLOCKED_RESOURCE_TYPES = ["image", "font", "stylesheet", "media", "imageset", "texttrack"]
+BROWSER_BLOCKED_DOMAINS = [
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "googlesyndication.com", "connect.facebook.net", "analytics.twitter.com",
+    "hotjar.com", "clarity.ms", "yahoo-net.jp", "ads-twitter.com",
+]
+BROWSER_SETTLE_SELECTOR = "time, article, [class*='event'], [class*='news']"  # 本文の描画完了とみなす要素
+BROWSER_SETTLE_TIMEOUT_MS = 3000   # 描画待ちの上限（ネットワークアイドル・セレクタの早い方）
+
+# クロールキャッシュ（ページ変更検知）設定
+SIMHASH_CHANGE_THRESHOLD = 3   # SimHashのハミング距離がこれ以下なら「実質変更なし」
+
+# 適応的再チェック設定（施設ごとに次回チェック時刻を決める）
+RECHECK_MIN_HOURS = 12          # 最短間隔（休眠判定の境界付近）
+RECHECK_MAX_DAYS = 30           # 最長間隔（長期休眠・先のイベントが確定している施設）
+RECHECK_DEFAULT_DAYS = 3        # 日付が取れない施設の間隔（従来の3日ごと）
+RECHECK_RETRY_HOURS = 6         # 失敗時の再試行間隔（連続失敗で倍々に延ばす）
+RECHECK_TICK_MINUTES = 30       # スケジューラーの確認間隔
+RECHECK_BATCH_LIMIT = 50        # 1回の確認で処理する最大施設数
+
+# RSS/Atom・サイトマップ設定
+FEED_REDISCOVER_DAYS = 30        # フィードの場所（なしも含む）を再探索するまでの日数
+FEED_MAX_BYTES = 2 * 1024 * 1024 # フィード・サイトマップの最大取得サイズ
+FEED_COMMON_PATHS = ["/feed", "/rss", "/feed.xml", "/rss.xml", "/atom.xml", "/index.xml", "/?feed=rss2"]
+
+# 再開可能なバッチ実行設定
+WORK_MAX_ATTEMPTS = 3             # 1件あたりの最大試行回数（超えたら失敗のまま残す）
+WORK_ITEM_STALE_SECONDS = 600     # この時間を超えて実行中のままの項目は異常終了とみなし再取得可能にする
+WORK_RESUME_MAX_AGE_HOURS = 24    # これより前に始まった未完了の実行は再開せず、新しい実行に置き換える
+
+# マルチプロセス分割巡回設定
+SHARD_PROCESSES = 0               # ワーカープロセス数（0でCPUコア数）
+SHARD_STRATEGY = "hash"           # "hash": ホスト名のハッシュで分割（同一ホストは同じワーカー） / "region": REGIONS単位
+DB_BUSY_TIMEOUT_SECONDS = 30      # 複数プロセスから書き込む際のロック待ち上限
+
+# URL事前判定（ブラウザ起動前にコンテンツ種別を確認）設定
+PREFLIGHT_PROBE_BYTES = 16 * 1024   # 判定のために範囲GETで読む先頭バイト数
+PREFLIGHT_TTL_DAYS = 7              # HTML・PDFと判定したURLを再判定するまでの日数
+PREFLIGHT_BACKOFF_DAYS = 1          # 404/410・駐車ドメイン・接続不可のURLを再確認するまでの初回間隔（連続で倍々）
+PREFLIGHT_BACKOFF_MAX_DAYS = 60     # 同上の上限
+PARKED_DOMAIN_MARKERS = [
+    "this domain is for sale", "domain is parked", "buy this domain", "このドメインは販売",
+    "このドメインは売り物", "sedoparking", "parkingcrew", "bodis.com",
+    "このドメインはお名前.comで取得されています", "このドメインはムームードメインで取得されています",
+    "domain has expired", "このドメインは有効期限が切れています",
+]
+
+# PDF（お知らせ・募集要項などのPDFを施設URLとして登録しているケース）設定
+PDF_MAX_BYTES = 10 * 1024 * 1024    # 取得するPDFの最大サイズ
+PDF_MAX_PAGES = 5                   # テキストを抽出する先頭ページ数（pypdfがある場合）
+
+# ブラウザ内での日付候補収集（本文全体の代わりに日付と文脈だけを受け取る）設定
+HARVEST_MIN_CANDIDATES = 3      # これ未満しか見つからなければ本文全体（innerText）にフォールバック
+HARVEST_MAX_CANDIDATES = 200    # 1ページから受け取る候補数の上限
+HARVEST_CONTEXT_CHARS = 120     # 候補ごとの文脈の最大文字数
+HARVEST_LIST_SELECTOR = (
+    "[class*='news'], [class*='event'], [class*='topic'], [class*='info'], [class*='post'], "
+    "[id*='news'], [id*='event'], [id*='topic'], [id*='info'], article, main"
+)
+
+# 施設サイト巡回（優先度付きフロンティア）設定
+CRAWL_PAGE_BUDGET = 6            # 1施設あたりの最大取得ページ数（トップページを含む）
+CRAWL_MAX_DEPTH = 2              # トップページからたどる最大階層
+CRAWL_EXTERNAL_BUDGET = 2        # 1施設あたりに確認する外部プラットフォームのページ数
+CRAWL_MIN_LINK_SCORE = 2.0       # これ未満のリンクはたどらない
+CRAWL_LINK_KEYWORDS = {          # リンク文字列・URLに含まれるキーワードの重み
+    "イベント": 3, "event": 3, "セミナー": 3, "seminar": 3, "ワークショップ": 3, "workshop": 3,
+    "ピッチ": 3, "pitch": 3, "交流会": 3, "meetup": 3,
+    "お知らせ": 2, "news": 2, "ニュース": 2, "新着": 2, "topics": 2, "トピックス": 2, "カレンダー": 2, "calendar": 2,
+    "活動報告": 1.5, "report": 1, "activity": 1, "schedule": 1, "スケジュール": 1, "archive": 1, "blog": 1, "ブログ": 1,
+}
+CRAWL_NEGATIVE_KEYWORDS = [      # たどらないページ（問い合わせ・規約・採用・ログイン等）
+    "contact", "お問い合わせ", "privacy", "プライバシー", "policy", "規約", "recruit", "採用",
+    "login", "ログイン", "signup", "access", "アクセス", "sitemap", "サイトマップ", "faq", "company", "会社概要",
+]
+CRAWL_TRACKING_PARAMS = ["utm_source", "utm_medium", "utm_campaign", "utm_term", "utm_content",
+                         "fbclid", "gclid", "yclid", "mc_cid", "mc_eid", "_ga"]
+
+# イベントデータの静的エクスポート（NDJSON・分割gzip）設定
+EXPORT_MAX_OPEN_SHARDS = 64       # 同時に開いておく分割ファイル数（超えたら古いものから閉じて追記で開き直す）
+EXPORT_GZIP_LEVEL = 6
+
+# 定期実行スケジューラー（core.async_scheduler）設定
+SCHEDULER_MAX_CONCURRENT_JOBS = 2     # 同時に実行するジョブ数の上限
+SCHEDULER_CATCHUP_HOURS = 24          # 停止中に逃した実行をこの時間以内なら起動時に1回だけ実行
+# ジョブ定義
+#   target: "モジュール:関数"（同期関数はスレッドで、async関数はイベントループ上で実行）
+#   at: "HH:MM"（毎日）/ weekday: 0=月〜6=日（at と併用で毎週）/ every_minutes: 一定間隔
+#   timeout_minutes: 制限時間 / jitter_seconds: 開始時刻をずらす最大秒数 / catch_up: 逃した実行を取り戻すか
+SCHEDULER_JOBS = {
+    "daily_collection": {
+        "target": "core.scheduler:run_daily_job", "at": "06:00",
+        "timeout_minutes": 120, "jitter_seconds": 300, "catch_up": True,
+    },
+    "daily_demotion": {
+        "target": "core.scheduler:run_daily_demotion", "at": "00:10",
+        "timeout_minutes": 10, "jitter_seconds": 60, "catch_up": True,
+    },
+    "facility_sweep": {
+        "target": "scripts.scheduler:run_recheck_sweep", "every_minutes": RECHECK_TICK_MINUTES,
+        "timeout_minutes": 60, "jitter_seconds": 60, "catch_up": False,
+    },
+}
+
+# ジョブのリース（同じジョブを複数プロセスで同時に実行しない）設定
+LEASE_TTL_SECONDS = 300           # ハートビートが途絶えてからリースを他プロセスが引き継げるまでの時間
+LEASE_HEARTBEAT_SECONDS = 60      # ハートビート（期限延長）の間隔
+
+# 実行メトリクス（job_runs・Prometheusテキスト形式のエンドポイント）設定
+METRICS_HOST = "127.0.0.1"        # ローカルからのみ参照する
+METRICS_PORT = 9464               # スケジューラー起動時に /metrics を公開するポート（0で無効）
+METRICS_PREFIX = "eventagg"       # メトリクス名の接頭辞
+METRICS_RETENTION_DAYS = 400      # job_runs に残す期間（運用ページの最長の表示期間365日より長く。これより前の記録は削除）
+
+# イベント一覧（絞り込み・ページング）設定
+EVENT_PAGE_SIZE = 50              # 1ページの表示件数
+EVENT_TEXT_MIN_FTS_CHARS = 3      # これ未満の検索語は全文検索インデックス（trigram）を使わず LIKE で探す
+
+# 画面からのバックグラウンド実行（core.background_jobs）設定
+#   label: 画面の表示名 / target: "モジュール:関数" / lease: 実行中かどうかを判定するリース名（core.job_lease）
+BACKGROUND_JOBS = {
+    "event_collection": {
+        "label": "📥 イベント収集", "target": "core.scheduler:run_full_collection", "lease": "event_collection",
+    },
+    "dormant_check": {
+        "label": "💤 休眠チェック", "target": "core.scheduler:run_dormant_check", "lease": "dormant_check",
+    },
+    "facility_check": {
+        "label": "🔍 施設の活動チェック", "target": "scripts.check_all_facilities:run_activity_check", "lease": "facility_check",
+    },
+}
+BACKGROUND_JOB_LOG_DIR = DATA_DIR / "logs"    # ワーカープロセスの標準出力の保存先
+BACKGROUND_PROGRESS_INTERVAL_SECONDS = 1.0    # 進捗ファイルを書き換える最短間隔
+BACKGROUND_POLL_SECONDS = 3                   # 画面が実行状況を読み直す間隔
@@ -1,139 +1,209 @@
 """
 簡易版 活動状況判定モジュール（APIキー不要）
-Playwrightでサイトを巡回し、正規表現で日付を抽出して2ヶ月ルールを適用する。
+サイトを巡回し、正規表現で日付を抽出して2ヶ月ルールを適用する。
+RSS/Atom・サイトマップがあればそれだけで判定し、なければHTTPで取得、
+日付が取れない・SPAのサイトのみPlaywrightで描画する。
+取得前にURLの種別を確認し（core.preflight）、PDFは本文・メタデータから日付を取り、
+削除済み・駐車ドメインのURLは取得しない。
 """
 
-import re
 import asyncio
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 from urllib.parse import urljoin
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from core.date_extractor import DateExtractor
+from core.concurrent_runner import ConcurrentRunner
+from core.crawl_cache import CrawlCache, CacheResult
+from core.tiered_fetcher import (
+    TIER_FEED, TIER_HTTP, TIER_BROWSER, TIER_PDF, fetch_static_async, preferred_tier_async, remember_tier_async
+)
+from core.feed_discovery import facility_feed_entries_async
+from core.preflight import KIND_PDF, preflight_async
+from core.pdf_extractor import fetch_pdf_async
+from core.date_harvester import page_text
+
 # Playwright（非同期）
-try:
-    from playwright.async_api import async_playwright
-    PLAYWRIGHT_AVAILABLE = True
-except ImportError:
-    PLAYWRIGHT_AVAILABLE = False
+from core.browser_pool import BrowserPool, TrafficCounter, pool_scope, settle, PLAYWRIGHT_AVAILABLE
+if not PLAYWRIGHT_AVAILABLE:
     print("⚠ Playwrightがインストールされていません。pip install playwright && playwright install を実行してください。")
 
 
-# 日付パターン（日本語サイト向け）
-DATE_PATTERNS = [
-    # 2026年2月4日, 2026年02月04日
-    r'(\d{4})年\s*(\d{1,2})月\s*(\d{1,2})日',
-    # 2026/2/4, 2026/02/04
-    r'(\d{4})/(\d{1,2})/(\d{1,2})',
-    # 2026-02-04
-    r'(\d{4})-(\d{2})-(\d{2})',
-    # 2026.02.04
-    r'(\d{4})\.(\d{2})\.(\d{2})',
-    # R8.2.4 (令和8年)
-    r'R(\d{1,2})\.(\d{1,2})\.(\d{1,2})',
-    # 令和8年2月4日
-    r'令和(\d{1,2})年\s*(\d{1,2})月\s*(\d{1,2})日',
-]
-
 # ニュース・イベントページを示すキーワード
 NEWS_KEYWORDS = ['news', 'topic', 'event', 'seminar', 'お知らせ', 'ニュース', 'イベント', '新着', '活動報告']
 
 
-def parse_date(match: tuple, pattern_index: int) -> Optional[datetime]:
-    """マッチした日付をdatetimeに変換"""
-    try:
-        if pattern_index in [4, 5]:  # 令和パターン
-            year = 2018 + int(match[0])  # 令和1年 = 2019年
-        else:
-            year = int(match[0])
-        month = int(match[1])
-        day = int(match[2])
-        
-        if 1 <= month <= 12 and 1 <= day <= 31 and 2020 <= year <= 2030:
-            return datetime(year, month, day)
-    except:
-        pass
+def find_news_url(links: List[Dict]) -> Optional[str]:
+    """リンク一覧からニュース・イベントページらしいURLを探す"""
+    for link in links:
+        for kw in NEWS_KEYWORDS:
+            if kw in link['text'] or kw in link['href'].lower():
+                return link['href']
     return None
 
 
-def extract_dates_from_text(text: str) -> List[datetime]:
-    """テキストから全ての日付を抽出"""
-    dates = []
-    
-    for i, pattern in enumerate(DATE_PATTERNS):
-        matches = re.findall(pattern, text)
-        for match in matches:
-            parsed = parse_date(match, i)
-            if parsed:
-                dates.append(parsed)
-    
-    return dates
-
-
 class SimpleActivityChecker:
     """APIキー不要の簡易版活動判定クラス"""
     
-    def __init__(self, threshold_days: int = 60):
+    def __init__(
+        self,
+        threshold_days: int = 60,
+        reference_date: Optional[datetime] = None,
+        browser_pool: Optional[BrowserPool] = None,
+    ):
         self.threshold_days = threshold_days
-        self.threshold_date = datetime.now() - timedelta(days=threshold_days)
+        self.browser_pool = browser_pool
+        self.reference_date = reference_date or datetime.now()
+        self.threshold_date = self.reference_date - timedelta(days=threshold_days)
+        # 簡易版は誤検出を避けるため年付きの日付と相対表記のみ扱う
+        self.date_extractor = DateExtractor(self.reference_date, allow_month_day=False)
+        self.crawl_caches = {tier: CrawlCache(f"simple:{tier}") for tier in (TIER_HTTP, TIER_BROWSER)}
     
-    async def get_page_content(self, url: str) -> Optional[str]:
-        """ページのテキストコンテンツを取得"""
+    async def get_static_content(self, url: str, traffic: TrafficCounter) -> Optional[str]:
+        """HTTP GETでページのテキストを取得（SPAと判定した場合はNone）"""
+        page = await fetch_static_async(url)
+        if page is None:
+            return None
+        traffic.add(page.size)
+        if page.client_rendered:
+            return None
+        
+        text = page.text
+        news_url = find_news_url(page.links)
+        if news_url and news_url != url:
+            news_page = await fetch_static_async(news_url)
+            if news_page is not None:
+                traffic.add(news_page.size)
+                if news_page.text and not news_page.client_rendered:
+                    text = news_page.text
+        return text
+    
+    async def get_page_content(self, url: str, traffic: TrafficCounter) -> Optional[str]:
+        """ブラウザでページのテキストコンテンツを取得"""
         if not PLAYWRIGHT_AVAILABLE:
             return None
-            
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            try:
-                context = await browser.new_context(
-                    user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
-                )
-                page = await context.new_page()
-                
-                await page.goto(url, timeout=30000, wait_until='domcontentloaded')
-                
-                # ニュースページへのリンクを探す
-                links = await page.evaluate("""
-                    Array.from(document.querySelectorAll('a')).map(a => ({
-                        text: a.innerText.toLowerCase(),
-                        href: a.href
-                    }))
-                """)
-                
-                news_url = None
-                for link in links:
-                    for kw in NEWS_KEYWORDS:
-                        if kw in link['text'] or kw in link['href'].lower():
-                            news_url = link['href']
-                            break
-                    if news_url:
-                        break
-                
-                # ニュースページがあれば移動
-                if news_url and news_url != url:
-                    try:
-                        await page.goto(news_url, timeout=30000, wait_until='domcontentloaded')
-                    except:
-                        pass
-                
-                # テキスト取得
-                text = await page.evaluate("document.body.innerText")
-                return text
-                
-            except Exception as e:
-                print(f"  ✗ アクセスエラー: {e}")
-                return None
-            finally:
-                await browser.close()
+        
+        async with pool_scope(self) as pool:
+            async with pool.page(traffic) as page:
+                try:
+                    await page.goto(url, timeout=30000, wait_until='domcontentloaded')
+                    await settle(page)
+                    
+                    # ニュースページへのリンクを探す
+                    links = await page.evaluate("""
+                        Array.from(document.querySelectorAll('a')).map(a => ({
+                            text: a.innerText.toLowerCase(),
+                            href: a.href
+                        }))
+                    """)
+                    
+                    news_url = find_news_url(links)
+                    
+                    # ニュースページがあれば移動
+                    if news_url and news_url != url:
+                        try:
+                            await page.goto(news_url, timeout=30000, wait_until='domcontentloaded')
+                            await settle(page)
+                        except:
+                            pass
+                    
+                    # 日付候補と文脈だけを取得（少なければ本文全体）
+                    text, _ = await page_text(page)
+                    return text
+                    
+                except Exception as e:
+                    print(f"  ✗ アクセスエラー: {e}")
+                    return None
+    
+    async def extract_dates_cached(self, url: str, content: str, tier: str,
+                                   facility_id: Optional[str] = None) -> CacheResult:
+        """
+        前回から変わっていないページは日付抽出をスキップ（日付はYYYY-MM-DDのリスト）
+
+        指紋の計算・抽出・DB参照はスレッドで行い、並行中の他の施設のチェックを止めない。
+        """
+        def extract(text: str) -> tuple:
+            dates = sorted({d.strftime('%Y-%m-%d') for d in self.date_extractor.extract_dates(text)}, reverse=True)
+            return dates, (dates[0] if dates else None)
+        
+        return await asyncio.to_thread(self.crawl_caches[tier].extract, url, content, extract, facility_id)
     
-    async def check_facility(self, url: str, facility_name: str = "") -> Dict[str, Any]:
+    async def fetch_pdf_content(self, url: str, traffic: TrafficCounter) -> tuple:
+        """
+        PDFの本文とメタデータから日付を抽出
+        
+        本文に日付がなければ文書の作成日・更新日を最新の更新日とみなす。
+        """
+        document = await fetch_pdf_async(url, traffic)
+        if document is None:
+            return None, None, TIER_PDF
+        dates = sorted({d.strftime('%Y-%m-%d') for d in self.date_extractor.extract_dates(document.text)}, reverse=True)
+        if not dates:
+            dates = [d.strftime('%Y-%m-%d') for d in document.metadata_dates]
+        content = document.text or "\n".join(f"{d} PDF更新" for d in dates)
+        return content, CacheResult(dates, dates[0] if dates else None, None, None, None, False), TIER_PDF
+    
+    async def fetch_content(self, url: str, facility_id: Optional[str] = None,
+                            traffic: Optional[TrafficCounter] = None) -> tuple:
+        """
+        フィード → HTTP → ブラウザの順にページを取得して日付を抽出
+        
+        Returns:
+            (テキスト, 日付の抽出結果, 採用した取得方式)
+        """
+        traffic = traffic if traffic is not None else TrafficCounter()
+        
+        # フィード・サイトマップがあればそれだけで判定（ページ巡回不要）
+        feed_type, entries = await facility_feed_entries_async(facility_id, url, traffic)
+        if entries:
+            dates = sorted({e.date.strftime('%Y-%m-%d') for e in entries}, reverse=True)
+            content = "\n".join(f"{e.date:%Y-%m-%d} {e.title}" for e in entries)
+            return content, CacheResult(dates, dates[0], None, None, None, False), TIER_FEED
+        
+        tried_http = await preferred_tier_async(facility_id) == TIER_HTTP
+        if tried_http:
+            content = await self.get_static_content(url, traffic)
+            if content:
+                extracted = await self.extract_dates_cached(url, content, TIER_HTTP, facility_id)
+                if extracted.items:
+                    await remember_tier_async(facility_id, TIER_HTTP)
+                    return content, extracted, TIER_HTTP
+        
+        # 静的取得で日付が見つからない・SPAの場合のみブラウザで描画
+        content = await self.get_page_content(url, traffic)
+        extracted = await self.extract_dates_cached(url, content, TIER_BROWSER, facility_id) if content else None
+        if extracted and extracted.items:
+            await remember_tier_async(facility_id, TIER_BROWSER, http_probed=tried_http)
+        return content, extracted, TIER_BROWSER
+    
+    async def check_facility(self, url: str, facility_name: str = "", facility_id: Optional[str] = None) -> Dict[str, Any]:
         """施設の活動状況を判定"""
         print(f"  チェック中: {facility_name or url}")
         
-        content = await self.get_page_content(url)
+        traffic = TrafficCounter()
+        target = await preflight_async(url, traffic)
+        if target.skip:
+            print(f"    ⏭ 取得スキップ: {target.describe()}")
+            return {
+                "facility_name": facility_name,
+                "url": url,
+                "status": "unknown",
+                "reason": target.describe(),
+                "latest_date": None,
+                "fetch_failed": True,
+                "url_kind": target.kind,
+                "bytes_transferred": traffic.bytes
+            }
+        
+        if target.kind == KIND_PDF:
+            content, extracted, tier = await self.fetch_pdf_content(target.target_url, traffic)
+        else:
+            content, extracted, tier = await self.fetch_content(target.target_url, facility_id, traffic)
+        print(f"    📦 転送量: {traffic.summary()}")
         
         if not content:
             return {
@@ -141,53 +211,86 @@ class SimpleActivityChecker:
                 "url": url,
                 "status": "unknown",
                 "reason": "ページにアクセスできませんでした",
-                "latest_date": None
+                "latest_date": None,
+                "fetch_failed": True,
+                "bytes_transferred": traffic.bytes
             }
         
-        # 日付抽出
-        dates = extract_dates_from_text(content)
+        # ページ更新の有無（前回から変わっていなければ抽出結果は前回の値）
+        page_signal = {
+            "page_changed": extracted.changed,
+            "page_last_changed": extracted.last_changed,
+        }
         
-        if not dates:
+        if not extracted.latest_date:
             return {
                 "facility_name": facility_name,
                 "url": url,
                 "status": "unknown",
                 "reason": "日付情報が見つかりませんでした",
-                "latest_date": None
+                "latest_date": None,
+                "fetch_tier": tier,
+                "bytes_transferred": traffic.bytes,
+                **page_signal
             }
         
-        # 最新日付を取得
-        latest_date = max(dates)
+        # 最新日付で2ヶ月ルールを判定
+        latest_date = datetime.strptime(extracted.latest_date, '%Y-%m-%d')
         is_active = latest_date >= self.threshold_date
         
         return {
             "facility_name": facility_name,
             "url": url,
             "status": "active" if is_active else "dormant",
-            "reason": f"最新更新: {latest_date.strftime('%Y-%m-%d')}",
-            "latest_date": latest_date.strftime('%Y-%m-%d'),
-            "is_active": is_active
+            "reason": f"最新更新: {extracted.latest_date}",
+            "latest_date": extracted.latest_date,
+            "is_active": is_active,
+            "fetch_tier": tier,
+            "bytes_transferred": traffic.bytes,
+            **page_signal
         }
     
-    async def check_all_facilities(self, facilities: List[Dict]) -> List[Dict]:
-        """全施設をチェック"""
-        results = []
-        
-        for facility in facilities:
-            url = facility.get('website')
-            name = facility.get('name', '')
-            
-            if not url:
-                continue
-                
-            result = await self.check_facility(url, name)
+    def _failure_result(self, facility: Dict, error: Exception) -> Dict[str, Any]:
+        """制限時間超過・例外時の結果"""
+        return {
+            "facility_name": facility.get('name', ''),
+            "url": facility.get('website'),
+            "status": "unknown",
+            "reason": "制限時間を超過しました" if isinstance(error, asyncio.TimeoutError) else f"エラー: {error}",
+            "latest_date": None,
+            "fetch_failed": True,
+            "facility_id": facility.get('id'),
+        }
+    
+    async def check_all_facilities(
+        self,
+        facilities: List[Dict],
+        runner: Optional[ConcurrentRunner] = None,
+        on_result: Optional[Callable[[int, Dict, Dict], None]] = None,
+        claim: Optional[Callable[[Dict], bool]] = None,
+    ) -> List[Dict]:
+        """
+        全施設を並行チェック（ブラウザは全施設で共有）
+        
+        同一ホストへのアクセスは runner のホスト単位の同時実行数・間隔で制限される。
+        on_result には入力順で (番号, 施設, 結果) が通知される。
+        claim を渡すとチェック開始直前に呼び、Falseなら（他のワーカーが処理中）status='skipped' とする。
+        """
+        targets = [f for f in facilities if f.get('website')]
+        runner = runner or ConcurrentRunner()
+        
+        async def check(facility: Dict) -> Dict[str, Any]:
+            if claim and not claim(facility):
+                return {"facility_name": facility.get('name', ''), "url": facility['website'],
+                        "status": "skipped", "facility_id": facility.get('id')}
+            result = await self.check_facility(facility['website'], facility.get('name', ''), facility.get('id'))
             result['facility_id'] = facility.get('id')
-            results.append(result)
-            
-            # レート制限（1秒待機）
-            await asyncio.sleep(1)
+            return result
         
-        return results
+        async with pool_scope(self, size=runner.concurrency):
+            return await runner.run(
+                targets, check, on_result=on_result, on_timeout=self._failure_result
+            )
 
 
 async def main():
@@ -1,192 +1,81 @@
 """
 高度版 活動判定エージェント
-- 1階層以上のページ遷移
+- URLの種別を事前判定（PDFは本文・メタデータから抽出、削除済み・駐車ドメインは取得しない）
+- RSS/Atomフィードがあればフィードのみで判定
+- 優先度付きフロンティアで有望なページから最大2階層までたどる（core.crawl_frontier）
+  （HTTP取得を優先し、SPA・取得失敗時のみPlaywright）
 - Peatix/connpass/Facebookイベント検知
-- 和暦・相対表記の日付正規化
+- 和暦・相対表記の日付正規化（core.date_extractor）
 - イベントリストの構造化出力
 """
 
-import re
 import asyncio
 import json
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
-from urllib.parse import urljoin, urlparse
+from typing import Callable, Dict, List, Optional, Any
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-try:
-    from playwright.async_api import async_playwright, Page
-    PLAYWRIGHT_AVAILABLE = True
-except ImportError:
-    PLAYWRIGHT_AVAILABLE = False
+from config import DORMANT_THRESHOLD_DAYS
+from core.date_extractor import DateExtractor
+from core.concurrent_runner import ConcurrentRunner, facility_url
+from core.crawl_cache import CrawlCache
+from core.crawl_frontier import CrawlFrontier
+from core.tiered_fetcher import (
+    TIER_FEED, TIER_HTTP, TIER_BROWSER, TIER_PDF, fetch_static_async, preferred_tier_async, remember_tier_async
+)
+from core.feed_discovery import FEED_RSS, FEED_ATOM, facility_feed_entries_async
+from core.preflight import KIND_PDF, preflight_async
+from core.pdf_extractor import fetch_pdf_async
+from core.date_harvester import page_text
 
-
-# 現在の基準日
-CURRENT_DATE = datetime(2026, 2, 4)
-THRESHOLD_DATE = CURRENT_DATE - timedelta(days=60)  # 2025-12-04
-
-# 日付パターン（優先度順）
-DATE_PATTERNS = [
-    # 2026年2月4日, 2026年02月04日
-    (r'(\d{4})年\s*(\d{1,2})月\s*(\d{1,2})日', 'ymd'),
-    # 2026/2/4, 2026/02/04
-    (r'(\d{4})/(\d{1,2})/(\d{1,2})', 'ymd'),
-    # 2026-02-04
-    (r'(\d{4})-(\d{2})-(\d{2})', 'ymd'),
-    # 2026.02.04
-    (r'(\d{4})\.(\d{1,2})\.(\d{1,2})', 'ymd'),
-    # 令和8年2月4日
-    (r'令和(\d{1,2})年\s*(\d{1,2})月\s*(\d{1,2})日', 'reiwa'),
-    # R8.2.4
-    (r'R(\d{1,2})\.(\d{1,2})\.(\d{1,2})', 'reiwa'),
-    # 2/4（今年と仮定）
-    (r'(\d{1,2})/(\d{1,2})(?!\d)', 'md'),
-    # 2月4日
-    (r'(\d{1,2})月\s*(\d{1,2})日', 'md'),
-]
-
-# イベントページを示すキーワード
-EVENT_KEYWORDS = [
-    'event', 'events', 'イベント', 'セミナー', 'seminar',
-    'news', 'お知らせ', 'ニュース', '新着', 'topics',
-    'calendar', 'カレンダー', 'schedule', 'スケジュール',
-    'report', '活動報告', 'activity'
-]
-
-# 外部プラットフォームのドメイン
-EXTERNAL_PLATFORMS = {
-    'peatix.com': 'Peatix',
-    'connpass.com': 'connpass',
-    'facebook.com/events': 'Facebook',
-    'fb.me': 'Facebook',
-    'eventbrite.com': 'Eventbrite',
-    'doorkeeper.jp': 'Doorkeeper'
-}
-
-
-def parse_date_string(text: str) -> Optional[datetime]:
-    """様々な形式の日付文字列をdatetimeに変換"""
-    text = text.strip()
-    
-    for pattern, date_type in DATE_PATTERNS:
-        match = re.search(pattern, text)
-        if match:
-            groups = match.groups()
-            try:
-                if date_type == 'ymd':
-                    year, month, day = int(groups[0]), int(groups[1]), int(groups[2])
-                elif date_type == 'reiwa':
-                    # 令和変換（令和1年 = 2019年）
-                    year = 2018 + int(groups[0])
-                    month, day = int(groups[1]), int(groups[2])
-                elif date_type == 'md':
-                    # 月日のみの場合、今年または来年と仮定
-                    month, day = int(groups[0]), int(groups[1])
-                    year = CURRENT_DATE.year
-                    # 月が現在より前なら来年の可能性
-                    if month < CURRENT_DATE.month:
-                        year += 1
-                else:
-                    continue
-                
-                if 1 <= month <= 12 and 1 <= day <= 31:
-                    return datetime(year, month, day)
-            except:
-                continue
-    
-    return None
-
-
-def extract_all_dates(text: str) -> List[Tuple[datetime, str]]:
-    """テキストから全ての日付とその周辺文脈を抽出"""
-    results = []
-    lines = text.split('\n')
-    
-    for line in lines:
-        for pattern, date_type in DATE_PATTERNS:
-            for match in re.finditer(pattern, line):
-                parsed = parse_date_string(match.group())
-                if parsed and 2020 <= parsed.year <= 2030:
-                    # 周辺のテキスト（タイトル候補）を取得
-                    context = line.strip()[:100]
-                    results.append((parsed, context))
-    
-    # 重複除去して日付降順でソート
-    seen = set()
-    unique_results = []
-    for date, context in sorted(results, key=lambda x: x[0], reverse=True):
-        date_str = date.strftime('%Y-%m-%d')
-        if date_str not in seen:
-            seen.add(date_str)
-            unique_results.append((date, context))
-    
-    return unique_results
+from core.browser_pool import BrowserPool, TrafficCounter, pool_scope, settle, PLAYWRIGHT_AVAILABLE
+if PLAYWRIGHT_AVAILABLE:
+    from playwright.async_api import Page
+else:
+    Page = Any
 
 
 class AdvancedActivityChecker:
     """高度版活動判定エージェント"""
     
-    def __init__(self):
-        self.current_date = CURRENT_DATE
-        self.threshold_date = THRESHOLD_DATE
+    def __init__(
+        self,
+        reference_date: Optional[datetime] = None,
+        threshold_days: int = DORMANT_THRESHOLD_DAYS,
+        browser_pool: Optional[BrowserPool] = None,
+    ):
+        self.browser_pool = browser_pool
+        self.current_date = reference_date or datetime.now()
+        self.threshold_date = self.current_date - timedelta(days=threshold_days)
+        self.date_extractor = DateExtractor(self.current_date)
+        self.crawl_caches = {tier: CrawlCache(f"advanced:{tier}") for tier in (TIER_HTTP, TIER_BROWSER)}
     
-    async def find_event_links(self, page: Page, base_url: str) -> List[Dict]:
-        """イベント関連ページへのリンクを探索"""
-        links = await page.evaluate("""
+    async def find_links(self, page: Page) -> List[Dict]:
+        """ページ内のリンクを取得（スコア付けはフロンティアで行う）"""
+        return await page.evaluate("""
             Array.from(document.querySelectorAll('a')).map(a => ({
                 text: a.innerText.trim().toLowerCase(),
                 href: a.href,
                 ariaLabel: a.getAttribute('aria-label') || ''
             })).filter(a => a.href && a.href.startsWith('http'))
         """)
-        
-        event_links = []
-        external_links = []
-        
-        for link in links:
-            href = link['href']
-            text = link['text']
-            
-            # 外部プラットフォームチェック
-            for domain, platform in EXTERNAL_PLATFORMS.items():
-                if domain in href:
-                    external_links.append({
-                        'url': href,
-                        'platform': platform,
-                        'text': text
-                    })
-                    break
-            
-            # 内部イベントページチェック
-            for keyword in EVENT_KEYWORDS:
-                if keyword in text or keyword in href.lower():
-                    if urlparse(href).netloc == urlparse(base_url).netloc:
-                        event_links.append({
-                            'url': href,
-                            'text': text,
-                            'type': 'internal'
-                        })
-                    break
-        
-        return event_links, external_links
     
     async def get_page_text(self, page: Page) -> str:
-        """ページからテキストを抽出"""
-        await page.evaluate("""
-            document.querySelectorAll('script, style, nav, footer, header').forEach(el => el.remove());
-        """)
-        return await page.evaluate("document.body.innerText")
-    
-    async def extract_events_from_page(self, page: Page, url: str) -> List[Dict]:
-        """ページからイベント情報を抽出"""
-        text = await self.get_page_text(page)
-        dates_with_context = extract_all_dates(text)
+        """
+        ページから日付候補と文脈を抽出（候補が少なければナビ等を除いた本文全体）
         
+        DOMは変更しないため、抽出後にリンク探索してもナビゲーションのリンクが残る。
+        """
+        text, _ = await page_text(page, drop_layout=True)
+        return text
+    
+    def events_from_text(self, text: str, url: str, limit: int = 20) -> List[Dict]:
+        """本文テキストからイベント情報を抽出"""
         events = []
-        for date, context in dates_with_context[:20]:  # 最新20件まで
+        for date, context in self.date_extractor.extract_dates_with_context(text)[:limit]:
             # イベントタイトルを推測
             title = context.split('|')[0].split('【')[0].strip()[:50]
             if not title or len(title) < 3:
@@ -200,31 +89,201 @@ class AdvancedActivityChecker:
         
         return events
     
-    async def check_external_platform(self, page: Page, platform_url: str, platform_name: str) -> List[Dict]:
+    def platform_events_from_text(self, text: str, platform_url: str, platform_name: str) -> List[Dict]:
+        """外部プラットフォームの本文テキストからイベント情報を抽出"""
+        events = []
+        for date, context in self.date_extractor.extract_dates_with_context(text)[:10]:
+            events.append({
+                'title': context[:50] if context else f"{platform_name}イベント",
+                'date': date.strftime('%Y-%m-%d'),
+                'link': platform_url,
+                'platform': platform_name
+            })
+        return events
+    
+    async def cached_events(self, result: Dict[str, Any], url: str, text: str, tier: str,
+                            platform_name: Optional[str] = None) -> List[Dict]:
+        """
+        前回から変わっていないページはイベント抽出をスキップし、ページ更新の有無を結果に記録
+        （指紋の計算・抽出・DB参照はスレッドで行う）
+        """
+        def extract(body: str) -> tuple:
+            if platform_name:
+                events = self.platform_events_from_text(body, url, platform_name)
+            else:
+                events = self.events_from_text(body, url)
+            return events, max((e['date'] for e in events), default=None)
+        
+        cached = await asyncio.to_thread(self.crawl_caches[tier].extract, url, text, extract, result.get("facility_id"))
+        if cached.changed:
+            result["page_changed"] = True
+        elif cached.changed is False and result.get("page_changed") is None:
+            result["page_changed"] = False
+        if cached.last_changed and cached.last_changed > (result.get("page_last_changed") or ""):
+            result["page_last_changed"] = cached.last_changed
+        return cached.items
+    
+    async def extract_events_from_page(self, page: Page, url: str, result: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """ページからイベント情報を抽出（resultを渡すとクロールキャッシュを使う）"""
+        text = await self.get_page_text(page)
+        if result is not None:
+            return await self.cached_events(result, url, text, TIER_BROWSER)
+        return self.events_from_text(text, url)
+    
+    async def check_external_platform(self, page: Page, platform_url: str, platform_name: str,
+                                      result: Optional[Dict[str, Any]] = None) -> List[Dict]:
         """外部プラットフォームからイベント情報を取得"""
         try:
             await page.goto(platform_url, timeout=30000, wait_until='domcontentloaded')
-            await asyncio.sleep(2)  # 動的コンテンツ待ち
+            await settle(page)  # 動的コンテンツ待ち（ネットワークアイドル or 要素出現まで）
             
             text = await self.get_page_text(page)
-            dates_with_context = extract_all_dates(text)
-            
-            events = []
-            for date, context in dates_with_context[:10]:
-                events.append({
-                    'title': context[:50] if context else f"{platform_name}イベント",
-                    'date': date.strftime('%Y-%m-%d'),
-                    'link': platform_url,
-                    'platform': platform_name
-                })
-            
-            return events
+            if result is not None:
+                return await self.cached_events(result, platform_url, text, TIER_BROWSER, platform_name)
+            return self.platform_events_from_text(text, platform_url, platform_name)
         except Exception as e:
             print(f"    ⚠ {platform_name}アクセスエラー: {e}")
             return []
     
-    async def check_facility(self, url: str, facility_name: str = "") -> Dict[str, Any]:
-        """施設の活動状況を詳細に判定"""
+    async def _read_feed(self, url: str, facility_id: Optional[str], result: Dict[str, Any],
+                         traffic: TrafficCounter) -> bool:
+        """
+        RSS/Atomフィードの記事をイベントリストとして取得
+        
+        サイトマップはタイトルがないためイベントリストには使わず、ページ巡回に回す。
+        """
+        feed_type, entries = await facility_feed_entries_async(facility_id, url, traffic)
+        if feed_type not in (FEED_RSS, FEED_ATOM) or not entries:
+            return False
+        
+        print(f"  📰 フィード: {len(entries)}件")
+        for entry in entries[:20]:
+            result["event_list"].append({
+                'title': (entry.title or f"お知らせ ({entry.date:%Y-%m-%d})")[:50],
+                'date': entry.date.strftime('%Y-%m-%d'),
+                'link': entry.link or url
+            })
+        return True
+    
+    async def _read_pdf(self, url: str, result: Dict[str, Any], traffic: TrafficCounter):
+        """PDFの本文からイベントを抽出（本文に日付がなければ文書の作成日・更新日を使う）"""
+        print(f"  📑 PDF: {url}")
+        document = await fetch_pdf_async(url, traffic)
+        if document is None:
+            result["error"] = "PDFを取得できませんでした"
+            return
+        result["checked_pages"].append(url)
+        events = self.events_from_text(document.text, url) if document.text else []
+        if not events:
+            events = [{
+                'title': f"PDF資料の更新 ({date:%Y-%m-%d})",
+                'date': date.strftime('%Y-%m-%d'),
+                'link': url
+            } for date in document.metadata_dates[:1]]
+        result["event_list"].extend(events)
+    
+    async def _crawl_static(self, url: str, result: Dict[str, Any], traffic: TrafficCounter) -> bool:
+        """
+        HTTP GETでトップページから有望なページを最大2階層 → 外部プラットフォームを巡回
+        
+        Returns:
+            静的取得で判定できた場合True（SPA・取得失敗時はFalseでブラウザへ）
+        """
+        print(f"  📄 トップページ (HTTP): {url}")
+        top = await fetch_static_async(url, drop_layout=True)
+        if top is None:
+            return False
+        traffic.add(top.size)
+        if top.client_rendered:
+            return False
+        
+        frontier = CrawlFrontier(url)
+        frontier.mark_seen(top.final_url)
+        events = await self.cached_events(result, url, top.text, TIER_HTTP)
+        checked_pages = [url]
+        frontier.add_links(top.links, depth=1, parent_events=len(events))
+        
+        while (item := frontier.pop()) is not None:
+            print(f"  📄 ページ (HTTP, 階層{item.depth}, スコア{item.score:.1f}): {item.url[:60]}...")
+            page = await fetch_static_async(item.url, drop_layout=True)
+            if page is None:
+                continue
+            traffic.add(page.size)
+            frontier.mark_seen(page.final_url)
+            page_events = await self.cached_events(result, item.url, page.text, TIER_HTTP)
+            events.extend(page_events)
+            checked_pages.append(item.url)
+            frontier.add_links(page.links, depth=item.depth + 1, parent_events=len(page_events))
+        
+        for ext_link in frontier.external_links():
+            print(f"  🔗 外部プラットフォーム (HTTP): {ext_link['platform']}")
+            page = await fetch_static_async(ext_link['url'], drop_layout=True)
+            if page is None:
+                continue
+            traffic.add(page.size)
+            if page.client_rendered:
+                continue
+            events.extend(await self.cached_events(result, ext_link['url'], page.text, TIER_HTTP, ext_link['platform']))
+        
+        if not events:
+            return False
+        
+        result["event_list"].extend(events)
+        result["checked_pages"] = checked_pages
+        result["external_platforms"] = frontier.platforms
+        return True
+    
+    async def _crawl_browser(self, url: str, result: Dict[str, Any], traffic: TrafficCounter):
+        """Playwrightでトップページから有望なページを最大2階層 → 外部プラットフォームを巡回"""
+        async with pool_scope(self) as pool:
+            async with pool.page(traffic) as page:
+                try:
+                    # 1. トップページアクセス
+                    print(f"  📄 トップページ: {url}")
+                    await page.goto(url, timeout=30000, wait_until='domcontentloaded')
+                    await settle(page)
+                    
+                    frontier = CrawlFrontier(url)
+                    frontier.mark_seen(page.url)
+                    
+                    # トップページからイベント抽出
+                    top_events = await self.extract_events_from_page(page, url, result)
+                    result["event_list"].extend(top_events)
+                    result["checked_pages"].append(url)
+                    
+                    # 2. リンクをスコア付けして有望なページから遷移
+                    frontier.add_links(await self.find_links(page), depth=1, parent_events=len(top_events))
+                    while (item := frontier.pop()) is not None:
+                        print(f"  📄 ページ (階層{item.depth}, スコア{item.score:.1f}): {item.url[:60]}...")
+                        try:
+                            await page.goto(item.url, timeout=30000, wait_until='domcontentloaded')
+                            await settle(page)
+                            frontier.mark_seen(page.url)
+                            
+                            page_events = await self.extract_events_from_page(page, item.url, result)
+                            result["event_list"].extend(page_events)
+                            result["checked_pages"].append(item.url)
+                            if item.depth < frontier.max_depth:
+                                frontier.add_links(await self.find_links(page), depth=item.depth + 1,
+                                                   parent_events=len(page_events))
+                        except Exception:
+                            continue
+                    result["external_platforms"] = frontier.platforms
+                    
+                    # 3. 外部プラットフォームをチェック
+                    for ext_link in frontier.external_links():
+                        print(f"  🔗 外部プラットフォーム: {ext_link['platform']}")
+                        ext_events = await self.check_external_platform(
+                            page, ext_link['url'], ext_link['platform'], result
+                        )
+                        result["event_list"].extend(ext_events)
+                    
+                except Exception as e:
+                    print(f"  ✗ エラー: {e}")
+                    result["error"] = str(e)
+    
+    async def check_facility(self, url: str, facility_name: str = "", facility_id: Optional[str] = None) -> Dict[str, Any]:
+        """施設の活動状況を詳細に判定（HTTPで判定できなければブラウザで再巡回）"""
         print(f"\n🔍 調査開始: {facility_name or url}")
         
         result = {
@@ -234,65 +293,45 @@ class AdvancedActivityChecker:
             "last_event_date": None,
             "event_list": [],
             "external_platforms": [],
-            "checked_pages": []
+            "checked_pages": [],
+            "fetch_tier": TIER_HTTP,
+            "facility_id": facility_id,
+            "page_changed": None,
+            "page_last_changed": None
         }
         
-        if not PLAYWRIGHT_AVAILABLE:
+        traffic = TrafficCounter()
+        target = await preflight_async(url, traffic)
+        result["url_kind"] = target.kind
+        if target.skip:
+            print(f"  ⏭ 取得スキップ: {target.describe()}")
+            result["status"] = "unknown"
+            result["error"] = target.describe()
+            result["fetch_failed"] = True
+            result["bytes_transferred"] = traffic.bytes
+            return result
+        
+        crawl_url = target.target_url
+        tier = await preferred_tier_async(facility_id)
+        if target.kind == KIND_PDF:
+            result["fetch_tier"] = TIER_PDF
+            await self._read_pdf(crawl_url, result, traffic)
+        elif await self._read_feed(crawl_url, facility_id, result, traffic):
+            result["fetch_tier"] = TIER_FEED
+        elif tier == TIER_HTTP and await self._crawl_static(crawl_url, result, traffic):
+            await remember_tier_async(facility_id, TIER_HTTP)
+        elif not PLAYWRIGHT_AVAILABLE:
             result["error"] = "Playwrightがインストールされていません"
+            result["bytes_transferred"] = traffic.bytes
             return result
+        else:
+            result["fetch_tier"] = TIER_BROWSER
+            await self._crawl_browser(crawl_url, result, traffic)
+            if result["event_list"]:
+                await remember_tier_async(facility_id, TIER_BROWSER, http_probed=tier == TIER_HTTP)
         
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
-            )
-            page = await context.new_page()
-            
-            try:
-                # 1. トップページアクセス
-                print(f"  📄 トップページ: {url}")
-                await page.goto(url, timeout=30000, wait_until='domcontentloaded')
-                await asyncio.sleep(1)
-                
-                # トップページからイベント抽出
-                top_events = await self.extract_events_from_page(page, url)
-                result["event_list"].extend(top_events)
-                result["checked_pages"].append(url)
-                
-                # 2. イベントページリンクと外部プラットフォームを探索
-                event_links, external_links = await self.find_event_links(page, url)
-                result["external_platforms"] = [e['platform'] for e in external_links]
-                
-                # 3. 内部イベントページを1階層遷移
-                for link in event_links[:3]:  # 最大3ページ
-                    link_url = link['url']
-                    if link_url in result["checked_pages"]:
-                        continue
-                    
-                    print(f"  📄 イベントページ: {link_url[:60]}...")
-                    try:
-                        await page.goto(link_url, timeout=30000, wait_until='domcontentloaded')
-                        await asyncio.sleep(1)
-                        
-                        page_events = await self.extract_events_from_page(page, link_url)
-                        result["event_list"].extend(page_events)
-                        result["checked_pages"].append(link_url)
-                    except:
-                        continue
-                
-                # 4. 外部プラットフォームをチェック
-                for ext_link in external_links[:2]:  # 最大2プラットフォーム
-                    print(f"  🔗 外部プラットフォーム: {ext_link['platform']}")
-                    ext_events = await self.check_external_platform(
-                        page, ext_link['url'], ext_link['platform']
-                    )
-                    result["event_list"].extend(ext_events)
-                
-            except Exception as e:
-                print(f"  ✗ エラー: {e}")
-                result["error"] = str(e)
-            finally:
-                await browser.close()
+        result["bytes_transferred"] = traffic.bytes
+        print(f"  📦 転送量: {traffic.summary()}")
         
         # 5. イベントリストを日付でソートし、重複除去
         seen_dates = set()
@@ -319,22 +358,48 @@ class AdvancedActivityChecker:
         
         return result
     
-    async def check_multiple_facilities(self, facilities: List[Dict]) -> List[Dict]:
-        """複数施設を一括チェック"""
-        results = []
+    async def check_multiple_facilities(
+        self,
+        facilities: List[Dict],
+        runner: Optional[ConcurrentRunner] = None,
+        on_result: Optional[Callable[[int, Dict, Dict], None]] = None,
+        claim: Optional[Callable[[Dict], bool]] = None,
+    ) -> List[Dict]:
+        """
+        複数施設を並行チェック（ブラウザは全施設で共有、ホストごとの間隔を守る）
         
-        for facility in facilities:
+        claim を渡すとチェック開始直前に呼び、Falseなら（他のワーカーが処理中）status='skipped' とする。
+        """
+        targets = [f for f in facilities if facility_url(f)]
+        runner = runner or ConcurrentRunner()
+        
+        async def check(facility: Dict) -> Dict[str, Any]:
+            if claim and not claim(facility):
+                return {"facility_name": facility.get('name', ''), "url": facility_url(facility),
+                        "status": "skipped", "facility_id": facility.get('id', '')}
             result = await self.check_facility(
-                facility.get('website', facility.get('url', '')),
-                facility.get('name', '')
+                facility_url(facility),
+                facility.get('name', ''),
+                facility.get('id')
             )
             result['facility_id'] = facility.get('id', '')
-            results.append(result)
-            
-            # レート制限
-            await asyncio.sleep(2)
+            return result
+        
+        def on_timeout(facility: Dict, error: Exception) -> Dict[str, Any]:
+            return {
+                "facility_name": facility.get('name', ''),
+                "url": facility_url(facility),
+                "status": "unknown",
+                "last_event_date": None,
+                "event_list": [],
+                "external_platforms": [],
+                "checked_pages": [],
+                "error": "制限時間を超過しました" if isinstance(error, asyncio.TimeoutError) else str(error),
+                "facility_id": facility.get('id', ''),
+            }
         
-        return results
+        async with pool_scope(self, size=runner.concurrency):
+            return await runner.run(targets, check, on_result=on_result, on_timeout=on_timeout)
 
 
 async def main():
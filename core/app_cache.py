@@ -0,0 +1,199 @@
+"""
+Streamlitアプリのデータキャッシュ
+ウィジェットを操作するたびにスクリプト全体が再実行され、統計・イベント一覧・施設レポートを
+毎回DBから読み直していたのを、DBが実際に書き換えられたときだけ読み直すようにする。
+
+変更の検知には PRAGMA data_version を使う。この値は同じ接続で2回読んだ間に
+他の接続（収集ジョブ・サイドバーの「データ更新」など）がコミットすると変わるため、
+アプリ全体で1本の接続を st.cache_resource で持ち続け、その値をキャッシュのキーに含める。
+値を読むだけなのでテーブルを走査せず、DBの大きさに関係なく一定時間で終わる。
+
+使い方:
+    from core.app_cache import cached_statistics
+    stats = cached_statistics()
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Optional
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streamlit as st
+
+from config import DB_PATH, DB_BUSY_TIMEOUT_SECONDS
+from core.database import (
+    get_all_facilities,
+    get_job_runs,
+    get_scheduler_jobs,
+    get_statistics,
+    get_upcoming_events,
+)
+from core.dormant_checker import get_facility_health_report
+from core.event_query import (
+    EventFilter,
+    EventPage,
+    search_events,
+    count_events,
+    event_filter_options,
+    event_day_summary,
+    events_on_date,
+)
+from core.scorer import rank_events
+
+
+# データ版ごとに残すキャッシュの数（古い版の結果はこの数を超えたら捨てる）
+_MAX_ENTRIES = 64
+
+
+class _VersionWatcher:
+    """PRAGMA data_version を読むための常設接続"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._inode: Optional[int] = None
+        self._generation = 0
+
+    def _open(self):
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        self._inode = os.stat(DB_PATH).st_ino
+        self._generation += 1
+
+    def token(self) -> str:
+        """DBが書き換えられるたびに変わる値"""
+        with self._lock:
+            try:
+                inode = os.stat(DB_PATH).st_ino
+            except FileNotFoundError:
+                return "missing"
+            # DBファイルが作り直された場合は古いファイルを見続けないよう開き直す
+            if self._conn is None or inode != self._inode:
+                self._open()
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            return f"{self._generation}:{version}"
+
+
+@st.cache_resource
+def _watcher() -> _VersionWatcher:
+    return _VersionWatcher()
+
+
+def data_token() -> str:
+    """現在のデータ版（キャッシュのキー）"""
+    return _watcher().token()
+
+
+@st.cache_data(max_entries=_MAX_ENTRIES, show_spinner=False)
+def _statistics(token: str) -> dict:
+    return get_statistics()
+
+
+@st.cache_data(max_entries=_MAX_ENTRIES, show_spinner=False)
+def _ranked_upcoming_events(token: str, days: int, min_score: int) -> list:
+    events = get_upcoming_events(days=days, min_score=min_score)
+    return rank_events(events) if events else []
+
+
+@st.cache_data(max_entries=_MAX_ENTRIES, show_spinner=False)
+def _day_summary(token: str, from_date: str, to_date: str, min_score: Optional[int]) -> dict:
+    return event_day_summary(from_date, to_date, min_score)
+
+
+@st.cache_data(max_entries=_MAX_ENTRIES, show_spinner=False)
+def _events_on_date(token: str, event_date: str, min_score: Optional[int]) -> list:
+    return events_on_date(event_date, min_score)
+
+
+@st.cache_data(max_entries=_MAX_ENTRIES, show_spinner=False)
+def _facilities(token: str, status: Optional[str]) -> list:
+    return get_all_facilities(status=status)
+
+
+@st.cache_data(max_entries=_MAX_ENTRIES, show_spinner=False)
+def _health_report(token: str) -> dict:
+    return get_facility_health_report()
+
+
+@st.cache_data(max_entries=_MAX_ENTRIES, show_spinner=False)
+def _job_runs(token: str, since: Optional[str], limit: int) -> list:
+    return get_job_runs(since=since, limit=limit)
+
+
+@st.cache_data(max_entries=_MAX_ENTRIES, show_spinner=False)
+def _scheduler_jobs(token: str) -> dict:
+    return get_scheduler_jobs()
+
+
+@st.cache_data(max_entries=_MAX_ENTRIES, show_spinner=False)
+def _event_page(token: str, condition: EventFilter, sort: str, after: Optional[tuple], limit: int) -> EventPage:
+    return search_events(condition, sort, after, limit)
+
+
+@st.cache_data(max_entries=_MAX_ENTRIES, show_spinner=False)
+def _event_count(token: str, condition: EventFilter) -> int:
+    return count_events(condition)
+
+
+@st.cache_data(max_entries=_MAX_ENTRIES, show_spinner=False)
+def _event_filter_options(token: str) -> dict:
+    return event_filter_options()
+
+
+def cached_statistics() -> dict:
+    """get_statistics() のキャッシュ"""
+    return _statistics(data_token())
+
+
+def cached_upcoming_events(days: int = 30, min_score: int = 0) -> list:
+    """今後のイベント（rank_events で並べ替え済み）のキャッシュ"""
+    return _ranked_upcoming_events(data_token(), days, min_score)
+
+
+def cached_day_summary(from_date: str, to_date: str, min_score: Optional[int] = None) -> dict:
+    """event_day_summary() のキャッシュ"""
+    return _day_summary(data_token(), from_date, to_date, min_score)
+
+
+def cached_events_on_date(event_date: str, min_score: Optional[int] = None) -> list:
+    """events_on_date() のキャッシュ"""
+    return _events_on_date(data_token(), event_date, min_score)
+
+
+def cached_event_page(condition: EventFilter, sort: str, after: Optional[tuple], limit: int) -> EventPage:
+    """search_events() のキャッシュ"""
+    return _event_page(data_token(), condition, sort, after, limit)
+
+
+def cached_event_count(condition: EventFilter) -> int:
+    """count_events() のキャッシュ"""
+    return _event_count(data_token(), condition)
+
+
+def cached_event_filter_options() -> dict:
+    """event_filter_options() のキャッシュ"""
+    return _event_filter_options(data_token())
+
+
+def cached_facilities(status: Optional[str] = None) -> list:
+    """get_all_facilities() のキャッシュ"""
+    return _facilities(data_token(), status)
+
+
+def cached_health_report() -> dict:
+    """get_facility_health_report() のキャッシュ"""
+    return _health_report(data_token())
+
+
+def cached_job_runs(since: Optional[str] = None, limit: int = 500) -> list:
+    """get_job_runs() のキャッシュ"""
+    return _job_runs(data_token(), since, limit)
+
+
+def cached_scheduler_jobs() -> dict:
+    """get_scheduler_jobs() のキャッシュ"""
+    return _scheduler_jobs(data_token())
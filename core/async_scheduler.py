@@ -0,0 +1,260 @@
+"""
+asyncio 定期実行スケジューラー
+schedule.run_pending() と time.sleep(60) のポーリングで同期的にジョブを実行していた
+core/scheduler.py・scripts/scheduler.py を1つのイベントループにまとめる。
+
+- ジョブ定義は config.SCHEDULER_JOBS から読み込む（毎日 / 毎週 / 一定間隔）
+- 次の実行時刻まで眠り、SCHEDULER_MAX_CONCURRENT_JOBS 件まで同時に実行（長い収集が他のジョブを止めない）
+- 開始時刻は jitter_seconds の範囲でずらす
+- 最終実行を scheduler_jobs テーブルに記録し、停止中に逃した実行は起動時に1回だけ取り戻す
+- timeout_minutes で打ち切る（async関数は取り消し、同期関数はスレッドの終了を待たずに次へ進み、
+  終わるまで同じジョブを重ねて起動しない）
+"""
+
+import asyncio
+import importlib
+import inspect
+import random
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import SCHEDULER_JOBS, SCHEDULER_MAX_CONCURRENT_JOBS, SCHEDULER_CATCHUP_HOURS
+from core.database import get_scheduler_jobs, save_scheduler_job
+
+
+STATUS_RUNNING = "running"
+STATUS_SUCCESS = "success"
+STATUS_FAILED = "failed"
+STATUS_TIMEOUT = "timeout"
+
+_WEEKDAYS = ["月", "火", "水", "木", "金", "土", "日"]
+
+
+class JobSpec(NamedTuple):
+    """定期実行ジョブの定義"""
+    name: str
+    target: str
+    at: Optional[str] = None
+    weekday: Optional[int] = None
+    every_minutes: Optional[float] = None
+    timeout_minutes: Optional[float] = None
+    jitter_seconds: float = 0
+    catch_up: bool = False
+
+    def describe(self) -> str:
+        if self.every_minutes:
+            return f"{self.every_minutes:g}分ごと"
+        if self.weekday is not None:
+            return f"毎週{_WEEKDAYS[self.weekday]}曜 {self.at}"
+        return f"毎日 {self.at}"
+
+
+def load_jobs(definitions: Optional[Dict[str, Dict]] = None, names: Optional[List[str]] = None) -> List[JobSpec]:
+    """設定からジョブ定義を読み込む（names を指定するとそのジョブのみ）"""
+    jobs = []
+    for name, definition in (definitions if definitions is not None else SCHEDULER_JOBS).items():
+        if names and name not in names:
+            continue
+        job = JobSpec(name=name, **definition)
+        if not job.every_minutes and not job.at:
+            raise ValueError(f"ジョブ {name} に at か every_minutes が必要です")
+        jobs.append(job)
+    return jobs
+
+
+def resolve_target(target: str) -> Callable:
+    """"モジュール:関数" 形式の文字列から関数を取得"""
+    module_name, _, func_name = target.partition(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def _at_time(day: datetime, at: str) -> datetime:
+    hour, minute = (int(x) for x in at.split(":"))
+    return day.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+
+def previous_fire(job: JobSpec, now: datetime, last_scheduled: Optional[datetime] = None) -> Optional[datetime]:
+    """now 以前で直近の予定時刻（一定間隔のジョブは前回予定時刻 + 間隔）"""
+    if job.every_minutes:
+        if last_scheduled is None:
+            return None
+        fire = last_scheduled + timedelta(minutes=job.every_minutes)
+        return fire if fire <= now else None
+    fire = _at_time(now, job.at)
+    if job.weekday is not None:
+        fire -= timedelta(days=(now.weekday() - job.weekday) % 7)
+    if fire > now:
+        fire -= timedelta(days=7 if job.weekday is not None else 1)
+    return fire
+
+
+def next_fire(job: JobSpec, after: datetime) -> datetime:
+    """after より後の次の予定時刻"""
+    if job.every_minutes:
+        return after + timedelta(minutes=job.every_minutes)
+    fire = _at_time(after, job.at)
+    if job.weekday is not None:
+        fire += timedelta(days=(job.weekday - after.weekday()) % 7)
+    if fire <= after:
+        fire += timedelta(days=7 if job.weekday is not None else 1)
+    return fire
+
+
+class AsyncScheduler:
+    """
+    定期実行ジョブを1つのイベントループで管理
+
+    使い方:
+        scheduler = AsyncScheduler(load_jobs())
+        asyncio.run(scheduler.run())
+    """
+
+    def __init__(self, jobs: List[JobSpec], max_concurrent: int = SCHEDULER_MAX_CONCURRENT_JOBS,
+                 catchup_hours: float = SCHEDULER_CATCHUP_HOURS):
+        self.jobs = {job.name: job for job in jobs}
+        self.max_concurrent = max_concurrent
+        self.catchup_hours = catchup_hours
+        self.next_at: Dict[str, datetime] = {}
+        self._running: Dict[str, asyncio.Future] = {}
+        self._tasks: set = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    # ------------------------------------------------------------------
+    # 予定の計算
+    # ------------------------------------------------------------------
+
+    def plan(self, now: Optional[datetime] = None) -> Dict[str, datetime]:
+        """
+        各ジョブの次回実行時刻を決める
+
+        逃した実行（前回の予定時刻より後に直近の予定時刻がある）は、catch_up が有効で
+        SCHEDULER_CATCHUP_HOURS 以内なら今すぐ実行する（何回逃しても1回にまとめる）。
+        """
+        now = now or datetime.now()
+        states = get_scheduler_jobs()
+        for job in self.jobs.values():
+            state = states.get(job.name) or {}
+            last = datetime.fromisoformat(state["last_scheduled_at"]) if state.get("last_scheduled_at") else None
+            missed = previous_fire(job, now, last)
+            if job.every_minutes:
+                # 一定間隔のジョブは前回から間隔が空いていれば（初回も）すぐ実行
+                self.next_at[job.name] = now if last is None or missed else next_fire(job, last)
+            elif (job.catch_up and missed and (last is None or missed > last)
+                  and now - missed <= timedelta(hours=self.catchup_hours)):
+                print(f"⏪ {job.name}: {missed:%m/%d %H:%M} の実行を取り戻します")
+                self.next_at[job.name] = now
+            else:
+                self.next_at[job.name] = next_fire(job, now)
+        return dict(self.next_at)
+
+    # ------------------------------------------------------------------
+    # 実行
+    # ------------------------------------------------------------------
+
+    async def run_job(self, job: JobSpec, scheduled_at: Optional[datetime] = None) -> str:
+        """ジョブを1回実行（ジッター → 同時実行数の枠の確保 → 制限時間付きで実行）"""
+        scheduled_at = scheduled_at or datetime.now()
+        save_scheduler_job(job.name, last_scheduled_at=scheduled_at.isoformat())
+        if job.jitter_seconds:
+            await asyncio.sleep(random.uniform(0, job.jitter_seconds))
+
+        semaphore = self._semaphore or asyncio.Semaphore(self.max_concurrent)
+        async with semaphore:
+            started = datetime.now()
+            print(f"\n▶ [{started:%Y-%m-%d %H:%M:%S}] {job.name} 開始")
+            save_scheduler_job(job.name, last_started_at=started.isoformat(), last_status=STATUS_RUNNING, last_error=None)
+
+            func = resolve_target(job.target)
+            is_async = inspect.iscoroutinefunction(func)
+            # 同期ジョブが制限時間を超えてもスレッドは止められないため、終了まで追跡する
+            future = asyncio.ensure_future(func() if is_async else asyncio.to_thread(func))
+            self._running[job.name] = future
+            future.add_done_callback(lambda f: self._release(job.name, f))
+
+            status, error = STATUS_SUCCESS, None
+            timeout = job.timeout_minutes * 60 if job.timeout_minutes else None
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                status, error = STATUS_TIMEOUT, f"{job.timeout_minutes:g}分の制限時間を超過"
+                if is_async:
+                    future.cancel()
+            except asyncio.CancelledError:
+                if is_async:
+                    future.cancel()
+                raise
+            except Exception as e:
+                status, error = STATUS_FAILED, f"{e.__class__.__name__}: {e}"
+                traceback.print_exc()
+
+            finished = datetime.now()
+            save_scheduler_job(job.name, last_finished_at=finished.isoformat(), last_status=status, last_error=error)
+            mark = {STATUS_SUCCESS: "✅", STATUS_TIMEOUT: "⏱"}.get(status, "✗")
+            print(f"{mark} [{finished:%Y-%m-%d %H:%M:%S}] {job.name} {status}"
+                  f"（{(finished - started).total_seconds():.0f}秒）" + (f": {error}" if error else ""))
+            return status
+
+    def _release(self, name: str, owner):
+        """実行中の記録を外す（別の実行に置き換わっていれば何もしない）"""
+        if self._running.get(name) is owner:
+            del self._running[name]
+
+    def _launch(self, job: JobSpec, scheduled_at: datetime):
+        if job.name in self._running:
+            print(f"⏭ {job.name}: 前回の実行が終わっていないためスキップ")
+            return
+        task = asyncio.create_task(self.run_job(job, scheduled_at))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda t: self._release(job.name, t))
+        # 開始待ち（ジッター・同時実行数待ち）の間も重ねて起動しないよう予約しておく
+        self._running[job.name] = task
+
+    def stop(self):
+        """スケジューラーを停止（実行中のジョブは取り消す）"""
+        if self._stop is not None:
+            self._stop.set()
+
+    async def run(self):
+        """スケジューラーを起動（stop() か Ctrl+C まで）"""
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._stop = asyncio.Event()
+        self.plan()
+
+        print(f"📅 ジョブ（同時実行 {self.max_concurrent} 件まで）:")
+        for job in self.jobs.values():
+            print(f"  - {job.name}: {job.describe()}（次回 {self.next_at[job.name]:%m/%d %H:%M}）")
+
+        try:
+            while not self._stop.is_set():
+                now = datetime.now()
+                for name, at in list(self.next_at.items()):
+                    if at <= now:
+                        job = self.jobs[name]
+                        self._launch(job, at)
+                        self.next_at[name] = next_fire(job, max(at, now) if job.every_minutes else now)
+
+                wait = (min(self.next_at.values()) - datetime.now()).total_seconds()
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=max(wait, 0.1))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def run_scheduler(names: Optional[List[str]] = None):
+    """設定のジョブでスケジューラーを起動（ブロッキング）"""
+    scheduler = AsyncScheduler(load_jobs(names=names))
+    try:
+        asyncio.run(scheduler.run())
+    except KeyboardInterrupt:
+        print("\n⏹ スケジューラーを停止しました")
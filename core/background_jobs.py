@@ -0,0 +1,260 @@
+"""
+画面からのバックグラウンド実行モジュール
+Streamlitのボタンから収集・休眠チェック・施設の活動チェックを別プロセスで開始し、
+状態を background_jobs テーブルに書き込む。画面はその行を読むだけなので、
+10分かかる巡回の最中でも再実行（ウィジェット操作）を待たせない。
+
+- 開始: launch_background_job() がワーカープロセスを起動して実行IDを返す（同じジョブが実行中なら開始しない）
+- 進捗: ジョブ本体から report_progress() を呼ぶ（ワーカー以外では何もしない）。
+  進捗はDBではなくログと同じ場所のJSONファイルに書く（DBに書くと PRAGMA data_version が進み、
+  画面のデータキャッシュ（core.app_cache）が毎秒無効になるため）。終了時に最後の進捗だけをDBへ移す
+- 状況: list_background_jobs() は終了していないのにプロセスがいない実行を「中断」にして返す
+- 中止: cancel_background_job() がワーカーに SIGINT を送る（リースの解放など後始末は通常どおり行われる）
+
+排他はジョブ本体の @exclusive（core.job_lease）に任せ、実行履歴は @track_run（core.metrics）の job_runs に残る。
+開始直後に他のプロセスがリースを取ってジョブ本体がスキップした場合は skipped として記録する。
+
+使い方:
+    job_id = launch_background_job("facility_check")
+    for job in list_background_jobs(active_only=True): ...
+
+    python -m core.background_jobs 12    # 実行#12 をこのプロセスで実行（launch_background_job が使う）
+"""
+
+import asyncio
+import inspect
+import json
+import signal
+import subprocess
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import BASE_DIR, BACKGROUND_JOBS, BACKGROUND_JOB_LOG_DIR, BACKGROUND_PROGRESS_INTERVAL_SECONDS
+from core.database import create_background_job, update_background_job, get_background_job, get_background_jobs
+from core.job_lease import get_lease_holder, skip_count
+
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# 登録からプロセスIDの記録までの猶予（これを過ぎてもIDのない実行は起動に失敗したとみなす）
+_LAUNCH_GRACE_SECONDS = 60
+
+# このプロセスから起動したワーカー（終了したものを回収してゾンビを残さない）
+_processes: Dict[int, subprocess.Popen] = {}
+
+# ワーカーとして実行中の実行の進捗ファイル
+_current_progress_path: Optional[str] = None
+_progress_lock = threading.Lock()
+_last_progress = 0.0
+
+
+def _progress_path(job: dict) -> str:
+    return str(BACKGROUND_JOB_LOG_DIR / f"{job['job']}_{job['id']}.progress.json")
+
+
+def _read_progress(job: dict) -> dict:
+    """進捗ファイルの内容（ファイルがない・書き換え中なら空）"""
+    try:
+        with open(_progress_path(job), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _is_alive(job: dict) -> bool:
+    """ワーカープロセスが生きているか"""
+    process = _processes.get(job["id"])
+    if process is not None:
+        return process.poll() is None
+    if not job.get("pid"):
+        return datetime.now() - datetime.fromisoformat(job["created_at"]) < timedelta(seconds=_LAUNCH_GRACE_SECONDS)
+    try:
+        os.kill(job["pid"], 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def list_background_jobs(active_only: bool = False, limit: int = 20) -> list:
+    """バックグラウンド実行を新しい順に取得（プロセスが消えた実行は interrupted にする）"""
+    jobs = get_background_jobs(active_only=active_only, limit=limit)
+    for job in jobs:
+        if job["status"] in ACTIVE_STATUSES:
+            job.update(_read_progress(job))
+        if job["status"] in ACTIVE_STATUSES and not _is_alive(job):
+            now = datetime.now().isoformat()
+            update_background_job(job["id"], status="interrupted", finished_at=now, updated_at=now)
+            job.update(status="interrupted", finished_at=now, updated_at=now)
+    if active_only:
+        jobs = [job for job in jobs if job["status"] in ACTIVE_STATUSES]
+    return jobs
+
+
+def launch_background_job(job: str) -> Optional[int]:
+    """
+    ジョブをワーカープロセスで開始
+
+    Args:
+        job: BACKGROUND_JOBS のキー
+
+    Returns:
+        実行ID（同じジョブが画面・スケジューラー・シェルのいずれかで実行中ならNone）
+    """
+    if job not in BACKGROUND_JOBS:
+        raise ValueError(f"未定義のジョブです: {job}")
+    if any(active["job"] == job for active in list_background_jobs(active_only=True)):
+        return None
+    if get_lease_holder(BACKGROUND_JOBS[job]["lease"]):
+        return None
+
+    job_id = create_background_job(job, datetime.now().isoformat())
+    BACKGROUND_JOB_LOG_DIR.mkdir(parents=True, exist_ok=True)
+    log_path = BACKGROUND_JOB_LOG_DIR / f"{job}_{job_id}.log"
+    with open(log_path, "ab") as log:
+        # 画面のプロセスとは別のセッションで起動し、Streamlitを止めても巡回は最後まで続ける
+        process = subprocess.Popen(
+            [sys.executable, "-u", "-m", "core.background_jobs", str(job_id)],
+            cwd=BASE_DIR,
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            env={**os.environ, "PYTHONIOENCODING": "utf-8"},
+            start_new_session=True,
+        )
+    _processes[job_id] = process
+    update_background_job(job_id, pid=process.pid, log_path=str(log_path))
+    print(f"▶ {job} をバックグラウンドで開始しました（実行#{job_id}, pid {process.pid}）")
+    return job_id
+
+
+def cancel_background_job(job_id: int) -> bool:
+    """実行中のワーカーに中止を指示（実行中でなければFalse）"""
+    job = get_background_job(job_id)
+    if not job or job["status"] not in ACTIVE_STATUSES or not job.get("pid") or not _is_alive(job):
+        return False
+    os.kill(job["pid"], signal.SIGINT)
+    return True
+
+
+def read_log_tail(job: dict, lines: int = 20) -> str:
+    """ワーカーの出力の末尾"""
+    if not job.get("log_path") or not os.path.exists(job["log_path"]):
+        return ""
+    with open(job["log_path"], "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 16 * 1024))
+        text = f.read().decode("utf-8", errors="replace")
+    return "\n".join(text.splitlines()[-lines:])
+
+
+def report_progress(done: int, total: Optional[int] = None, message: Optional[str] = None):
+    """
+    バックグラウンド実行の進捗を記録（ワーカー以外から呼ばれたときは何もしない）
+
+    書き込みは BACKGROUND_PROGRESS_INTERVAL_SECONDS に1回まで（done が total に達したときは必ず書く）。
+    書き先は進捗ファイル（一時ファイルから置き換えるため、読み手が書きかけを読むことはない）。
+
+    Args:
+        done: 処理済みの件数
+        total: 全体の件数（不明ならNone）
+        message: 処理中の対象など
+    """
+    global _last_progress
+    path = _current_progress_path
+    if path is None:
+        return
+    now = time.monotonic()
+    with _progress_lock:
+        if now - _last_progress < BACKGROUND_PROGRESS_INTERVAL_SECONDS and (total is None or done < total):
+            return
+        _last_progress = now
+        fields = {"progress_done": done, "updated_at": datetime.now().isoformat()}
+        if total is not None:
+            fields["progress_total"] = total
+        if message is not None:
+            fields["message"] = message
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(fields, f, ensure_ascii=False)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            # 進捗はジョブ本体より優先しない
+            print(f"⚠ 進捗の記録に失敗 ({e})")
+
+
+def run_background_job(job_id: int) -> str:
+    """登録済みの実行をこのプロセスで実行し、終了時の状態を返す"""
+    global _current_progress_path
+    from core.async_scheduler import resolve_target
+
+    job = get_background_job(job_id)
+    if job is None:
+        print(f"✗ 実行#{job_id} が見つかりません")
+        return "failed"
+    spec = BACKGROUND_JOBS[job["job"]]
+    started_at = datetime.now().isoformat()
+    update_background_job(job_id, status="running", pid=os.getpid(), started_at=started_at, updated_at=started_at)
+
+    holder = get_lease_holder(spec["lease"])
+    if holder:
+        finished_at = datetime.now().isoformat()
+        update_background_job(job_id, status="skipped", finished_at=finished_at, updated_at=finished_at,
+                              message=f"他のプロセスで実行中（{holder['holder']}）")
+        print(f"⏭ {job['job']} は他のプロセスで実行中のためスキップします")
+        return "skipped"
+
+    status, error, message = "success", None, None
+    skips = skip_count(spec["lease"])
+    BACKGROUND_JOB_LOG_DIR.mkdir(parents=True, exist_ok=True)
+    _current_progress_path = _progress_path(job)
+    try:
+        result = resolve_target(spec["target"])()
+        if inspect.iscoroutine(result):
+            asyncio.run(result)
+        # 上の確認の後に他のプロセスがリースを取った（@exclusive がスキップした）
+        if skip_count(spec["lease"]) > skips:
+            status, message = "skipped", "他のプロセスで実行中"
+    except KeyboardInterrupt:
+        status = "cancelled"
+    except Exception as e:
+        status, error = "failed", f"{type(e).__name__}: {e}"
+        traceback.print_exc()
+    finally:
+        _current_progress_path = None
+
+    # 最後の進捗を実行の記録に残し、進捗ファイルは消す
+    progress = _read_progress(job)
+    if message is not None:
+        progress["message"] = message
+    finished_at = datetime.now().isoformat()
+    update_background_job(job_id, **{**progress, "status": status, "finished_at": finished_at,
+                                     "updated_at": finished_at, "error": error})
+    try:
+        os.remove(_progress_path(job))
+    except OSError:
+        pass
+    emoji = {"success": "✅", "cancelled": "⏹", "skipped": "⏭"}.get(status, "✗")
+    print(f"{emoji} {job['job']}（実行#{job_id}）: {status}")
+    return status
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="画面から登録したバックグラウンド実行のワーカー")
+    parser.add_argument("job_id", type=int, help="background_jobs の実行ID")
+    args = parser.parse_args()
+
+    # -m で実行すると このファイルは __main__ になるため、ジョブ本体が import する
+    # core.background_jobs（report_progress の参照先）の方で実行する
+    from core import background_jobs
+    sys.exit(0 if background_jobs.run_background_job(args.job_id) in ("success", "skipped") else 1)
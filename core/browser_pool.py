@@ -0,0 +1,358 @@
+"""
+Playwright ブラウザプール
+Chromiumを1つだけ（最初に必要になった時点で）起動し、コンテキストを使い回しながらページを貸し出す。
+施設ごとのブラウザ起動（数秒）を省き、一定回数でコンテキストを作り直してメモリを抑える。
+
+画像・フォント・CSS・メディアと解析系ドメインへのリクエストは遮断し、
+描画待ちは固定スリープではなくネットワークアイドル／要素出現で打ち切る。
+
+使い方:
+    async with BrowserPool(size=4) as pool:
+        async with pool.page() as page:
+            await page.goto(url)
+            await settle(page)
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, AsyncIterator
+from urllib.parse import urlparse
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    BROWSER_USER_AGENT,
+    BROWSER_POOL_SIZE,
+    BROWSER_CONTEXT_MAX_USES,
+    BROWSER_HEALTH_CHECK_SECONDS,
+    BROWSER_BLOCK_RESOURCES,
+    BROWSER_BLOCKED_RESOURCE_TYPES,
+    BROWSER_BLOCKED_DOMAINS,
+    BROWSER_SETTLE_SELECTOR,
+    BROWSER_SETTLE_TIMEOUT_MS,
+)
+
+try:
+    from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+    PLAYWRIGHT_AVAILABLE = True
+except ImportError:
+    PLAYWRIGHT_AVAILABLE = False
+
+
+class TrafficCounter:
+    """1施設分の転送量・ブロック件数の集計"""
+
+    def __init__(self):
+        self.bytes = 0
+        self.requests = 0
+        self.blocked = 0
+
+    def add(self, size: int):
+        self.bytes += size
+        self.requests += 1
+
+    def summary(self) -> str:
+        return f"{self.bytes / 1024:.1f}KB / {self.requests}リクエスト（ブロック {self.blocked}件）"
+
+
+class ResourcePolicy:
+    """
+    リクエスト遮断ポリシー
+
+    文書・スクリプト・XHR以外のリソース種別と、解析・広告ドメインへのリクエストを中断する。
+    """
+
+    def __init__(
+        self,
+        blocked_types: Iterable[str] = BROWSER_BLOCKED_RESOURCE_TYPES,
+        blocked_domains: Iterable[str] = BROWSER_BLOCKED_DOMAINS,
+    ):
+        self.blocked_types = frozenset(blocked_types)
+        self.blocked_domains = tuple(d.lower() for d in blocked_domains)
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        if resource_type in self.blocked_types:
+            return True
+        host = urlparse(url).netloc.lower().split(":")[0]
+        return any(host == d or host.endswith("." + d) for d in self.blocked_domains)
+
+
+async def settle(page: "Page", selector: Optional[str] = BROWSER_SETTLE_SELECTOR,
+                 timeout_ms: int = BROWSER_SETTLE_TIMEOUT_MS):
+    """
+    動的コンテンツの描画を待つ（固定スリープの代わり）
+
+    ネットワークアイドルか本文要素の出現のどちらか早い方まで待ち、上限で打ち切る。
+    """
+    waits = [asyncio.ensure_future(page.wait_for_load_state("networkidle", timeout=timeout_ms))]
+    if selector:
+        waits.append(asyncio.ensure_future(page.wait_for_selector(selector, timeout=timeout_ms)))
+    try:
+        await asyncio.wait(waits, timeout=timeout_ms / 1000, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in waits:
+            if not task.done():
+                task.cancel()
+        for task in waits:
+            # タイムアウト等の例外は握りつぶす（待機は打ち切りで十分）
+            try:
+                await task
+            except BaseException:
+                pass
+
+
+class _ContextSlot:
+    """貸し出し単位（1コンテキスト + 利用回数）"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.context: Optional["BrowserContext"] = None
+        self.uses = 0
+
+
+class BrowserPool:
+    """
+    長寿命のブラウザプール
+
+    Args:
+        size: 同時に貸し出すページ数
+        max_uses_per_context: この回数使ったコンテキストは破棄して作り直す
+        headless: ヘッドレスで起動するか
+        user_agent: コンテキストのUser-Agent
+        resource_policy: リクエスト遮断ポリシー（省略時は設定値、BROWSER_BLOCK_RESOURCES=Falseで無効）
+    """
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        max_uses_per_context: int = BROWSER_CONTEXT_MAX_USES,
+        headless: bool = True,
+        user_agent: str = BROWSER_USER_AGENT,
+        health_check_seconds: float = BROWSER_HEALTH_CHECK_SECONDS,
+        resource_policy: Optional[ResourcePolicy] = None,
+    ):
+        self.size = max(1, size)
+        self.max_uses_per_context = max(1, max_uses_per_context)
+        self.headless = headless
+        self.user_agent = user_agent
+        self.health_check_seconds = health_check_seconds
+        if resource_policy is None and BROWSER_BLOCK_RESOURCES:
+            resource_policy = ResourcePolicy()
+        self.resource_policy = resource_policy
+
+        self._playwright = None
+        self._browser: Optional["Browser"] = None
+        self._slots: Optional[asyncio.Queue] = None
+        self._launch_lock = asyncio.Lock()
+        self._start_lock = asyncio.Lock()
+        self._last_health_check = 0.0
+        self.stats = {"pages": 0, "context_recycles": 0, "browser_launches": 0, "failures": 0,
+                      "bytes": 0, "blocked": 0}
+
+    async def __aenter__(self) -> "BrowserPool":
+        # ブラウザは最初のページ貸し出し時に起動（HTTPだけで済んだ場合は起動しない）
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """ブラウザを起動して貸し出し枠を用意"""
+        if not PLAYWRIGHT_AVAILABLE:
+            raise RuntimeError("Playwrightがインストールされていません")
+        async with self._start_lock:
+            if self._slots is not None:
+                return
+            self._playwright = await async_playwright().start()
+            await self._launch()
+            slots = asyncio.Queue()
+            for i in range(self.size):
+                slots.put_nowait(_ContextSlot(i))
+            self._slots = slots
+
+    async def close(self):
+        """全コンテキストとブラウザを終了"""
+        if self._slots is not None:
+            while not self._slots.empty():
+                slot = self._slots.get_nowait()
+                await self._discard_context(slot)
+            self._slots = None
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _launch(self):
+        self._browser = await self._playwright.chromium.launch(headless=self.headless)
+        self._last_health_check = time.monotonic()
+        self.stats["browser_launches"] += 1
+
+    async def _ensure_browser(self):
+        """ブラウザが落ちていれば再起動（同時に1回だけ）"""
+        async with self._launch_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+            print("  ⚠ ブラウザが停止していたため再起動します")
+            await self._launch()
+
+    async def _probe(self, browser) -> bool:
+        """コンテキストを1つ作って閉じられるか"""
+        try:
+            context = await browser.new_context()
+            await context.close()
+            return True
+        except Exception:
+            return False
+
+    async def health_check(self) -> bool:
+        """
+        ブラウザが応答するか確認し、異常なら再起動する
+
+        確認用のコンテキスト作成が1回失敗しただけでは再起動しない（再試行して2回とも失敗したときか、
+        接続が切れているときだけ）。再起動は他の枠が使用中のページも巻き込むため、
+        _launch_lock の中で、判定した時点のブラウザがまだ使われている場合に限って行う。
+        """
+        self._last_health_check = time.monotonic()
+        browser = self._browser
+        if browser is not None and browser.is_connected():
+            if await self._probe(browser) or await self._probe(browser):
+                return True
+        self.stats["failures"] += 1
+        async with self._launch_lock:
+            # 待っている間に他の枠が再起動済みなら何もしない
+            if self._browser is browser:
+                if browser is not None:
+                    try:
+                        await browser.close()
+                    except Exception:
+                        pass
+                self._browser = None
+                print("  ⚠ ブラウザが応答しないため再起動します")
+                await self._launch()
+        return False
+
+    async def _discard_context(self, slot: _ContextSlot):
+        if slot.context is not None:
+            try:
+                await slot.context.close()
+            except Exception:
+                pass
+        slot.context = None
+        slot.uses = 0
+
+    async def _prepare_slot(self, slot: _ContextSlot):
+        """コンテキストが未作成・使用上限・ブラウザ再起動後なら作り直す"""
+        if time.monotonic() - self._last_health_check > self.health_check_seconds:
+            await self.health_check()
+        await self._ensure_browser()
+
+        stale = slot.context is not None and slot.context.browser is not self._browser
+        if slot.context is not None and (slot.uses >= self.max_uses_per_context or stale):
+            await self._discard_context(slot)
+            self.stats["context_recycles"] += 1
+
+        if slot.context is None:
+            slot.context = await self._browser.new_context(user_agent=self.user_agent)
+
+    async def _instrument(self, page: "Page", traffic: TrafficCounter):
+        """リクエスト遮断と転送量の計測をページに設定"""
+        policy = self.resource_policy
+
+        async def route_handler(route):
+            request = route.request
+            if policy.should_block(request.resource_type, request.url):
+                traffic.blocked += 1
+                self.stats["blocked"] += 1
+                await route.abort()
+            else:
+                await route.continue_()
+
+        async def count(request):
+            try:
+                sizes = await request.sizes()
+            except Exception:
+                return
+            size = sizes.get("responseBodySize", 0) + sizes.get("responseHeadersSize", 0)
+            traffic.add(size)
+            self.stats["bytes"] += size
+
+        if policy is not None:
+            await page.route("**/*", route_handler)
+        page.on("requestfinished", lambda request: asyncio.ensure_future(count(request)))
+
+    @asynccontextmanager
+    async def page(self, traffic: Optional[TrafficCounter] = None) -> AsyncIterator["Page"]:
+        """
+        ページを1枚借りる（枠が空くまで待機）
+
+        traffic を渡すとこのページの転送量・ブロック件数を加算する。
+        """
+        traffic = traffic if traffic is not None else TrafficCounter()
+        if self._slots is None:
+            await self.start()
+
+        slot = await self._slots.get()
+        page = None
+        try:
+            try:
+                await self._prepare_slot(slot)
+                page = await slot.context.new_page()
+            except Exception:
+                # コンテキストかブラウザが壊れている: 作り直して1回だけ再試行
+                self.stats["failures"] += 1
+                await self._discard_context(slot)
+                await self.health_check()
+                await self._prepare_slot(slot)
+                page = await slot.context.new_page()
+
+            await self._instrument(page, traffic)
+            self.stats["pages"] += 1
+            yield page
+        finally:
+            if page is not None:
+                try:
+                    await page.close()
+                except Exception:
+                    await self._discard_context(slot)
+            slot.uses += 1
+            self._slots.put_nowait(slot)
+
+
+# pool_scope が作った一時的なプール（id(owner) → プール）。作ったタスクとその子タスクにだけ見える
+_scoped_pools: ContextVar[Dict[int, BrowserPool]] = ContextVar("scoped_browser_pools", default={})
+
+
+@asynccontextmanager
+async def pool_scope(owner, size: int = 1) -> AsyncIterator[BrowserPool]:
+    """
+    owner.browser_pool があればそれを使い、なければ一時的なプールを作る
+
+    一括処理（check_all_facilities）の中で作ったプールは、そこから起動した施設ごとのタスクでも共有される。
+    owner は書き換えないため、同じチェッカーの単発呼び出しが重なっても互いのプールを閉じない。
+    """
+    if getattr(owner, "browser_pool", None) is not None:
+        yield owner.browser_pool
+        return
+    scoped = _scoped_pools.get().get(id(owner))
+    if scoped is not None:
+        yield scoped
+        return
+    if not PLAYWRIGHT_AVAILABLE:
+        yield None
+        return
+
+    async with BrowserPool(size=size) as pool:
+        token = _scoped_pools.set({**_scoped_pools.get(), id(owner): pool})
+        try:
+            yield pool
+        finally:
+            _scoped_pools.reset(token)
@@ -0,0 +1,125 @@
+"""
+イベントカレンダーのHTML描画
+日ごとの集計（core.event_query.event_day_summary）から、月のカレンダーと年間ヒートマップを
+1つのHTML文字列として組み立てる。日ごとにウィジェットを作らないため、何か月分を並べても
+Streamlit側の要素は1つで済む。
+
+- month_grid_html: 日曜始まりの月カレンダー（件数バッジ・最高スコアで色分け）
+- months_html: 複数月のカレンダーを横に並べる
+- year_heatmap_html: 1年分を週×曜日のマス目で表示（件数で濃淡）
+"""
+
+import calendar
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.event_query import DaySummary
+
+
+WEEKDAY_LABELS = ['日', '月', '火', '水', '木', '金', '土']
+
+# ヒートマップの濃淡（イベントなし → 多い）
+HEAT_COLORS = ['#f1f3f5', '#c8e6c9', '#81c784', '#43a047', '#1b5e20']
+
+# 最高スコアによるバッジの色（高プライオリティ → 低）
+_SCORE_COLORS = [(70, '#e53935'), (50, '#fb8c00'), (0, '#4caf50')]
+
+CALENDAR_CSS = """
+<style>
+.ev-months { display: flex; flex-wrap: wrap; gap: 16px; }
+.ev-month { flex: 1 1 320px; max-width: 560px; }
+.ev-month h4 { margin: 0 0 6px 0; }
+.ev-month table { width: 100%; border-collapse: separate; border-spacing: 3px; table-layout: fixed; }
+.ev-month th { font-size: 0.8em; text-align: center; color: #333; }
+.ev-month th.sun { color: #ff6b6b; } .ev-month th.sat { color: #4dabf7; }
+.ev-month td { height: 52px; vertical-align: top; padding: 4px; border: 1px solid #eee; border-radius: 6px; font-size: 0.85em; }
+.ev-month td.has { background: #e8f5e9; }
+.ev-month td.today { border: 2px solid #667eea; }
+.ev-month td.blank { border: none; }
+.ev-badge { color: white; border-radius: 4px; padding: 1px 5px; font-size: 0.8em; float: right; }
+.ev-heat { display: grid; grid-auto-flow: column; grid-template-rows: repeat(7, 12px); gap: 3px; overflow-x: auto; }
+.ev-heat div { width: 12px; height: 12px; border-radius: 2px; }
+.ev-legend { font-size: 0.8em; color: #666; margin-top: 6px; }
+.ev-legend span { display: inline-block; width: 10px; height: 10px; border-radius: 2px; margin: 0 2px; }
+</style>
+"""
+
+
+def _score_color(score: int) -> str:
+    for threshold, color in _SCORE_COLORS:
+        if score >= threshold:
+            return color
+    return _SCORE_COLORS[-1][1]
+
+
+def month_range(year: int, month: int, months: int = 1) -> Tuple[str, str]:
+    """year年month月から months か月分の期間（開始日, 終了日）"""
+    end_year, end_month = divmod(month - 1 + months - 1, 12)
+    end_year += year
+    end_month += 1
+    last = calendar.monthrange(end_year, end_month)[1]
+    return f"{year}-{month:02d}-01", f"{end_year}-{end_month:02d}-{last:02d}"
+
+
+def month_grid_html(year: int, month: int, days: Dict[str, DaySummary], today: date = None) -> str:
+    """1か月分のカレンダー（CSSは CALENDAR_CSS）"""
+    today = today or date.today()
+    header = "".join(
+        f"<th class='{'sun' if i == 0 else 'sat' if i == 6 else ''}'>{label}</th>"
+        for i, label in enumerate(WEEKDAY_LABELS)
+    )
+    rows = []
+    for week in calendar.Calendar(firstweekday=6).monthdayscalendar(year, month):
+        cells = []
+        for day in week:
+            if day == 0:
+                cells.append("<td class='blank'></td>")
+                continue
+            key = f"{year}-{month:02d}-{day:02d}"
+            summary = days.get(key)
+            classes = ["has"] if summary else []
+            if date(year, month, day) == today:
+                classes.append("today")
+            badge = (f"<span class='ev-badge' style='background:{_score_color(summary.max_score)}' "
+                     f"title='最高スコア {summary.max_score}'>{summary.count}</span>") if summary else ""
+            cells.append(f"<td class='{' '.join(classes)}'><strong>{day}</strong>{badge}</td>")
+        rows.append(f"<tr>{''.join(cells)}</tr>")
+    return (f"<div class='ev-month'><h4>{year}年{month}月</h4>"
+            f"<table><tr>{header}</tr>{''.join(rows)}</table></div>")
+
+
+def months_html(year: int, month: int, months: int, days: Dict[str, DaySummary], today: date = None) -> str:
+    """month から months か月分のカレンダーを並べたHTML（CSS込み）"""
+    grids = []
+    for offset in range(months):
+        y, m = divmod(month - 1 + offset, 12)
+        grids.append(month_grid_html(year + y, m + 1, days, today))
+    return CALENDAR_CSS + f"<div class='ev-months'>{''.join(grids)}</div>"
+
+
+def _heat_level(count: int, peak: int) -> int:
+    if not count:
+        return 0
+    return min(len(HEAT_COLORS) - 1, 1 + (count - 1) * (len(HEAT_COLORS) - 1) // max(peak, 1))
+
+
+def year_heatmap_html(year: int, days: Dict[str, DaySummary]) -> str:
+    """1年分のヒートマップ（列が週、行が日曜〜土曜、CSS込み）"""
+    first = date(year, 1, 1)
+    peak = max((s.count for s in days.values()), default=0)
+    # 1月1日の週の日曜から並べる（年の前の日は空白）
+    cells: List[str] = ["<div></div>"] * ((first.weekday() + 1) % 7)
+    current = first
+    while current.year == year:
+        summary = days.get(current.isoformat())
+        count = summary.count if summary else 0
+        cells.append(f"<div style='background:{HEAT_COLORS[_heat_level(count, peak)]}' "
+                     f"title='{current:%m/%d} {count}件'></div>")
+        current += timedelta(days=1)
+    legend = "".join(f"<span style='background:{color}'></span>" for color in HEAT_COLORS)
+    return (CALENDAR_CSS + f"<div class='ev-heat'>{''.join(cells)}</div>"
+            f"<div class='ev-legend'>少ない {legend} 多い（最大 {peak}件/日）</div>")
@@ -0,0 +1,153 @@
+"""
+施設チェックの並行実行ランナー
+全体の同時実行数とホストごとの同時実行数・アクセス間隔を守りながら施設を並行チェックする。
+
+- 全体の同時実行数はセマフォで制限
+- 同一ホスト（smrj.go.jp など共有ドメイン）はホスト単位のセマフォとクロール間隔で保護
+- 施設ごとに制限時間を設け、超過したチェックはキャンセル
+- 完了順に関わらず、進捗は入力順に通知
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    CHECK_CONCURRENCY,
+    CHECK_PER_DOMAIN_CONCURRENCY,
+    CHECK_CRAWL_DELAY_SECONDS,
+    CHECK_DEADLINE_SECONDS,
+)
+
+
+def domain_of(url: Optional[str]) -> str:
+    """URLからホスト名を取得（www.は除去）"""
+    if not url:
+        return ""
+    host = urlparse(url).netloc.lower().split(":")[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+def facility_url(facility: Dict) -> str:
+    """施設辞書からチェック対象URLを取得"""
+    return facility.get('website') or facility.get('url') or ''
+
+
+class ConcurrentRunner:
+    """
+    ホスト単位の礼儀（同時接続数・間隔）を守る並行実行ランナー
+
+    Args:
+        concurrency: 全体の同時実行数
+        per_domain: 同一ホストの同時実行数
+        crawl_delay: 同一ホストへの実行開始間隔（秒）
+        deadline: 1件あたりの制限時間（秒、Noneで無制限）
+    """
+
+    def __init__(
+        self,
+        concurrency: int = CHECK_CONCURRENCY,
+        per_domain: int = CHECK_PER_DOMAIN_CONCURRENCY,
+        crawl_delay: float = CHECK_CRAWL_DELAY_SECONDS,
+        deadline: Optional[float] = CHECK_DEADLINE_SECONDS,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.per_domain = max(1, per_domain)
+        self.crawl_delay = crawl_delay
+        self.deadline = deadline
+
+        self._global = asyncio.Semaphore(self.concurrency)
+        self._domain_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._domain_locks: Dict[str, asyncio.Lock] = {}
+        self._last_start: Dict[str, float] = {}
+
+    def _domain_semaphore(self, domain: str) -> asyncio.Semaphore:
+        if domain not in self._domain_semaphores:
+            self._domain_semaphores[domain] = asyncio.Semaphore(self.per_domain)
+            self._domain_locks[domain] = asyncio.Lock()
+        return self._domain_semaphores[domain]
+
+    async def _wait_crawl_delay(self, domain: str):
+        """同一ホストの前回開始からクロール間隔が空くまで待機"""
+        if not domain or self.crawl_delay <= 0:
+            return
+        async with self._domain_locks[domain]:
+            last = self._last_start.get(domain)
+            if last is not None:
+                wait = self.crawl_delay - (time.monotonic() - last)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            self._last_start[domain] = time.monotonic()
+
+    async def _run_one(self, item: Any, worker: Callable[[Any], Awaitable[Any]],
+                       key: Callable[[Any], str], on_timeout: Callable[[Any, Exception], Any]):
+        domain = domain_of(key(item))
+        async with self._domain_semaphore(domain):
+            await self._wait_crawl_delay(domain)
+            async with self._global:
+                try:
+                    if self.deadline:
+                        return await asyncio.wait_for(worker(item), timeout=self.deadline)
+                    return await worker(item)
+                except asyncio.TimeoutError as e:
+                    return on_timeout(item, e)
+                except Exception as e:
+                    return on_timeout(item, e)
+
+    async def run(
+        self,
+        items: List[Any],
+        worker: Callable[[Any], Awaitable[Any]],
+        key: Callable[[Any], str] = facility_url,
+        on_result: Optional[Callable[[int, Any, Any], None]] = None,
+        on_timeout: Optional[Callable[[Any, Exception], Any]] = None,
+    ) -> List[Any]:
+        """
+        全件を並行実行し、入力順の結果リストを返す
+
+        Args:
+            items: 処理対象（施設辞書など）
+            worker: 1件を処理するコルーチン関数
+            key: 対象からホスト判定用URLを取り出す関数
+            on_result: 進捗通知 (1始まりの番号, 対象, 結果)。入力順に呼ばれる
+            on_timeout: 制限時間超過・例外時の結果を生成する関数
+        """
+        on_timeout = on_timeout or (lambda item, e: {"status": "unknown", "error": _describe_error(e)})
+
+        async def indexed(i: int, item: Any):
+            return i, await self._run_one(item, worker, key, on_timeout)
+
+        tasks = [asyncio.ensure_future(indexed(i, item)) for i, item in enumerate(items)]
+
+        results: List[Any] = [None] * len(items)
+        done_flags = [False] * len(items)
+        next_to_report = 0
+
+        try:
+            for finished in asyncio.as_completed(tasks):
+                i, result = await finished
+                results[i] = result
+                done_flags[i] = True
+
+                # 先頭から連続して完了している分だけ入力順に通知
+                while next_to_report < len(items) and done_flags[next_to_report]:
+                    if on_result:
+                        on_result(next_to_report + 1, items[next_to_report], results[next_to_report])
+                    next_to_report += 1
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        return results
+
+
+def _describe_error(error: Exception) -> str:
+    if isinstance(error, asyncio.TimeoutError):
+        return "制限時間を超過しました"
+    return str(error) or error.__class__.__name__
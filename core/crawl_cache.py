@@ -0,0 +1,191 @@
+"""
+クロールキャッシュ（ページ変更検知）モジュール
+巡回したページの正規化テキストの指紋（SHA-1）とSimHashを抽出結果と一緒にDBへ保存し、
+次回のチェックでページが変わっていなければ日付抽出をスキップする。
+
+- 完全一致（SHA-1が同じ）: 前回の抽出結果をそのまま再利用
+- 軽微な差分（SimHashのハミング距離がしきい値以下、かつ日付らしき表記の集合が同じ）:
+  アクセスカウンタや日替わり表示程度とみなし再利用（新着記事が1件増えただけのページは再抽出）
+- それ以外: 抽出し直して更新履歴（page_changes）に記録
+
+「ページが更新された」こと自体も安価な活動シグナルとして結果に含める。
+"""
+
+import hashlib
+import re
+import unicodedata
+from datetime import datetime
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import SIMHASH_CHANGE_THRESHOLD
+from core.database import get_page_snapshot, save_page_snapshot
+from core.metrics import record_cache
+
+
+SIMHASH_BITS = 64
+SHINGLE_MAX_CHARS = 32    # 空白で区切った語をこの長さで分けてシングルにする
+
+_WHITESPACE = re.compile(r"\s+")
+
+# 日付らしき表記。厳密な抽出はせず、差分が「新しい日付」を含むかだけを見る
+_DATE_TOKEN = re.compile(
+    r"\d{4}\s*[年/.\-]\s*\d{1,2}(?:\s*[月/.\-]\s*\d{1,2})?"
+    r"|令和\s*(?:\d{1,2}|元)\s*年\s*\d{1,2}\s*月\s*\d{1,2}"
+    r"|r\d{1,2}[./]\d{1,2}[./]\d{1,2}"
+    r"|\d{1,2}月\s*\d{1,2}日"
+)
+
+
+def normalize_for_fingerprint(text: str) -> str:
+    """全角半角・大文字小文字・空白の揺れを吸収したテキスト"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def content_hash(normalized: str) -> str:
+    """正規化テキストのSHA-1"""
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def date_signature(normalized: str) -> str:
+    """本文中の日付らしき表記の集合のハッシュ"""
+    tokens = sorted({_WHITESPACE.sub("", t) for t in _DATE_TOKEN.findall(normalized)})
+    return hashlib.sha1("\n".join(tokens).encode("utf-8")).hexdigest()
+
+
+def _shingles(normalized: str):
+    """空白区切りの語（長い語は SHINGLE_MAX_CHARS ごと）"""
+    for token in normalized.split(" "):
+        for i in range(0, len(token), SHINGLE_MAX_CHARS):
+            yield token[i:i + SHINGLE_MAX_CHARS]
+
+
+def simhash(normalized: str, bits: int = SIMHASH_BITS) -> int:
+    """
+    語単位のSimHash
+
+    文字3-gramでは数十万字のページで1秒以上かかるため、正規化後の空白区切り（ほぼ行・句の単位）を
+    シングルにする。定型文の繰り返しに引きずられないよう、シングルは種類ごとに1票とする。
+    ハッシュはバイト位置ごとの値の分布に集計してから最後にビットへ展開する（シングルごとに全ビットを回さない）。
+    """
+    shingles = set(_shingles(normalized)) or {normalized}
+    width = bits // 8
+    tables = [[0] * 256 for _ in range(width)]
+    total = len(shingles)
+    for shingle in shingles:
+        digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=width).digest()
+        for table, byte in zip(tables, digest):
+            table[byte] += 1
+
+    value = 0
+    for position, table in enumerate(tables):
+        shift = (width - 1 - position) * 8    # ダイジェストの先頭バイトが上位ビット
+        present = [(byte, count) for byte, count in enumerate(table) if count]
+        for bit in range(8):
+            ones = sum(count for byte, count in present if byte >> bit & 1)
+            if ones * 2 > total:
+                value |= 1 << (shift + bit)
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class CacheResult(NamedTuple):
+    """キャッシュ参照の結果"""
+    items: List[Any]              # 抽出結果（キャッシュ再利用時は前回の値）
+    latest_date: Optional[str]
+    changed: Optional[bool]       # 初回はNone
+    distance: Optional[int]       # 前回とのハミング距離（初回はNone）
+    last_changed: Optional[str]   # 最後に内容が変わった日時
+    reused: bool                  # 抽出をスキップしたか
+
+
+class CrawlCache:
+    """
+    URL単位の抽出結果キャッシュ
+
+    Args:
+        extractor: 抽出方式の名前（同じURLでも抽出方式ごとに別々に保存）
+        threshold: 「実質変更なし」とみなすハミング距離
+    """
+
+    def __init__(self, extractor: str, threshold: int = SIMHASH_CHANGE_THRESHOLD):
+        self.extractor = extractor
+        self.threshold = threshold
+        self.stats = {"hits": 0, "near_hits": 0, "misses": 0}
+
+    def extract(
+        self,
+        url: str,
+        text: str,
+        extract: Callable[[str], Tuple[List[Any], Optional[str]]],
+        facility_id: Optional[str] = None,
+    ) -> CacheResult:
+        """
+        ページが前回から変わっていなければ前回の抽出結果を返し、変わっていれば抽出して保存
+
+        Args:
+            url: ページURL
+            text: ページ本文
+            extract: 本文から (抽出結果リスト, 最新日付) を返す関数（結果はJSON化できること）
+            facility_id: 更新履歴に記録する施設ID
+        """
+        normalized = normalize_for_fingerprint(text)
+        digest = content_hash(normalized)
+
+        try:
+            previous = get_page_snapshot(url, self.extractor)
+        except Exception as e:
+            print(f"  ⚠ クロールキャッシュ参照エラー: {e}")
+            items, latest = extract(text)
+            return CacheResult(items, latest, None, None, None, False)
+
+        if previous and previous["content_hash"] == digest:
+            self.stats["hits"] += 1
+            record_cache("crawl", True)
+            self._touch(previous)
+            return CacheResult(previous["dates"], previous["latest_date"], False, 0, previous["last_changed"], True)
+
+        fingerprint = simhash(normalized)
+        signature = date_signature(normalized)
+        distance = None
+        if previous:
+            distance = hamming_distance(fingerprint, int(previous["simhash"], 16))
+            if distance <= self.threshold and previous.get("date_signature") == signature:
+                self.stats["near_hits"] += 1
+                record_cache("crawl", True)
+                self._touch(previous)
+                return CacheResult(previous["dates"], previous["latest_date"], False, distance,
+                                   previous["last_changed"], True)
+
+        self.stats["misses"] += 1
+        record_cache("crawl", False)
+        items, latest = extract(text)
+        snapshot = {
+            "url": url,
+            "extractor": self.extractor,
+            "facility_id": facility_id,
+            "content_hash": digest,
+            "simhash": f"{fingerprint:016x}",
+            "date_signature": signature,
+            "dates": items,
+            "latest_date": latest,
+        }
+        try:
+            save_page_snapshot(snapshot, changed=True, distance=distance)
+        except Exception as e:
+            print(f"  ⚠ クロールキャッシュ保存エラー: {e}")
+        return CacheResult(items, latest, True if previous else None, distance, datetime.now().isoformat(), False)
+
+    def _touch(self, previous: dict):
+        """内容が変わっていないページの最終確認日時だけ更新"""
+        try:
+            save_page_snapshot(previous, changed=False)
+        except Exception as e:
+            print(f"  ⚠ クロールキャッシュ保存エラー: {e}")
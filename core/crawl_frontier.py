@@ -0,0 +1,228 @@
+"""
+施設サイト巡回の優先度付きフロンティア
+トップページのリンクを文書順に先頭から数件たどるのではなく、リンクごとにスコアを付けて
+有望なページから順に（ベストファースト）最大 CRAWL_MAX_DEPTH 階層までたどる。
+
+- スコア: キーワードの重み（リンク文字列に含まれれば加点）、URLパス（/event/・/news/・年月入り等）、
+  除外キーワード（問い合わせ・規約等）の減点、階層の深さの減点、イベントが見つかったページからのリンクの加点
+- URLの正規化: フラグメント・追跡用パラメータ・末尾スラッシュ・index.html を除いて重複判定
+- 予算: 施設ごとに CRAWL_PAGE_BUDGET ページ（取得失敗も1ページと数える）、
+  外部プラットフォームは CRAWL_EXTERNAL_BUDGET ページまで
+"""
+
+import heapq
+import re
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    CRAWL_PAGE_BUDGET,
+    CRAWL_MAX_DEPTH,
+    CRAWL_EXTERNAL_BUDGET,
+    CRAWL_MIN_LINK_SCORE,
+    CRAWL_LINK_KEYWORDS,
+    CRAWL_NEGATIVE_KEYWORDS,
+    CRAWL_TRACKING_PARAMS,
+)
+
+
+# 外部プラットフォームのドメイン
+EXTERNAL_PLATFORMS = {
+    'peatix.com': 'Peatix',
+    'connpass.com': 'connpass',
+    'facebook.com/events': 'Facebook',
+    'fb.me': 'Facebook',
+    'eventbrite.com': 'Eventbrite',
+    'doorkeeper.jp': 'Doorkeeper'
+}
+
+# イベント一覧・記事らしいURLパス
+_PATH_PATTERNS = [
+    (re.compile(r"/(events?|seminars?|workshops?)(/|$)", re.I), 2.0),
+    (re.compile(r"/(news|topics|info|information|blog)(/|$)", re.I), 1.5),
+    (re.compile(r"/(category|tag)/[^/]*(event|seminar|news)", re.I), 1.5),
+    (re.compile(r"/20\d{2}(/|[-_]?\d{2})"), 1.0),   # /2026/ ・ /2026-03 など年月入りの記事・アーカイブ
+]
+
+# 本文を持たない・ページとして開けないファイル（PDFは施設URL自体がPDFのときだけ core.pdf_extractor で読む）
+_SKIP_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".zip", ".pdf", ".doc", ".docx",
+                    ".xls", ".xlsx", ".ppt", ".pptx", ".mp4", ".mp3", ".css", ".js")
+
+_TRACKING_PARAMS = set(CRAWL_TRACKING_PARAMS)
+
+
+def canonical_url(url: str) -> str:
+    """
+    重複判定用にURLを正規化
+
+    スキーム・ホストの小文字化、既定ポート・フラグメント・追跡用パラメータの除去、
+    クエリの並べ替え、末尾の index.html / スラッシュの除去を行う。
+    """
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower() or "http"
+    host = (parsed.hostname or "").lower()
+    if parsed.port and not ((scheme == "http" and parsed.port == 80) or (scheme == "https" and parsed.port == 443)):
+        host += f":{parsed.port}"
+    path = re.sub(r"/(index|default)\.(html?|php|aspx?)$", "/", parsed.path or "/", flags=re.I)
+    path = re.sub(r"/{2,}", "/", path)
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if k.lower() not in _TRACKING_PARAMS and not k.lower().startswith("utm_")
+    ))
+    return urlunparse((scheme, host, path, "", query, ""))
+
+
+def _site_host(url: str) -> str:
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def platform_of(url: str) -> Optional[str]:
+    """外部プラットフォームのURLならプラットフォーム名"""
+    for domain, platform in EXTERNAL_PLATFORMS.items():
+        if domain in url:
+            return platform
+    return None
+
+
+def score_link(text: str, href: str, depth: int = 1, parent_events: int = 0) -> float:
+    """
+    内部リンクのスコア（高いほど先にたどる）
+
+    Args:
+        text: リンク文字列（小文字化済み）
+        href: 絶対URL
+        depth: リンク先の階層（トップページ直下が1）
+        parent_events: リンク元のページで見つかったイベント数
+    """
+    path = urlparse(href).path.lower()
+    if path.endswith(_SKIP_EXTENSIONS):
+        return 0.0
+
+    label = f"{text} {path}"
+    score = 0.0
+    for keyword, weight in CRAWL_LINK_KEYWORDS.items():
+        if keyword in text:
+            score += weight
+        elif keyword in path:
+            score += weight * 0.75   # URLにだけ含まれる場合は少し弱く
+    for pattern, weight in _PATH_PATTERNS:
+        if pattern.search(path):
+            score += weight
+    if any(keyword in label for keyword in CRAWL_NEGATIVE_KEYWORDS):
+        score -= 4.0
+    # 「一覧」「もっと見る」はアーカイブへの入口
+    if any(word in text for word in ("一覧", "もっと見る", "more", "すべて", "archive", "過去")):
+        score += 1.0
+
+    score -= (depth - 1) * 1.0
+    score += min(parent_events, 5) * 0.2
+    return score
+
+
+class FrontierItem(NamedTuple):
+    """たどる予定のページ"""
+    url: str
+    depth: int
+    score: float
+    text: str
+
+
+class CrawlFrontier:
+    """
+    1施設分の巡回フロンティア
+
+    使い方:
+        frontier = CrawlFrontier(top_url)
+        frontier.add_links(top_links, depth=1)
+        while (item := frontier.pop()) is not None:
+            ...  # item.url を取得して frontier.add_links(links, item.depth + 1, events)
+        for link in frontier.external_links(): ...
+    """
+
+    def __init__(
+        self,
+        start_url: str,
+        budget: int = CRAWL_PAGE_BUDGET,
+        max_depth: int = CRAWL_MAX_DEPTH,
+        external_budget: int = CRAWL_EXTERNAL_BUDGET,
+        min_score: float = CRAWL_MIN_LINK_SCORE,
+    ):
+        self.host = _site_host(start_url)
+        self.budget = budget
+        self.max_depth = max_depth
+        self.external_budget = external_budget
+        self.min_score = min_score
+        self.seen = {canonical_url(start_url)}
+        self.fetched = 1    # トップページ
+        self._heap: List[tuple] = []
+        self._order = 0
+        self._external: Dict[str, Dict] = {}
+
+    def mark_seen(self, url: str):
+        """取得済み（リダイレクト後のURLなど）として登録"""
+        self.seen.add(canonical_url(url))
+
+    def add_links(self, links: List[Dict], depth: int, parent_events: int = 0) -> int:
+        """
+        ページ内のリンクを候補に追加
+
+        Args:
+            links: {text, href} のリスト（hrefは絶対URL）
+            depth: リンク先の階層
+            parent_events: リンク元のページで見つかったイベント数
+
+        Returns:
+            追加した内部リンク数
+        """
+        if depth > self.max_depth:
+            return 0
+        added = 0
+        for link in links:
+            href = link.get('href') or ''
+            if not href.startswith('http'):
+                continue
+            text = (link.get('text') or link.get('ariaLabel') or '').strip().lower()
+
+            platform = platform_of(href)
+            if platform:
+                key = canonical_url(href)
+                if key not in self._external:
+                    self._external[key] = {'url': href, 'platform': platform, 'text': text}
+                continue
+
+            if _site_host(href) != self.host:
+                continue
+            key = canonical_url(href)
+            if key in self.seen:
+                continue
+            score = score_link(text, href, depth, parent_events)
+            if score < self.min_score:
+                continue
+            self.seen.add(key)
+            self._order += 1
+            heapq.heappush(self._heap, (-score, self._order, FrontierItem(href, depth, score, text)))
+            added += 1
+        return added
+
+    def pop(self) -> Optional[FrontierItem]:
+        """次にたどるページ（予算を使い切った・候補がなければNone）"""
+        if self.fetched >= self.budget or not self._heap:
+            return None
+        self.fetched += 1
+        return heapq.heappop(self._heap)[2]
+
+    def external_links(self) -> List[Dict]:
+        """確認する外部プラットフォームのリンク（予算内、見つかった順）"""
+        return list(self._external.values())[:self.external_budget]
+
+    @property
+    def platforms(self) -> List[str]:
+        """見つかった外部プラットフォーム名"""
+        return [link['platform'] for link in self._external.values()]
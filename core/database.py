@@ -3,21 +3,23 @@
 SQLiteを使用して施設・イベント情報を管理
 """
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 import json
 
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
-from config import DB_PATH, DATA_DIR
+from config import DB_PATH, DATA_DIR, DB_BUSY_TIMEOUT_SECONDS, DORMANT_THRESHOLD_DAYS
 
 
 def get_connection() -> sqlite3.Connection:
     """データベース接続を取得"""
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT_SECONDS)
     conn.row_factory = sqlite3.Row
+    # INSERT OR REPLACE で置き換えた行にも削除トリガー（全文検索インデックスの更新）を効かせる
+    conn.execute("PRAGMA recursive_triggers = ON")
     return conn
 
 
@@ -26,6 +28,9 @@ def init_database():
     conn = get_connection()
     cursor = conn.cursor()
     
+    # 複数プロセスの巡回ワーカーが同時に読み書きできるようWALモードにする（DBファイルに永続）
+    cursor.execute("PRAGMA journal_mode=WAL")
+    
     # 施設テーブル
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS facilities (
@@ -66,9 +71,14 @@ def init_database():
             participants_count INTEGER,
             fee TEXT,
             created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            prefecture TEXT,
             FOREIGN KEY (facility_id) REFERENCES facilities(id)
         )
     """)
+    # 既存DBへの列の追加（prefecture は会場・住所の都道府県、なければ紐付いた施設の都道府県）
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(events)")}
+    if "prefecture" not in columns:
+        cursor.execute("ALTER TABLE events ADD COLUMN prefecture TEXT")
     
     # 施設ステータス履歴テーブル
     cursor.execute("""
@@ -83,21 +93,277 @@ def init_database():
         )
     """)
     
+    # 施設ごとの取得方式（HTTP / ブラウザ）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS facility_fetch_tiers (
+            facility_id TEXT PRIMARY KEY,
+            tier TEXT NOT NULL,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            http_probed_at TEXT,
+            FOREIGN KEY (facility_id) REFERENCES facilities(id)
+        )
+    """)
+    # 既存DBへの列の追加（updated_at は取得方式が変わった日時、http_probed_at はブラウザ必須の施設でHTTPを試した日時）
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(facility_fetch_tiers)")}
+    if "http_probed_at" not in columns:
+        cursor.execute("ALTER TABLE facility_fetch_tiers ADD COLUMN http_probed_at TEXT")
+    
+    # ページ内容の指紋（変更検知用クロールキャッシュ）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS page_snapshots (
+            url TEXT NOT NULL,
+            extractor TEXT NOT NULL,
+            facility_id TEXT,
+            content_hash TEXT NOT NULL,
+            simhash TEXT NOT NULL,
+            date_signature TEXT,
+            dates TEXT,
+            latest_date TEXT,
+            first_seen TEXT,
+            last_checked TEXT,
+            last_changed TEXT,
+            change_count INTEGER DEFAULT 0,
+            PRIMARY KEY (url, extractor)
+        )
+    """)
+    
+    # ページ更新履歴
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS page_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL,
+            facility_id TEXT,
+            content_hash TEXT NOT NULL,
+            distance INTEGER,
+            changed_at TEXT NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_page_changes_facility ON page_changes(facility_id, changed_at)")
+    
+    # 施設ごとの次回チェック予定（適応的再チェック）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS facility_check_schedule (
+            facility_id TEXT PRIMARY KEY,
+            next_check_at TEXT NOT NULL,
+            last_checked_at TEXT,
+            interval_hours REAL,
+            checks INTEGER DEFAULT 0,
+            changes INTEGER DEFAULT 0,
+            consecutive_failures INTEGER DEFAULT 0,
+            FOREIGN KEY (facility_id) REFERENCES facilities(id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_check_schedule_next ON facility_check_schedule(next_check_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_facility_date ON events(facility_id, event_date)")
+    # 休眠の閾値をまたいだアクティブ施設を範囲検索で見つけるため
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_facilities_status_last_event ON facilities(status, last_event_date)")
+    
+    # イベント一覧の絞り込み・並べ替え（キーセットページング用に id を末尾に含める）
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_date_id ON events(event_date, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_score_id ON events(priority_score, id)")
+    # カレンダーの日別集計（件数・最高スコア）をインデックスだけで済ませる
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_date_score ON events(event_date, priority_score)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_source_date ON events(source, event_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_prefecture_date ON events(prefecture, event_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_facilities_prefecture ON facilities(prefecture)")
+    
+    # イベントの全文検索（trigramで日本語の部分一致に対応、events と同期するトリガー付き）
+    has_fts = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'events_fts'").fetchone()
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+                title, venue, description, content='events', tokenize='trigram'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        # FTS5・trigramのないSQLiteでは LIKE 検索で代用する
+        print(f"⚠ 全文検索インデックスを作成できません: {e}")
+    else:
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS events_fts_ai AFTER INSERT ON events BEGIN
+                INSERT INTO events_fts(rowid, title, venue, description)
+                VALUES (new.rowid, new.title, new.venue, new.description);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS events_fts_ad AFTER DELETE ON events BEGIN
+                INSERT INTO events_fts(events_fts, rowid, title, venue, description)
+                VALUES ('delete', old.rowid, old.title, old.venue, old.description);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS events_fts_au AFTER UPDATE OF title, venue, description ON events BEGIN
+                INSERT INTO events_fts(events_fts, rowid, title, venue, description)
+                VALUES ('delete', old.rowid, old.title, old.venue, old.description);
+                INSERT INTO events_fts(rowid, title, venue, description)
+                VALUES (new.rowid, new.title, new.venue, new.description);
+            END
+        """)
+        if not has_fts:
+            cursor.execute("INSERT INTO events_fts(events_fts) VALUES ('rebuild')")
+    
+    # バッチ実行（再開可能な一括処理）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS batch_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            params TEXT,
+            created_at TEXT NOT NULL,
+            finished_at TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS work_items (
+            run_id INTEGER NOT NULL,
+            item_key TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            claimed_by TEXT,
+            claimed_at TEXT,
+            result TEXT,
+            error TEXT,
+            updated_at TEXT,
+            PRIMARY KEY (run_id, item_key),
+            FOREIGN KEY (run_id) REFERENCES batch_runs(id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_work_items_state ON work_items(run_id, state)")
+    
+    # 施設のRSS/Atomフィード・サイトマップの場所（発見結果のキャッシュ）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS facility_feeds (
+            facility_id TEXT PRIMARY KEY,
+            feed_url TEXT,
+            feed_type TEXT NOT NULL,
+            discovered_at TEXT NOT NULL,
+            FOREIGN KEY (facility_id) REFERENCES facilities(id)
+        )
+    """)
+    
+    # URLの事前判定結果（HTML/PDF/404等。無効なURLは next_check_at まで再取得しない）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS url_preflight (
+            url TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            status INTEGER,
+            final_url TEXT,
+            content_type TEXT,
+            checked_at TEXT NOT NULL,
+            next_check_at TEXT NOT NULL,
+            failures INTEGER DEFAULT 0
+        )
+    """)
+    
+    # 定期実行ジョブの最終実行（停止中に逃した実行の取り戻しに使う）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scheduler_jobs (
+            name TEXT PRIMARY KEY,
+            last_scheduled_at TEXT,
+            last_started_at TEXT,
+            last_finished_at TEXT,
+            last_status TEXT,
+            last_error TEXT
+        )
+    """)
+    
+    # ジョブのリース（同じジョブを複数プロセスで同時に実行しないためのロック）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS job_leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            acquired_at TEXT NOT NULL,
+            heartbeat_at TEXT NOT NULL,
+            expires_at TEXT NOT NULL
+        )
+    """)
+    
+    # ジョブの実行履歴（所要時間・HTTPリクエスト数・キャッシュヒット・エラー）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS job_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job TEXT NOT NULL,
+            started_at TEXT NOT NULL,
+            finished_at TEXT,
+            duration_seconds REAL,
+            status TEXT NOT NULL,
+            http_requests INTEGER DEFAULT 0,
+            http_errors INTEGER DEFAULT 0,
+            cache_hits INTEGER DEFAULT 0,
+            cache_misses INTEGER DEFAULT 0,
+            error TEXT,
+            pid INTEGER,
+            host TEXT
+        )
+    """)
+    # 既存DBへの列の追加（pid・host は実行中のまま残った記録のプロセスが生きているかの確認用）
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(job_runs)")}
+    for column, column_type in (("pid", "INTEGER"), ("host", "TEXT")):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE job_runs ADD COLUMN {column} {column_type}")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_job_runs_job ON job_runs(job, started_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_job_runs_job_id ON job_runs(job, id)")
+    
+    # 画面から起動したバックグラウンド実行と進捗
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS background_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job TEXT NOT NULL,
+            status TEXT NOT NULL,
+            pid INTEGER,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            updated_at TEXT,
+            finished_at TEXT,
+            progress_done INTEGER DEFAULT 0,
+            progress_total INTEGER,
+            message TEXT,
+            log_path TEXT,
+            error TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_background_jobs_status ON background_jobs(status, job)")
+    
+    # ジョブの実行ごとのソース別件数
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS job_run_sources (
+            run_id INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            fetched INTEGER DEFAULT 0,
+            inserted INTEGER DEFAULT 0,
+            changed INTEGER DEFAULT 0,
+            errors INTEGER DEFAULT 0,
+            PRIMARY KEY (run_id, source)
+        )
+    """)
+    
     conn.commit()
     conn.close()
 
 
 def insert_facility(facility: dict) -> bool:
-    """施設を追加"""
+    """
+    施設を追加（登録済みなら基本情報だけを更新）
+    
+    判定済みのステータス・最新イベント日・登録日時は残す（初期データの再読み込みで
+    アクティブ・未判定に戻すと、日次の休眠判定の対象から外れてしまうため）。
+    """
     conn = get_connection()
     cursor = conn.cursor()
     
     try:
         cursor.execute("""
-            INSERT OR REPLACE INTO facilities 
+            INSERT INTO facilities 
             (id, name, prefecture, city, address, website, connpass_group, 
              peatix_group, doorkeeper_group, twitter, status, notes)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                name = excluded.name, prefecture = excluded.prefecture, city = excluded.city,
+                address = excluded.address, website = excluded.website,
+                connpass_group = excluded.connpass_group, peatix_group = excluded.peatix_group,
+                doorkeeper_group = excluded.doorkeeper_group, twitter = excluded.twitter,
+                notes = excluded.notes, updated_at = CURRENT_TIMESTAMP
         """, (
             facility.get('id'),
             facility.get('name'),
@@ -121,35 +387,155 @@ def insert_facility(facility: dict) -> bool:
         conn.close()
 
 
+# 都道府県はイベント自身のもの（会場・住所から）を優先し、なければ紐付いた施設のもの
+EVENT_INSERT_SQL = """
+    INSERT OR REPLACE INTO events
+    (id, facility_id, title, description, event_date, event_time,
+     venue, event_type, source, source_url, priority_score,
+     is_online, participants_limit, participants_count, fee, prefecture)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
+            COALESCE(?, (SELECT NULLIF(prefecture, '不明') FROM facilities WHERE id = ?)))
+"""
+
+
+def _event_params(event: dict) -> tuple:
+    """イベント辞書をINSERT用のパラメータに変換"""
+    return (
+        event.get('id'),
+        event.get('facility_id'),
+        event.get('title'),
+        event.get('description'),
+        event.get('event_date'),
+        event.get('event_time'),
+        event.get('venue'),
+        event.get('event_type'),
+        event.get('source'),
+        event.get('source_url'),
+        event.get('priority_score', 0),
+        1 if event.get('is_online') else 0,
+        event.get('participants_limit'),
+        event.get('participants_count'),
+        event.get('fee'),
+        event.get('prefecture') or None,
+        event.get('facility_id'),
+    )
+
+
+def dormant_threshold_date(now: Optional[datetime] = None) -> str:
+    """これより前の日付が最新イベントの施設は休眠（YYYY-MM-DD）"""
+    return ((now or datetime.now()) - timedelta(days=DORMANT_THRESHOLD_DAYS)).strftime("%Y-%m-%d")
+
+
+def latest_event_dates(events: list) -> dict:
+    """施設に紐付いたイベントの施設ごとの最新日（施設ID → 日付）"""
+    latest = {}
+    for event in events:
+        facility_id, event_date = event.get('facility_id'), event.get('event_date')
+        if facility_id and event_date and event_date > latest.get(facility_id, ""):
+            latest[facility_id] = event_date
+    return latest
+
+
+def apply_event_dates(cursor: sqlite3.Cursor, latest: dict, now: Optional[datetime] = None) -> list:
+    """
+    イベントの書き込みと同じトランザクションで施設の last_event_date を進め、
+    閾値内のイベントが届いた新規・休眠施設をアクティブにする（閉鎖済みは変えない）
+    
+    Args:
+        cursor: イベントを書き込んだトランザクションのカーソル
+        latest: 施設ID → 今回書き込んだイベントの最新日
+    
+    Returns:
+        アクティブにした施設ID
+    """
+    if not latest:
+        return []
+    now = now or datetime.now()
+    updated_at = now.isoformat()
+    cursor.executemany("""
+        UPDATE facilities SET last_event_date = ?, updated_at = ?
+        WHERE id = ? AND (last_event_date IS NULL OR last_event_date < ?)
+    """, [(date, updated_at, facility_id, date) for facility_id, date in latest.items()])
+    
+    threshold = dormant_threshold_date(now)
+    candidates = [facility_id for facility_id, date in latest.items() if date >= threshold]
+    if not candidates:
+        return []
+    rows = cursor.execute(f"""
+        SELECT id, status FROM facilities
+        WHERE id IN ({",".join("?" * len(candidates))}) AND status IN ('new', 'dormant')
+    """, candidates).fetchall()
+    if not rows:
+        return []
+    cursor.executemany("UPDATE facilities SET status = 'active', updated_at = ? WHERE id = ?",
+                       [(updated_at, row['id']) for row in rows])
+    cursor.executemany("""
+        INSERT INTO facility_status_history (facility_id, old_status, new_status, reason)
+        VALUES (?, ?, 'active', ?)
+    """, [(row['id'], row['status'],
+           "初回イベントが開催されました" if row['status'] == 'new' else "新規イベントが検出されました")
+          for row in rows])
+    return [row['id'] for row in rows]
+
+
+def demote_stale_facilities(threshold_date: str, reason: str) -> list:
+    """
+    最新イベントが閾値より前になったアクティブ施設を休眠にする
+    
+    (status, last_event_date) のインデックスの範囲検索で候補だけを読み、
+    last_event_date がイベントより古い施設はイベントの最新日で補正して対象から外す。
+    last_event_date が未設定のアクティブ施設（初期データの読み込み直後など）も候補にし、
+    イベントの最新日で補完して判定する。イベントが1件もなければ未判定（new）に戻す
+    （update_all_facility_statuses() と同じ判定）。
+    
+    Returns:
+        ステータスを変えた施設（id, name, last_event_date, status）
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        candidates = cursor.execute("""
+            SELECT id, name, last_event_date FROM facilities
+            WHERE status = 'active' AND (last_event_date < ? OR last_event_date IS NULL)
+        """, (threshold_date,)).fetchall()
+        
+        now = datetime.now().isoformat()
+        changed, refreshed = [], []
+        for row in candidates:
+            latest = cursor.execute("SELECT MAX(event_date) AS latest FROM events WHERE facility_id = ?",
+                                    (row['id'],)).fetchone()['latest']
+            if latest and latest >= threshold_date:
+                refreshed.append((latest, now, row['id']))
+                continue
+            last_event_date = max(filter(None, (latest, row['last_event_date'])), default=None)
+            changed.append({**dict(row), "last_event_date": last_event_date,
+                            "status": "dormant" if last_event_date else "new"})
+        
+        cursor.executemany("UPDATE facilities SET last_event_date = ?, updated_at = ? WHERE id = ?", refreshed)
+        cursor.executemany("UPDATE facilities SET status = ?, last_event_date = ?, updated_at = ? WHERE id = ?",
+                           [(f['status'], f['last_event_date'], now, f['id']) for f in changed])
+        cursor.executemany("""
+            INSERT INTO facility_status_history (facility_id, old_status, new_status, reason)
+            VALUES (?, 'active', ?, ?)
+        """, [(f['id'], f['status'], reason if f['status'] == 'dormant' else "イベント実績なし") for f in changed])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return changed
+
+
 def insert_event(event: dict) -> bool:
-    """イベントを追加"""
+    """イベントを追加（施設に紐付いていれば施設の最新イベント日・ステータスも更新）"""
     conn = get_connection()
     cursor = conn.cursor()
     
     try:
-        cursor.execute("""
-            INSERT OR REPLACE INTO events 
-            (id, facility_id, title, description, event_date, event_time, 
-             venue, event_type, source, source_url, priority_score, 
-             is_online, participants_limit, participants_count, fee)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            event.get('id'),
-            event.get('facility_id'),
-            event.get('title'),
-            event.get('description'),
-            event.get('event_date'),
-            event.get('event_time'),
-            event.get('venue'),
-            event.get('event_type'),
-            event.get('source'),
-            event.get('source_url'),
-            event.get('priority_score', 0),
-            1 if event.get('is_online') else 0,
-            event.get('participants_limit'),
-            event.get('participants_count'),
-            event.get('fee'),
-        ))
+        cursor.execute(EVENT_INSERT_SQL, _event_params(event))
+        apply_event_dates(cursor, latest_event_dates([event]))
         conn.commit()
         return True
     except Exception as e:
@@ -159,6 +545,44 @@ def insert_event(event: dict) -> bool:
         conn.close()
 
 
+def insert_events_bulk(events: list) -> List[bool]:
+    """
+    イベントを1トランザクションでまとめて追加
+    （施設に紐付いたイベントは同じトランザクションで施設の最新イベント日・ステータスも更新）
+
+    Returns:
+        events と同じ順の、1件ごとの書き込み成否
+    """
+    if not events:
+        return []
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.executemany(EVENT_INSERT_SQL, [_event_params(e) for e in events])
+        apply_event_dates(cursor, latest_event_dates(events))
+        conn.commit()
+        return [True] * len(events)
+    except Exception as e:
+        # 1件の不正データでバッチ全体を失わないよう1件ずつ再試行
+        conn.rollback()
+        print(f"Error bulk inserting events: {e}")
+        results = []
+        for event in events:
+            try:
+                cursor.execute(EVENT_INSERT_SQL, _event_params(event))
+                results.append(True)
+            except Exception as row_error:
+                print(f"Error inserting event: {row_error}")
+                results.append(False)
+        apply_event_dates(cursor, latest_event_dates([e for e, ok in zip(events, results) if ok]))
+        conn.commit()
+        return results
+    finally:
+        conn.close()
+
+
 def get_all_facilities(status: Optional[str] = None) -> list:
     """全施設を取得"""
     conn = get_connection()
@@ -288,6 +712,408 @@ def update_facility_status(facility_id: str, new_status: str, last_event_date: s
     conn.close()
 
 
+def get_fetch_tier(facility_id: str) -> Optional[dict]:
+    """施設で前回成功した取得方式を取得"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM facility_fetch_tiers WHERE facility_id = ?", (facility_id,))
+    row = cursor.fetchone()
+    conn.close()
+    
+    return dict(row) if row else None
+
+
+def set_fetch_tier(facility_id: str, tier: str, http_probed: bool = False):
+    """
+    施設で成功した取得方式を記録
+
+    行を書き換えるのは方式が変わったときと、http_probed（HTTPを試した上でこの方式になった）のときだけ。
+    """
+    now = datetime.now().isoformat()
+    conn = get_connection()
+    conn.execute("""
+        INSERT INTO facility_fetch_tiers (facility_id, tier, updated_at, http_probed_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(facility_id) DO UPDATE SET
+            tier = excluded.tier,
+            updated_at = CASE WHEN tier != excluded.tier THEN excluded.updated_at ELSE updated_at END,
+            http_probed_at = COALESCE(excluded.http_probed_at, http_probed_at)
+        WHERE tier != excluded.tier OR excluded.http_probed_at IS NOT NULL
+    """, (facility_id, tier, now, now if http_probed else None))
+    conn.commit()
+    conn.close()
+
+
+def get_page_snapshot(url: str, extractor: str) -> Optional[dict]:
+    """URLの前回クロール時の指紋と抽出結果を取得"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM page_snapshots WHERE url = ? AND extractor = ?", (url, extractor))
+    row = cursor.fetchone()
+    conn.close()
+    
+    if not row:
+        return None
+    snapshot = dict(row)
+    snapshot["dates"] = json.loads(snapshot["dates"]) if snapshot["dates"] else []
+    return snapshot
+
+
+def save_page_snapshot(snapshot: dict, changed: bool, distance: Optional[int] = None):
+    """
+    指紋と抽出結果を保存（変更があれば更新履歴にも記録）
+    
+    Args:
+        snapshot: url, extractor, facility_id, content_hash, simhash, date_signature, dates, latest_date
+        changed: 前回から内容が変わったか（初回もTrue）
+        distance: 前回とのSimHashのハミング距離（初回はNone）
+    """
+    now = datetime.now().isoformat()
+    conn = get_connection()
+    try:
+        if changed:
+            conn.execute("""
+                INSERT INTO page_snapshots (
+                    url, extractor, facility_id, content_hash, simhash, date_signature, dates, latest_date,
+                    first_seen, last_checked, last_changed, change_count
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+                ON CONFLICT(url, extractor) DO UPDATE SET
+                    facility_id = excluded.facility_id,
+                    content_hash = excluded.content_hash,
+                    simhash = excluded.simhash,
+                    date_signature = excluded.date_signature,
+                    dates = excluded.dates,
+                    latest_date = excluded.latest_date,
+                    last_checked = excluded.last_checked,
+                    last_changed = excluded.last_changed,
+                    change_count = change_count + 1
+            """, (
+                snapshot["url"], snapshot["extractor"], snapshot.get("facility_id"),
+                snapshot["content_hash"], snapshot["simhash"], snapshot.get("date_signature"),
+                json.dumps(snapshot.get("dates", []), ensure_ascii=False),
+                snapshot.get("latest_date"), now, now, now
+            ))
+            conn.execute("""
+                INSERT INTO page_changes (url, facility_id, content_hash, distance, changed_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (snapshot["url"], snapshot.get("facility_id"), snapshot["content_hash"], distance, now))
+        else:
+            conn.execute(
+                "UPDATE page_snapshots SET last_checked = ? WHERE url = ? AND extractor = ?",
+                (now, snapshot["url"], snapshot["extractor"])
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def get_page_change_history(facility_id: str, limit: int = 50) -> list:
+    """施設ページの更新履歴を取得（新しい順）"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT url, content_hash, distance, changed_at FROM page_changes
+        WHERE facility_id = ?
+        ORDER BY changed_at DESC
+        LIMIT ?
+    """, (facility_id, limit))
+    rows = cursor.fetchall()
+    conn.close()
+    
+    return [dict(row) for row in rows]
+
+
+def get_facility_feed(facility_id: str) -> Optional[dict]:
+    """施設のフィード発見結果を取得"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM facility_feeds WHERE facility_id = ?", (facility_id,))
+    row = cursor.fetchone()
+    conn.close()
+    
+    return dict(row) if row else None
+
+
+def save_facility_feed(facility_id: str, feed_url: Optional[str], feed_type: str):
+    """施設のフィード発見結果を保存（見つからなかった場合は feed_type='none'）"""
+    conn = get_connection()
+    conn.execute("""
+        INSERT INTO facility_feeds (facility_id, feed_url, feed_type, discovered_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(facility_id) DO UPDATE SET
+            feed_url = excluded.feed_url,
+            feed_type = excluded.feed_type,
+            discovered_at = excluded.discovered_at
+    """, (facility_id, feed_url, feed_type, datetime.now().isoformat()))
+    conn.commit()
+    conn.close()
+
+
+def get_url_preflight(url: str) -> Optional[dict]:
+    """URLの事前判定結果を取得"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM url_preflight WHERE url = ?", (url,))
+    row = cursor.fetchone()
+    conn.close()
+    
+    return dict(row) if row else None
+
+
+def save_url_preflight(record: dict):
+    """URLの事前判定結果を保存"""
+    conn = get_connection()
+    conn.execute("""
+        INSERT INTO url_preflight (url, kind, status, final_url, content_type, checked_at, next_check_at, failures)
+        VALUES (:url, :kind, :status, :final_url, :content_type, :checked_at, :next_check_at, :failures)
+        ON CONFLICT(url) DO UPDATE SET
+            kind = excluded.kind,
+            status = excluded.status,
+            final_url = excluded.final_url,
+            content_type = excluded.content_type,
+            checked_at = excluded.checked_at,
+            next_check_at = excluded.next_check_at,
+            failures = excluded.failures
+    """, record)
+    conn.commit()
+    conn.close()
+
+
+def get_scheduler_jobs() -> dict:
+    """定期実行ジョブの最終実行状況を取得（ジョブ名 → 状況）"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM scheduler_jobs")
+    rows = cursor.fetchall()
+    conn.close()
+    
+    return {row["name"]: dict(row) for row in rows}
+
+
+def save_scheduler_job(name: str, **fields):
+    """定期実行ジョブの実行状況を更新（指定した列のみ）"""
+    columns = [c for c in ("last_scheduled_at", "last_started_at", "last_finished_at", "last_status", "last_error")
+               if c in fields]
+    conn = get_connection()
+    conn.execute(f"""
+        INSERT INTO scheduler_jobs (name{"".join(", " + c for c in columns)})
+        VALUES (?{", ?" * len(columns)})
+        ON CONFLICT(name) DO UPDATE SET {", ".join(f"{c} = excluded.{c}" for c in columns) or "name = name"}
+    """, (name, *(fields[c] for c in columns)))
+    conn.commit()
+    conn.close()
+
+
+def start_job_run(job: str, started_at: str, status: str, pid: Optional[int] = None, host: Optional[str] = None) -> int:
+    """ジョブの実行開始を記録し、実行IDを返す"""
+    conn = get_connection()
+    cursor = conn.execute("INSERT INTO job_runs (job, started_at, status, pid, host) VALUES (?, ?, ?, ?, ?)",
+                          (job, started_at, status, pid, host))
+    conn.commit()
+    run_id = cursor.lastrowid
+    conn.close()
+    return run_id
+
+
+def finish_job_run(run_id: int, run: dict, sources: dict):
+    """ジョブの実行結果とソース別件数を1トランザクションで記録"""
+    conn = get_connection()
+    try:
+        conn.execute("""
+            UPDATE job_runs SET finished_at = :finished_at, duration_seconds = :duration_seconds,
+                status = :status, http_requests = :http_requests, http_errors = :http_errors,
+                cache_hits = :cache_hits, cache_misses = :cache_misses, error = :error
+            WHERE id = :id
+        """, {**run, "id": run_id})
+        conn.executemany("""
+            INSERT OR REPLACE INTO job_run_sources (run_id, source, fetched, inserted, changed, errors)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [(run_id, source, c["fetched"], c["inserted"], c["changed"], c["errors"]) for source, c in sources.items()])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def get_running_job_runs(host: str) -> list:
+    """指定ホストで実行中のまま記録されている実行（id・job・pid）"""
+    conn = get_connection()
+    rows = conn.execute("SELECT id, job, pid FROM job_runs WHERE status = 'running' AND host = ?", (host,)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def fail_job_runs(run_ids: List[int], finished_at: str, error: str):
+    """実行中のままの記録を失敗にする（プロセスが終了していた実行）"""
+    conn = get_connection()
+    conn.executemany("UPDATE job_runs SET status = 'failed', finished_at = ?, error = ? WHERE id = ? AND status = 'running'",
+                     [(finished_at, error, run_id) for run_id in run_ids])
+    conn.commit()
+    conn.close()
+
+
+def prune_job_runs(before: str) -> int:
+    """指定日時より前に始まった実行の記録とソース別件数を削除し、削除した実行数を返す"""
+    conn = get_connection()
+    try:
+        conn.execute("DELETE FROM job_run_sources WHERE run_id IN (SELECT id FROM job_runs WHERE started_at < ?)", (before,))
+        deleted = conn.execute("DELETE FROM job_runs WHERE started_at < ?", (before,)).rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    return deleted
+
+
+def get_job_runs(job: Optional[str] = None, since: Optional[str] = None, limit: int = 500) -> list:
+    """ジョブの実行履歴を新しい順に取得（ソース別件数は sources に入れる）"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    query = "SELECT * FROM job_runs WHERE 1=1"
+    params = []
+    if job:
+        query += " AND job = ?"
+        params.append(job)
+    if since:
+        query += " AND started_at >= ?"
+        params.append(since)
+    query += " ORDER BY started_at DESC LIMIT ?"
+    params.append(limit)
+    
+    runs = [dict(row) for row in cursor.execute(query, params).fetchall()]
+    if runs:
+        by_id = {run["id"]: run for run in runs}
+        for run in runs:
+            run["sources"] = {}
+        rows = cursor.execute(
+            f"SELECT * FROM job_run_sources WHERE run_id IN ({','.join('?' * len(by_id))})", list(by_id)
+        ).fetchall()
+        for row in rows:
+            counts = dict(row)
+            by_id[counts.pop("run_id")]["sources"][counts.pop("source")] = counts
+    conn.close()
+    return runs
+
+
+def get_job_run_summary() -> dict:
+    """ジョブごとの実行回数（状態別）と最新の実行・最新の成功（ジョブ名 → 集計）"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    summary = {}
+    for row in cursor.execute("SELECT job, status, COUNT(*) AS runs FROM job_runs GROUP BY job, status"):
+        summary.setdefault(row["job"], {"runs": {}, "last": None, "last_success": None})["runs"][row["status"]] = row["runs"]
+    for row in cursor.execute("""
+        SELECT * FROM job_runs
+        WHERE id IN (SELECT MAX(id) FROM job_runs WHERE finished_at IS NOT NULL GROUP BY job)
+    """).fetchall():
+        summary[row["job"]]["last"] = {**dict(row), "sources": {}}
+    last_runs = {info["last"]["id"]: info["last"] for info in summary.values() if info["last"]}
+    if last_runs:
+        for row in cursor.execute(
+            f"SELECT * FROM job_run_sources WHERE run_id IN ({','.join('?' * len(last_runs))})", list(last_runs)
+        ).fetchall():
+            counts = dict(row)
+            last_runs[counts.pop("run_id")]["sources"][counts.pop("source")] = counts
+    for row in cursor.execute("SELECT job, MAX(finished_at) AS finished_at FROM job_runs WHERE status = 'success' GROUP BY job"):
+        summary[row["job"]]["last_success"] = row["finished_at"]
+    conn.close()
+    return summary
+
+
+def create_background_job(job: str, created_at: str) -> int:
+    """バックグラウンド実行を登録し、IDを返す"""
+    conn = get_connection()
+    cursor = conn.execute("INSERT INTO background_jobs (job, status, created_at, updated_at) VALUES (?, 'queued', ?, ?)",
+                          (job, created_at, created_at))
+    conn.commit()
+    job_id = cursor.lastrowid
+    conn.close()
+    return job_id
+
+
+def update_background_job(job_id: int, **fields):
+    """バックグラウンド実行の状況を更新（指定した列のみ）"""
+    columns = [c for c in ("status", "pid", "started_at", "updated_at", "finished_at",
+                           "progress_done", "progress_total", "message", "log_path", "error")
+               if c in fields]
+    if not columns:
+        return
+    conn = get_connection()
+    conn.execute(f"UPDATE background_jobs SET {', '.join(f'{c} = ?' for c in columns)} WHERE id = ?",
+                 (*(fields[c] for c in columns), job_id))
+    conn.commit()
+    conn.close()
+
+
+def get_background_job(job_id: int) -> Optional[dict]:
+    """バックグラウンド実行を1件取得"""
+    conn = get_connection()
+    row = conn.execute("SELECT * FROM background_jobs WHERE id = ?", (job_id,)).fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+
+def get_background_jobs(active_only: bool = False, limit: int = 20) -> list:
+    """バックグラウンド実行を新しい順に取得（active_only なら待機中・実行中のみ）"""
+    conn = get_connection()
+    query = "SELECT * FROM background_jobs"
+    if active_only:
+        query += " WHERE status IN ('queued', 'running')"
+    rows = conn.execute(query + " ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def get_check_schedules() -> dict:
+    """全施設の次回チェック予定を取得（facility_id → 予定）"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM facility_check_schedule")
+    rows = cursor.fetchall()
+    conn.close()
+    
+    return {row["facility_id"]: dict(row) for row in rows}
+
+
+def save_check_schedule(schedule: dict):
+    """施設の次回チェック予定を保存"""
+    conn = get_connection()
+    conn.execute("""
+        INSERT INTO facility_check_schedule (
+            facility_id, next_check_at, last_checked_at, interval_hours,
+            checks, changes, consecutive_failures
+        ) VALUES (:facility_id, :next_check_at, :last_checked_at, :interval_hours,
+                  :checks, :changes, :consecutive_failures)
+        ON CONFLICT(facility_id) DO UPDATE SET
+            next_check_at = excluded.next_check_at,
+            last_checked_at = excluded.last_checked_at,
+            interval_hours = excluded.interval_hours,
+            checks = excluded.checks,
+            changes = excluded.changes,
+            consecutive_failures = excluded.consecutive_failures
+    """, schedule)
+    conn.commit()
+    conn.close()
+
+
+def get_next_event_dates(facility_ids: list, from_date: Optional[str] = None) -> dict:
+    """施設ごとの次回（from_date以降で最も近い）イベント日を取得"""
+    if not facility_ids:
+        return {}
+    from_date = from_date or datetime.now().strftime('%Y-%m-%d')
+    conn = get_connection()
+    cursor = conn.cursor()
+    placeholders = ",".join("?" * len(facility_ids))
+    cursor.execute(f"""
+        SELECT facility_id, MIN(event_date) AS next_date FROM events
+        WHERE facility_id IN ({placeholders}) AND event_date >= ?
+        GROUP BY facility_id
+    """, (*facility_ids, from_date))
+    rows = cursor.fetchall()
+    conn.close()
+    
+    return {row["facility_id"]: row["next_date"] for row in rows}
+
+
 def get_upcoming_events(days: int = 30, min_score: int = 0) -> list:
     """今後のイベントを取得"""
     conn = get_connection()
@@ -0,0 +1,214 @@
+"""
+日付抽出エンジン
+スクレイパーと活動判定で共通利用する日付抽出処理
+
+全ての日付表記を名前付きグループで1本の正規表現にまとめてコンパイルし、
+ページテキストを1回走査するだけで全ての日付候補を取り出す。
+- 西暦: 2026年2月4日 / 2026/2/4 / 2026-02-04 / 2026.02.04
+- 和暦: 令和8年2月4日 / 令和元年5月1日 / R8.2.4
+- 月日: 2月4日 / 2/4（基準日から年を推定）
+- 相対: 更新日：本日・昨日更新・3日前・2週間前・1ヶ月前
+  （「本日の開館時間」のような定型文を日付と取り違えないよう、今日・本日などの語は
+  更新・投稿・公開・掲載・配信と並んでいるときだけ日付とみなす）
+"""
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from dateutil.relativedelta import relativedelta
+
+
+# 令和元年 = 2019年
+REIWA_OFFSET = 2018
+
+# 西暦・和暦（常に有効）
+_FULL_DATE_PATTERNS = [
+    r'(?<!\d)(?P<ky>\d{4})年\s*(?P<km>\d{1,2})月\s*(?P<kd>\d{1,2})日?',
+    r'(?<!\d)(?P<sy>\d{4})(?P<sep>[/\-.])(?P<sm>\d{1,2})(?P=sep)(?P<sd>\d{1,2})(?!\d)',
+    r'令和\s*(?P<ry>\d{1,2}|元)年\s*(?P<rm>\d{1,2})月\s*(?P<rd>\d{1,2})日',
+    r'(?<![A-Za-z])R(?P<ay>\d{1,2})[./](?P<am>\d{1,2})[./](?P<ad>\d{1,2})(?!\d)',
+]
+
+# 月日のみ
+_MONTH_DAY_PATTERNS = [
+    r'(?<!\d)(?P<jm>\d{1,2})月\s*(?P<jd>\d{1,2})日',
+    r'(?<![\d/])(?P<nm>\d{1,2})/(?P<nd>\d{1,2})(?![\d/])',
+]
+
+# 相対の語を日付とみなす前後の語（同じ行にあるときのみ。core.date_harvester のページ内スクリプトでも使う）
+RELATIVE_CONTEXT_WORDS = '更新|投稿|公開|掲載|配信'
+
+# 相対表記（「3日前まで」のような期限は除く）
+_RELATIVE_PATTERNS = [
+    rf'(?:{RELATIVE_CONTEXT_WORDS})[^\S\n]*(?:日時?)?[^\S\n]*[:：]?[^\S\n]*(?P<word>一昨日|今日|本日|昨日|明日)',
+    rf'(?P<word_before>一昨日|今日|本日|昨日|明日)[^\S\n]*の?[^\S\n]*(?:{RELATIVE_CONTEXT_WORDS})',
+    r'(?<!\d)(?P<num>\d{1,3})\s*(?P<unit>分|時間|日|週間|[かヶケカ]月)前(?!まで)',
+]
+
+_RELATIVE_WORDS = {'一昨日': -2, '昨日': -1, '今日': 0, '本日': 0, '明日': 1}
+
+_TIME_PATTERN = re.compile(r'(\d{1,2}):(\d{2})')
+
+
+class DateMatch(NamedTuple):
+    """抽出された日付候補"""
+    date: datetime
+    start: int
+    end: int
+    kind: str   # 'ymd' / 'reiwa' / 'md' / 'relative'
+    text: str
+
+
+@lru_cache(maxsize=None)
+def _compile(allow_month_day: bool, allow_relative: bool) -> 're.Pattern':
+    """有効な表記を1本の正規表現に結合してコンパイル（組み合わせごとにキャッシュ）"""
+    parts = list(_FULL_DATE_PATTERNS)
+    if allow_month_day:
+        parts += _MONTH_DAY_PATTERNS
+    if allow_relative:
+        parts += _RELATIVE_PATTERNS
+    # 先読みで日付の先頭になり得ない文字を即座に読み飛ばす（全候補の試行を避ける）
+    return re.compile(r'(?=[\d令R今本昨明一更投公掲配])(?:' + '|'.join(f'(?:{p})' for p in parts) + ')')
+
+
+class DateExtractor:
+    """
+    基準日を注入できる日付抽出器
+
+    Args:
+        reference_date: 月日・相対表記の解釈に使う基準日（省略時は現在日時）
+        month_day_policy: 年なし月日の年推定方法
+            'forward' - 基準月より前の月は翌年（今後のイベント一覧向け）
+            'backward' - 基準月より後の月は前年（お知らせ・更新履歴向け）
+            'current' - 常に基準年
+        allow_month_day: 月日のみの表記を抽出するか
+        allow_relative: 相対表記を抽出するか
+        min_year / max_year: 有効とみなす年の範囲（省略時は基準年-6〜+4）
+    """
+
+    def __init__(
+        self,
+        reference_date: Optional[datetime] = None,
+        month_day_policy: str = 'forward',
+        allow_month_day: bool = True,
+        allow_relative: bool = True,
+        min_year: Optional[int] = None,
+        max_year: Optional[int] = None,
+    ):
+        self.reference_date = reference_date or datetime.now()
+        self.month_day_policy = month_day_policy
+        self.min_year = min_year if min_year is not None else self.reference_date.year - 6
+        self.max_year = max_year if max_year is not None else self.reference_date.year + 4
+        self.pattern = _compile(allow_month_day, allow_relative)
+
+    def _build(self, year: int, month: int, day: int) -> Optional[datetime]:
+        if not (self.min_year <= year <= self.max_year):
+            return None
+        try:
+            return datetime(year, month, day)
+        except ValueError:
+            return None
+
+    def _infer_year(self, month: int) -> int:
+        year = self.reference_date.year
+        if self.month_day_policy == 'forward' and month < self.reference_date.month:
+            return year + 1
+        if self.month_day_policy == 'backward' and month > self.reference_date.month:
+            return year - 1
+        return year
+
+    def _convert(self, match: 're.Match') -> Optional[Tuple[datetime, str]]:
+        """マッチした分岐（最後に確定した名前付きグループ）に応じてdatetimeを組み立てる"""
+        branch = match.lastgroup
+        group = match.group
+        if branch == 'kd':
+            return self._build(int(group('ky')), int(group('km')), int(group('kd'))), 'ymd'
+        if branch == 'sd':
+            return self._build(int(group('sy')), int(group('sm')), int(group('sd'))), 'ymd'
+        if branch == 'rd':
+            era_year = 1 if group('ry') == '元' else int(group('ry'))
+            return self._build(REIWA_OFFSET + era_year, int(group('rm')), int(group('rd'))), 'reiwa'
+        if branch == 'ad':
+            return self._build(REIWA_OFFSET + int(group('ay')), int(group('am')), int(group('ad'))), 'reiwa'
+        if branch in ('jd', 'nd'):
+            month = int(group('jm') if branch == 'jd' else group('nm'))
+            return self._build(self._infer_year(month), month, int(group(branch))), 'md'
+
+        base = self.reference_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        if branch in ('word', 'word_before'):
+            return base + timedelta(days=_RELATIVE_WORDS[group(branch)]), 'relative'
+        if branch == 'unit':
+            num, unit = int(group('num')), group('unit')
+            if unit in ('分', '時間'):
+                moment = self.reference_date - (
+                    timedelta(minutes=num) if unit == '分' else timedelta(hours=num)
+                )
+                return moment.replace(hour=0, minute=0, second=0, microsecond=0), 'relative'
+            if unit == '日':
+                return base - timedelta(days=num), 'relative'
+            if unit == '週間':
+                return base - timedelta(weeks=num), 'relative'
+            return base - relativedelta(months=num), 'relative'
+        return None
+
+    def iter_matches(self, text: str) -> Iterator[DateMatch]:
+        """テキストを1回走査して日付候補を順に返す"""
+        if not text:
+            return
+        for match in self.pattern.finditer(text):
+            converted = self._convert(match)
+            if converted and converted[0]:
+                date, kind = converted
+                yield DateMatch(date, match.start(), match.end(), kind, match.group())
+
+    def extract_dates(self, text: str) -> List[datetime]:
+        """テキストから全ての日付を抽出（出現順）"""
+        return [m.date for m in self.iter_matches(text)]
+
+    def extract_dates_with_context(self, text: str, context_chars: int = 100) -> List[Tuple[datetime, str]]:
+        """
+        テキストから日付とその行の文脈を抽出
+
+        Returns:
+            日付の重複を除いた (日付, 文脈) のリスト（日付降順）
+        """
+        by_date = {}
+        for m in self.iter_matches(text):
+            key = m.date.date()
+            if key in by_date:
+                continue
+            line_start = text.rfind('\n', 0, m.start) + 1
+            line_end = text.find('\n', m.end)
+            if line_end == -1:
+                line_end = len(text)
+            by_date[key] = (m.date, text[line_start:line_end].strip()[:context_chars])
+        return sorted(by_date.values(), key=lambda x: x[0], reverse=True)
+
+    def parse_first(self, text: str) -> Optional[datetime]:
+        """テキスト中の最初の日付を返す"""
+        return next((m.date for m in self.iter_matches(text)), None)
+
+    def parse_date_text(self, date_text: str) -> tuple:
+        """
+        イベントカードの日時テキストをパース
+
+        Returns:
+            (event_date, event_time) タプル（取得できない場合は空文字）
+        """
+        date = self.parse_first(date_text)
+        if not date:
+            return "", ""
+        time_match = _TIME_PATTERN.search(date_text)
+        event_time = f"{int(time_match.group(1)):02d}:{time_match.group(2)}" if time_match else ""
+        return date.strftime('%Y-%m-%d'), event_time
+
+
+def extract_dates(text: str, reference_date: Optional[datetime] = None, **kwargs) -> List[datetime]:
+    """テキストから全ての日付を抽出"""
+    return DateExtractor(reference_date, **kwargs).extract_dates(text)
+
+
+def parse_date_text(date_text: str, reference_date: Optional[datetime] = None) -> tuple:
+    """日時テキストを (event_date, event_time) にパース"""
+    return DateExtractor(reference_date).parse_date_text(date_text)
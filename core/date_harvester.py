@@ -0,0 +1,130 @@
+"""
+ブラウザ内での日付候補収集モジュール
+大きなポータルページの innerText 全体をCDP経由で受け取り、Python側で正規表現にかける代わりに、
+ページ内のスクリプトで日付がありそうな箇所だけを集めて (日付候補, 文脈) の組で返す。
+
+- <time datetime="..."> とそれを含む項目（li・article 等）の文字列
+- JSON-LD（schema.org）の startDate / datePublished / dateModified 等と name・headline
+- ニュース・イベント一覧らしい要素（HARVEST_LIST_SELECTOR）内の、日付を含む項目の文字列
+
+候補が HARVEST_MIN_CANDIDATES 未満のページは本文全体（innerText）にフォールバックする。
+"""
+
+from typing import List, Tuple
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import HARVEST_MIN_CANDIDATES, HARVEST_MAX_CANDIDATES, HARVEST_CONTEXT_CHARS, HARVEST_LIST_SELECTOR
+from core.date_extractor import RELATIVE_CONTEXT_WORDS
+
+
+# ページ内で実行する収集スクリプト（引数: [一覧のセレクタ, 最大件数, 文脈の最大文字数]）
+# 今日・本日などの相対の語は core.date_extractor と同じく更新・投稿などと並ぶときだけ候補にする
+HARVEST_SCRIPT = r"""
+([listSelector, limit, contextChars]) => {
+    const out = [];
+    const seen = new Set();
+    const clean = s => (s || '').replace(/\s+/g, ' ').trim();
+    const push = (date, context) => {
+        date = clean(date).slice(0, 40);
+        context = clean(context).slice(0, contextChars);
+        const key = date + '|' + context;
+        if (!date || seen.has(key) || out.length >= limit) return;
+        seen.add(key);
+        out.push([date, context]);
+    };
+    const ITEM = 'li, tr, dl, article, [class*="item"], [class*="post"], [class*="entry"], [class*="card"]';
+    const DATE = /(\d{4}\s*[年\/.\-]\s*\d{1,2}\s*[月\/.\-]\s*\d{1,2}|令和\s*(?:\d{1,2}|元)\s*年\s*\d{1,2}\s*月\s*\d{1,2}|R\d{1,2}[.\/]\d{1,2}[.\/]\d{1,2}|\d{1,2}\s*月\s*\d{1,2}\s*日|(?:__RELATIVE_CONTEXT__)[^\S\n]*(?:日時?)?[^\S\n]*[:：]?[^\S\n]*(?:一昨日|今日|本日|昨日)|(?:一昨日|今日|本日|昨日)[^\S\n]*の?[^\S\n]*(?:__RELATIVE_CONTEXT__)|\d{1,3}\s*(?:日|週間|[かヶケカ]月)前(?!まで))/;
+
+    // 1. <time datetime>
+    for (const t of document.querySelectorAll('time')) {
+        const item = t.closest(ITEM) || t.parentElement || t;
+        push(t.getAttribute('datetime') || t.innerText, item.innerText);
+    }
+
+    // 2. JSON-LD
+    const DATE_KEYS = ['startDate', 'endDate', 'datePublished', 'dateModified', 'dateCreated', 'uploadDate'];
+    const walk = (node, name, depth) => {
+        if (!node || typeof node !== 'object' || depth > 6) return;
+        if (Array.isArray(node)) { node.forEach(n => walk(n, name, depth + 1)); return; }
+        const title = node.name || node.headline || name || '';
+        for (const key of DATE_KEYS) {
+            if (typeof node[key] === 'string') push(node[key], title);
+        }
+        for (const value of Object.values(node)) walk(value, title, depth + 1);
+    };
+    for (const s of document.querySelectorAll('script[type="application/ld+json"]')) {
+        try { walk(JSON.parse(s.textContent), '', 0); } catch (e) {}
+    }
+
+    // 3. ニュース・イベント一覧の項目
+    for (const container of document.querySelectorAll(listSelector)) {
+        if (out.length >= limit) break;
+        const items = container.querySelectorAll(ITEM);
+        for (const item of (items.length ? items : [container])) {
+            const text = item.innerText || '';
+            if (text.length > 2000) continue;  // 一覧全体を包む要素は項目として扱わない
+            const match = text.match(DATE);
+            if (match) push(match[0], text);
+        }
+    }
+    return out;
+}
+""".replace("__RELATIVE_CONTEXT__", RELATIVE_CONTEXT_WORDS)
+
+
+# 本文全体（フォールバック）。DOMは変更せず、ナビ・ヘッダー・フッターの文字列を取り除く
+FULL_TEXT_SCRIPT = r"""
+(dropLayout) => {
+    let text = document.body ? document.body.innerText : '';
+    if (dropLayout) {
+        for (const el of document.querySelectorAll('nav, footer, header')) {
+            const part = el.innerText;
+            if (part) text = text.replace(part, '');
+        }
+    }
+    return text;
+}
+"""
+
+
+async def harvest_dates(page) -> List[Tuple[str, str]]:
+    """
+    ページ内で日付候補と文脈を収集
+
+    Returns:
+        (日付候補, 文脈) のリスト。スクリプトが失敗した場合は空リスト
+    """
+    try:
+        pairs = await page.evaluate(HARVEST_SCRIPT, [HARVEST_LIST_SELECTOR, HARVEST_MAX_CANDIDATES, HARVEST_CONTEXT_CHARS])
+    except Exception as e:
+        print(f"    ⚠ 日付候補の収集エラー: {e}")
+        return []
+    return [(date, context) for date, context in pairs]
+
+
+def harvest_to_text(candidates: List[Tuple[str, str]]) -> str:
+    """
+    候補を1行1件のテキストにする（DateExtractor・クロールキャッシュにそのまま渡せる形）
+
+    文脈に日付候補が含まれない場合（datetime属性・JSON-LD）は行末に候補を付ける。
+    """
+    lines = []
+    for date, context in candidates:
+        lines.append(context if date in context else f"{context} {date}".strip())
+    return "\n".join(dict.fromkeys(lines))
+
+
+async def page_text(page, drop_layout: bool = False) -> Tuple[str, bool]:
+    """
+    ページの日付候補をテキストで取得（候補が少なければ本文全体）
+
+    Returns:
+        (テキスト, 候補収集を使ったか)
+    """
+    candidates = await harvest_dates(page)
+    if len(candidates) >= HARVEST_MIN_CANDIDATES:
+        return harvest_to_text(candidates), True
+    return await page.evaluate(FULL_TEXT_SCRIPT, drop_layout), False
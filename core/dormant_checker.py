@@ -1,9 +1,13 @@
 """
 休眠施設チェッカー
 2ヶ月ルールに基づいて施設の休眠状態を判定
+
+アクティブへの昇格はイベントの書き込み時に施設ごとに行われる（core.database.apply_event_dates）。
+休眠への降格は demote_dormant_facilities() が毎日、閾値をまたいだ施設（と最新イベント日が未設定の施設）だけを処理する。
+update_all_facility_statuses() は全施設を判定し直す（手動の「データ更新」用）。
 """
 from datetime import datetime, timedelta
-from typing import Literal
+from typing import Literal, Optional
 
 import sys
 from pathlib import Path
@@ -13,8 +17,11 @@ from core.database import (
     get_all_facilities, 
     get_latest_event_date, 
     update_facility_status,
+    demote_stale_facilities,
+    dormant_threshold_date,
     get_connection
 )
+from core.background_jobs import report_progress
 
 
 FacilityStatus = Literal["active", "dormant", "new", "closed"]
@@ -53,9 +60,10 @@ def update_all_facility_statuses():
     
     status_counts = {"active": 0, "dormant": 0, "new": 0, "unchanged": 0}
     
-    for facility in facilities:
+    for i, facility in enumerate(facilities, 1):
         facility_id = facility['id']
         current_status = facility.get('status', 'active')
+        report_progress(i, len(facilities), facility['name'])
         
         # 閉鎖済みはスキップ
         if current_status == 'closed':
@@ -65,7 +73,7 @@ def update_all_facility_statuses():
         
         if new_status != current_status:
             reason = generate_status_change_reason(current_status, new_status)
-            update_facility_status(facility_id, new_status, reason)
+            update_facility_status(facility_id, new_status, get_latest_event_date(facility_id), reason=reason)
             status_counts[new_status] = status_counts.get(new_status, 0) + 1
             print(f"[STATUS CHANGED] {facility['name']}: {current_status} -> {new_status}")
         else:
@@ -74,6 +82,21 @@ def update_all_facility_statuses():
     return status_counts
 
 
+def demote_dormant_facilities(now: Optional[datetime] = None) -> list:
+    """
+    最新イベントが休眠の閾値をまたいだアクティブ施設だけを休眠にする（日次）
+
+    最新イベント日が未設定でイベントも1件もないアクティブ施設は未判定（new）に戻す。
+
+    Returns:
+        ステータスを変えた施設（id, name, last_event_date, status）
+    """
+    changed = demote_stale_facilities(dormant_threshold_date(now), f"直近{DORMANT_THRESHOLD_DAYS}日間にイベント開催なし")
+    for facility in changed:
+        print(f"[STATUS CHANGED] {facility['name']}: active -> {facility['status']}（最新イベント {facility['last_event_date'] or 'なし'}）")
+    return changed
+
+
 def generate_status_change_reason(old_status: str, new_status: str) -> str:
     """ステータス変更理由を生成"""
     if new_status == "dormant":
@@ -103,12 +126,12 @@ def get_new_facilities() -> list:
 
 def reactivate_facility(facility_id: str, reason: str = "手動で再アクティブ化"):
     """休眠施設を手動でアクティブに戻す"""
-    update_facility_status(facility_id, "active", reason)
+    update_facility_status(facility_id, "active", reason=reason)
 
 
 def mark_as_closed(facility_id: str, reason: str = "閉鎖確認"):
     """施設を閉鎖済みとしてマーク"""
-    update_facility_status(facility_id, "closed", reason)
+    update_facility_status(facility_id, "closed", reason=reason)
 
 
 def get_facility_health_report() -> dict:
@@ -136,12 +159,12 @@ def get_facility_health_report() -> dict:
         report["by_prefecture"][prefecture][status] = report["by_prefecture"][prefecture].get(status, 0) + 1
         
         if status == "dormant":
-            latest_date = get_latest_event_date(facility['id'])
+            # last_event_date はイベント書き込み時に更新されるため、施設ごとにイベントを集計し直さない
             report["dormant_list"].append({
                 "id": facility['id'],
                 "name": facility['name'],
                 "prefecture": prefecture,
-                "last_event": latest_date
+                "last_event": facility.get('last_event_date')
             })
     
     return report
@@ -0,0 +1,219 @@
+"""
+イベントデータのストリーミング出力モジュール
+全施設の結果をメモリに溜めて最後に1つのJSONへ書く代わりに、
+
+- NdjsonWriter: 施設の調査が終わるたびに1行1レコード（NDJSON）で追記
+- export_shards: NDJSONを1行ずつ読み、都道府県×開催月ごとのgzip済みNDJSONに振り分け、
+  各ファイルの件数・サイズを manifest.json にまとめる
+
+施設数が増えてもメモリ使用量は一定で、利用側は必要な都道府県・月のファイルだけを取得できる。
+
+レコードの形式:
+    {"type": "facility", ...施設の調査結果（event_list を除く）}
+    {"type": "event", "facility_id": ..., "prefecture": ..., "date": ..., "title": ..., "link": ...}
+
+出力ディレクトリの構成:
+    manifest.json
+    facilities/{都道府県コード}.ndjson.gz
+    events/{都道府県コード}/{YYYY-MM}.ndjson.gz
+"""
+
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EXPORT_MAX_OPEN_SHARDS, EXPORT_GZIP_LEVEL
+from core.facility_linker import PREFECTURES
+
+
+RECORD_FACILITY = "facility"
+RECORD_EVENT = "event"
+
+MANIFEST_NAME = "manifest.json"
+UNKNOWN_PREFECTURE_CODE = "00"
+
+
+def prefecture_code(prefecture: Optional[str]) -> str:
+    """都道府県名をJIS都道府県コード（01〜47）に変換（不明は00）"""
+    try:
+        return f"{PREFECTURES.index(prefecture) + 1:02d}"
+    except ValueError:
+        return UNKNOWN_PREFECTURE_CODE
+
+
+def facility_records(facility: Dict, result: Dict) -> Iterator[Dict]:
+    """施設の調査結果を施設レコードとイベントレコードに展開"""
+    prefecture = facility.get('prefecture', '') or result.get('prefecture', '')
+    record = {k: v for k, v in result.items() if k != 'event_list'}
+    record.update({"type": RECORD_FACILITY, "facility_id": facility.get('id'),
+                   "prefecture": prefecture, "event_count": len(result.get('event_list', []))})
+    yield record
+    for event in result.get('event_list', []):
+        yield {
+            "type": RECORD_EVENT,
+            **event,
+            "facility_id": facility.get('id'),
+            "facility_name": facility.get('name', ''),
+            "prefecture": prefecture,
+        }
+
+
+class NdjsonWriter:
+    """
+    NDJSONの追記ライター（1レコード書くごとにフラッシュ、スレッドセーフ）
+
+    使い方:
+        with NdjsonWriter("data/events.ndjson") as writer:
+            writer.write({"type": "facility", ...})
+    """
+
+    def __init__(self, path: Union[str, Path], append: bool = True):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a' if append else 'w', encoding='utf-8')
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def write(self, record: Dict):
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.count += 1
+
+    def write_facility(self, facility: Dict, result: Dict):
+        """施設の結果とイベントをまとめて追記"""
+        for record in facility_records(facility, result):
+            self.write(record)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self) -> "NdjsonWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_ndjson(path: Union[str, Path]) -> Iterator[Dict]:
+    """NDJSON（.gz も可）を1行ずつ読む（途中で途切れた最終行は飛ばす）"""
+    path = Path(path)
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+class _ShardFiles:
+    """分割ファイルのハンドルをLRUで管理（上限を超えたら閉じ、次は追記モードで開き直す）"""
+
+    def __init__(self, root: Path, max_open: int):
+        self.root = root
+        self.max_open = max_open
+        self._open: "OrderedDict[str, gzip.GzipFile]" = OrderedDict()
+        self.stats: Dict[str, Dict] = {}
+
+    def write(self, relative: str, record: Dict, meta: Dict):
+        handle = self._open.pop(relative, None)
+        if handle is None:
+            path = self.root / relative
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # 2回目以降はgzipメンバーを追加する形で追記（連結したgzipも1ファイルとして展開できる）
+            mode = 'ab' if relative in self.stats else 'wb'
+            handle = gzip.open(path, mode, compresslevel=EXPORT_GZIP_LEVEL)
+            if len(self._open) >= self.max_open:
+                _, oldest = self._open.popitem(last=False)
+                oldest.close()
+        self._open[relative] = handle
+        handle.write((json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8'))
+
+        stat = self.stats.setdefault(relative, {"path": relative, **meta, "records": 0})
+        stat["records"] += 1
+
+    def close(self):
+        for handle in self._open.values():
+            handle.close()
+        self._open.clear()
+        for relative, stat in self.stats.items():
+            stat["bytes"] = (self.root / relative).stat().st_size
+
+
+def export_shards(source: Union[str, Path], output_dir: Union[str, Path],
+                  max_open: int = EXPORT_MAX_OPEN_SHARDS) -> Dict:
+    """
+    NDJSONを都道府県×開催月のgzip済みファイルに分割し、manifest.json を書き出す
+
+    同じ施設のレコードが複数ある場合（書き込み後・完了記録前に中断し、再開時に書き直した等）は
+    最後の施設レコードとその後に続くイベントだけを使う。そのためNDJSONを2回読む。
+
+    Args:
+        source: NdjsonWriter で書いたNDJSONファイル
+        output_dir: 出力ディレクトリ（既存の分割ファイルは上書き）
+
+    Returns:
+        マニフェスト
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    shards = _ShardFiles(output_dir, max_open)
+    summary = {"total_facilities": 0, "active": 0, "dormant": 0, "total_events": 0}
+    months = {}
+
+    # 1回目: 施設ごとの施設レコードの出現回数（最後の出現だけを使う）
+    last_block: Dict = {}
+    for record in read_ndjson(source):
+        if record.get('type') == RECORD_FACILITY:
+            last_block[record.get('facility_id')] = last_block.get(record.get('facility_id'), 0) + 1
+
+    block: Dict = {}
+    try:
+        for record in read_ndjson(source):
+            facility_id = record.get('facility_id')
+            if record.get('type') == RECORD_FACILITY:
+                block[facility_id] = block.get(facility_id, 0) + 1
+            # 同じ施設の後の書き直しがある古いレコード（イベントは直前の施設レコードに属する）
+            if block.get(facility_id, 0) != last_block.get(facility_id, 0):
+                continue
+            code = prefecture_code(record.get('prefecture'))
+            if record.get('type') == RECORD_FACILITY:
+                summary["total_facilities"] += 1
+                if record.get('status') in ('active', 'dormant'):
+                    summary[record['status']] += 1
+                shards.write(f"facilities/{code}.ndjson.gz", record,
+                             {"kind": RECORD_FACILITY, "prefecture_code": code, "prefecture": record.get('prefecture', '')})
+            elif record.get('type') == RECORD_EVENT:
+                month = (record.get('date') or '')[:7] or 'unknown'
+                summary["total_events"] += 1
+                months[month] = months.get(month, 0) + 1
+                shards.write(f"events/{code}/{month}.ndjson.gz", record,
+                             {"kind": RECORD_EVENT, "prefecture_code": code,
+                              "prefecture": record.get('prefecture', ''), "month": month})
+    finally:
+        shards.close()
+
+    manifest = {
+        "generated_at": datetime.now().isoformat(),
+        "format": "ndjson+gzip",
+        "summary": summary,
+        "months": dict(sorted(months.items(), reverse=True)),
+        "shards": sorted(shards.stats.values(), key=lambda s: s["path"]),
+    }
+    with open(output_dir / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
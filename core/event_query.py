@@ -0,0 +1,211 @@
+"""
+イベント一覧の検索モジュール
+絞り込み（期間・スコア・ソース・都道府県・種別・オンライン/会場・キーワード）と並べ替えをSQLで行い、
+1ページ分だけをキーセット方式（前ページ最終行の (並べ替えキー, id) より後ろ）で取得する。
+
+- OFFSET を使わないため、何ページ目でもインデックスを先頭から数え直さない
+- 件数は同じ条件の COUNT(*) で別に数える
+- キーワードは trigram の全文検索インデックス（events_fts）で探す（短い語・FTS5がない環境は LIKE）
+
+使い方:
+    condition = EventFilter(from_date="2026-04-01", sources=("connpass",), text="ピッチ")
+    page = search_events(condition, SORT_DATE_ASC)
+    next_page = search_events(condition, SORT_DATE_ASC, after=page.next_cursor)
+"""
+
+import sqlite3
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EVENT_PAGE_SIZE, EVENT_TEXT_MIN_FTS_CHARS
+from core.database import get_connection
+from core.facility_linker import PREFECTURES
+
+
+SORT_DATE_ASC = "date_asc"
+SORT_DATE_DESC = "date_desc"
+SORT_SCORE = "score"
+
+# 並べ替え → (列, キーセットの比較演算子, 並び順)
+_SORTS = {
+    SORT_DATE_ASC: ("event_date", ">", "ASC"),
+    SORT_DATE_DESC: ("event_date", "<", "DESC"),
+    SORT_SCORE: ("priority_score", "<", "DESC"),
+}
+
+_COLUMNS = """
+    e.id, e.title, e.event_date, e.event_time, e.venue, e.event_type, e.source, e.source_url,
+    e.priority_score, e.is_online, e.fee, e.facility_id, f.name AS facility_name,
+    COALESCE(e.prefecture, f.prefecture) AS prefecture
+"""
+
+
+class EventFilter(NamedTuple):
+    """イベント一覧の絞り込み条件（ハッシュ可能なのでキャッシュのキーにできる）"""
+    from_date: Optional[str] = None
+    to_date: Optional[str] = None
+    min_score: Optional[int] = None
+    sources: Tuple[str, ...] = ()
+    prefectures: Tuple[str, ...] = ()
+    event_types: Tuple[str, ...] = ()
+    online: Optional[bool] = None
+    text: str = ""
+
+
+class EventPage(NamedTuple):
+    """1ページ分の検索結果"""
+    rows: List[Dict]
+    next_cursor: Optional[Tuple]    # 次のページの after（最終ページならNone）
+
+
+def _in(column: str, values: Tuple) -> Tuple[str, List]:
+    return f" AND {column} IN ({','.join('?' * len(values))})", list(values)
+
+
+def _has_fts(conn: sqlite3.Connection) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'events_fts'").fetchone() is not None
+
+
+def _where(conn: sqlite3.Connection, condition: EventFilter) -> Tuple[str, List]:
+    """絞り込み条件のWHERE句（events の別名は e）"""
+    sql, params = " WHERE 1=1", []
+    if condition.from_date:
+        sql += " AND e.event_date >= ?"
+        params.append(condition.from_date)
+    if condition.to_date:
+        sql += " AND e.event_date <= ?"
+        params.append(condition.to_date)
+    if condition.min_score:
+        sql += " AND e.priority_score >= ?"
+        params.append(condition.min_score)
+    if condition.sources:
+        clause, values = _in("e.source", condition.sources)
+        sql += clause
+        params += values
+    if condition.event_types:
+        clause, values = _in("e.event_type", condition.event_types)
+        sql += clause
+        params += values
+    if condition.prefectures:
+        # COALESCE(e.prefecture, 施設の都道府県) と同じ条件を、(prefecture, event_date) と
+        # (facility_id, event_date) のインデックスが使える形で書く（都道府県の補完前の行は施設側で判定）
+        marks = ','.join('?' * len(condition.prefectures))
+        sql += (f" AND (e.prefecture IN ({marks}) OR (e.prefecture IS NULL AND e.facility_id IN"
+                f" (SELECT id FROM facilities WHERE prefecture IN ({marks}))))")
+        params += list(condition.prefectures) * 2
+    if condition.online is not None:
+        sql += " AND e.is_online = ?"
+        params.append(1 if condition.online else 0)
+
+    text = condition.text.strip()
+    if text:
+        if len(text) >= EVENT_TEXT_MIN_FTS_CHARS and _has_fts(conn):
+            sql += " AND e.rowid IN (SELECT rowid FROM events_fts WHERE events_fts MATCH ?)"
+            params.append('"' + text.replace('"', '""') + '"')
+        else:
+            pattern = "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            sql += " AND (e.title LIKE ? ESCAPE '\\' OR e.venue LIKE ? ESCAPE '\\')"
+            params += [pattern, pattern]
+    return sql, params
+
+
+def search_events(condition: EventFilter, sort: str = SORT_DATE_ASC, after: Optional[Tuple] = None,
+                  limit: int = EVENT_PAGE_SIZE) -> EventPage:
+    """
+    条件に合うイベントを1ページ分取得
+
+    Args:
+        condition: 絞り込み条件
+        sort: 並べ替え（SORT_DATE_ASC / SORT_DATE_DESC / SORT_SCORE）
+        after: 前のページの next_cursor（先頭ページはNone）
+        limit: 1ページの件数
+    """
+    column, op, direction = _SORTS[sort]
+    conn = get_connection()
+    try:
+        where, params = _where(conn, condition)
+        if after is not None:
+            where += f" AND (e.{column}, e.id) {op} (?, ?)"
+            params += list(after)
+        rows = conn.execute(f"""
+            SELECT {_COLUMNS}
+            FROM events e
+            LEFT JOIN facilities f ON f.id = e.facility_id
+            {where}
+            ORDER BY e.{column} {direction}, e.id {direction}
+            LIMIT ?
+        """, params + [limit + 1]).fetchall()
+    finally:
+        conn.close()
+
+    rows = [dict(row) for row in rows]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1][column], rows[-1]["id"])
+    return EventPage(rows, next_cursor)
+
+
+def count_events(condition: EventFilter) -> int:
+    """条件に合うイベントの件数"""
+    conn = get_connection()
+    try:
+        where, params = _where(conn, condition)
+        return conn.execute(f"SELECT COUNT(*) FROM events e{where}", params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+class DaySummary(NamedTuple):
+    """1日分のイベント集計"""
+    count: int
+    max_score: int
+
+
+def event_day_summary(from_date: str, to_date: str, min_score: Optional[int] = None) -> Dict[str, DaySummary]:
+    """
+    期間内の日ごとのイベント数と最高スコア（日付 → DaySummary、イベントのない日は含まない）
+
+    (event_date, priority_score) のインデックスだけで集計し、イベントの行は読まない。
+    """
+    sql = "SELECT event_date, COUNT(*), MAX(priority_score) FROM events WHERE event_date >= ? AND event_date <= ?"
+    params = [from_date, to_date]
+    if min_score:
+        sql += " AND priority_score >= ?"
+        params.append(min_score)
+    conn = get_connection()
+    try:
+        rows = conn.execute(sql + " GROUP BY event_date", params).fetchall()
+    finally:
+        conn.close()
+    return {row[0]: DaySummary(row[1], row[2] or 0) for row in rows}
+
+
+def events_on_date(event_date: str, min_score: Optional[int] = None, limit: int = EVENT_PAGE_SIZE) -> List[Dict]:
+    """指定日のイベント（スコアの高い順）"""
+    return search_events(EventFilter(from_date=event_date, to_date=event_date, min_score=min_score),
+                         SORT_SCORE, limit=limit).rows
+
+
+def event_filter_options() -> Dict[str, List[str]]:
+    """絞り込みの選択肢（ソース・種別・都道府県）"""
+    conn = get_connection()
+    try:
+        sources = [row[0] for row in conn.execute(
+            "SELECT DISTINCT source FROM events WHERE source IS NOT NULL AND source != '' ORDER BY source")]
+        event_types = [row[0] for row in conn.execute(
+            "SELECT DISTINCT event_type FROM events WHERE event_type IS NOT NULL AND event_type != '' ORDER BY event_type")]
+        prefectures = [row[0] for row in conn.execute("""
+            SELECT DISTINCT prefecture FROM events WHERE prefecture IS NOT NULL AND prefecture != ''
+            UNION
+            SELECT f.prefecture FROM facilities f
+            WHERE f.prefecture IS NOT NULL AND f.prefecture NOT IN ('', '不明')
+              AND EXISTS (SELECT 1 FROM events e WHERE e.facility_id = f.id AND e.prefecture IS NULL)
+        """)]
+    finally:
+        conn.close()
+    prefectures.sort(key=lambda p: PREFECTURES.index(p) if p in PREFECTURES else len(PREFECTURES))
+    return {"sources": sources, "event_types": event_types, "prefectures": prefectures}
@@ -0,0 +1,371 @@
+"""
+イベント → 施設 紐付けモジュール
+施設マスタ（名称・住所・市区町村・Webサイト・各プラットフォームのグループID）から
+照合用インデックスを構築し、収集したイベントを最も可能性の高い施設に紐付ける。
+
+照合は辞書引きとトライ走査のみで行うため、1件あたりのコストは施設数に依存しない。
+"""
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+from urllib.parse import urlparse
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from core.database import get_connection, get_all_facilities, apply_event_dates, latest_event_dates
+
+
+PREFECTURES = [
+    "北海道", "青森県", "岩手県", "宮城県", "秋田県", "山形県", "福島県",
+    "茨城県", "栃木県", "群馬県", "埼玉県", "千葉県", "東京都", "神奈川県",
+    "新潟県", "富山県", "石川県", "福井県", "山梨県", "長野県", "岐阜県",
+    "静岡県", "愛知県", "三重県", "滋賀県", "京都府", "大阪府", "兵庫県",
+    "奈良県", "和歌山県", "鳥取県", "島根県", "岡山県", "広島県", "山口県",
+    "徳島県", "香川県", "愛媛県", "高知県", "福岡県", "佐賀県", "長崎県",
+    "熊本県", "大分県", "宮崎県", "鹿児島県", "沖縄県"
+]
+
+# 照合シグナルごとの重み
+LINK_WEIGHTS = {
+    "group": 100,     # connpass/Doorkeeper/PeatixのグループID一致
+    "domain": 90,     # イベントURLが施設サイト配下
+    "name": 80,       # 会場・タイトルに施設名を含む
+    "address": 70,    # 会場に施設住所を含む
+    "city": 10,       # 同じ市区町村（単独では紐付けない補助シグナル）
+}
+
+# 紐付けに必要な最低スコア
+LINK_MIN_SCORE = 60
+
+# 名称として照合する最短文字数（短すぎる名称は誤検出が多い）
+MIN_NAME_LENGTH = 4
+
+# イベントプラットフォームのドメイン（サブドメインがグループIDになる）
+PLATFORM_DOMAINS = ("connpass.com", "doorkeeper.jp", "peatix.com")
+
+_STRIP_PATTERN = re.compile(r"[\s・\-‐－―_/\\()（）「」『』【】\[\],，.．。、:：'’\"”]")
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """照合用に文字列を正規化（全角半角統一・小文字化・記号除去）"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", str(text)).lower()
+    return _STRIP_PATTERN.sub("", text)
+
+
+class TokenTrie:
+    """正規化済みトークン → 値集合 の文字トライ（テキスト中の全出現を走査）"""
+
+    _END = "\0"
+
+    def __init__(self):
+        self.root: dict = {}
+
+    def insert(self, token: str, value):
+        if not token:
+            return
+        node = self.root
+        for ch in token:
+            node = node.setdefault(ch, {})
+        node.setdefault(self._END, set()).add(value)
+
+    def find_longest_prefix(self, text: str, start: int = 0) -> Optional[Set]:
+        """text[start:]の先頭に一致する最長トークンの値集合を返す"""
+        node = self.root
+        found = None
+        for ch in text[start:]:
+            node = node.get(ch)
+            if node is None:
+                break
+            if self._END in node:
+                found = node[self._END]
+        return found
+
+    def scan(self, text: str) -> Set:
+        """テキスト中に出現する全トークンの値を返す"""
+        values: Set = set()
+        for start in range(len(text)):
+            node = self.root
+            for ch in text[start:]:
+                node = node.get(ch)
+                if node is None:
+                    break
+                if self._END in node:
+                    values |= node[self._END]
+        return values
+
+
+_PREFECTURE_TRIE = TokenTrie()
+for _pref in PREFECTURES:
+    _PREFECTURE_TRIE.insert(_pref, _pref)
+
+
+def extract_prefecture(address: Optional[str]) -> Optional[str]:
+    """住所から都道府県を抽出"""
+    if not address:
+        return None
+    text = unicodedata.normalize("NFKC", address)
+    for start in range(len(text)):
+        found = _PREFECTURE_TRIE.find_longest_prefix(text, start)
+        if found:
+            return next(iter(found))
+    return None
+
+
+def _url_keys(url: Optional[str]) -> List[str]:
+    """URLからドメイン＋パス接頭辞のキーを長い順に生成"""
+    if not url:
+        return []
+    parsed = urlparse(url.strip().lower())
+    host = parsed.netloc.split(":")[0]
+    if host.startswith("www."):
+        host = host[4:]
+    if not host:
+        return []
+    segments = [s for s in parsed.path.split("/") if s]
+    # 末尾がファイル名（index.html等）ならディレクトリまでを使う
+    if segments and "." in segments[-1]:
+        segments = segments[:-1]
+    keys = [host + "/" + "/".join(segments[:i]) for i in range(len(segments), 0, -1)]
+    keys.append(host)
+    return keys
+
+
+def _platform_group(url: Optional[str]) -> Optional[str]:
+    """connpass/Doorkeeperのイベント・グループURLからグループIDを抽出"""
+    if not url:
+        return None
+    parsed = urlparse(url.strip().lower())
+    host = parsed.netloc.split(":")[0]
+    for domain in PLATFORM_DOMAINS:
+        if host.endswith("." + domain):
+            sub = host[: -len(domain) - 1]
+            if sub and sub != "www":
+                return sub
+    # peatix.com/group/<id>
+    match = re.search(r"peatix\.com/group/([^/?#]+)", url.lower())
+    if match:
+        return match.group(1)
+    return None
+
+
+def _group_keys(value) -> List[str]:
+    """施設のグループ設定値（ID・スラッグ・URL）を照合キーに変換"""
+    if value in (None, ""):
+        return []
+    text = str(value).strip().lower()
+    keys = [text]
+    group = _platform_group(text)
+    if group:
+        keys.append(group)
+    return keys
+
+
+def _name_variants(name: Optional[str]) -> Set[str]:
+    """施設名の表記ゆれ候補を生成"""
+    if not name:
+        return set()
+    variants = {name}
+    # 「同志社大学連携型起業家育成施設（D-egg）」→ 本体名と括弧内の略称
+    for inner in re.findall(r"[（(]([^）)]+)[）)]", name):
+        variants.add(inner)
+    variants.add(re.sub(r"[（(][^）)]*[）)]", "", name))
+    return {n for n in (normalize_text(v) for v in variants) if len(n) >= MIN_NAME_LENGTH}
+
+
+class FacilityIndex:
+    """施設照合インデックス"""
+
+    def __init__(self, facilities: Iterable[dict]):
+        self.group_index: Dict[str, Set[str]] = defaultdict(set)
+        self.url_index: Dict[str, Set[str]] = defaultdict(set)
+        self.city_index: Dict[tuple, Set[str]] = defaultdict(set)
+        self.name_trie = TokenTrie()
+        self.address_trie = TokenTrie()
+        self.city_trie = TokenTrie()
+        self.prefectures: Dict[str, str] = {}
+        self.size = 0
+
+        for facility in facilities:
+            self.add(facility)
+
+    @classmethod
+    def from_database(cls) -> "FacilityIndex":
+        """DBの施設マスタからインデックスを構築"""
+        return cls(f for f in get_all_facilities() if f.get('status') != 'closed')
+
+    def add(self, facility: dict):
+        """施設をインデックスに追加"""
+        facility_id = facility.get('id')
+        if not facility_id:
+            return
+        self.size += 1
+        prefecture = facility.get('prefecture')
+        self.prefectures[facility_id] = prefecture
+
+        for field in ('connpass_group', 'peatix_group', 'doorkeeper_group'):
+            for key in _group_keys(facility.get(field)):
+                self.group_index[key].add(facility_id)
+
+        # サイトのルートとホストを登録（共有ドメインは候補数で按分され単独では紐付かない）
+        url_keys = _url_keys(facility.get('website'))
+        for key in set(url_keys[:1] + url_keys[-1:]):
+            self.url_index[key].add(facility_id)
+
+        for variant in _name_variants(facility.get('name')):
+            self.name_trie.insert(variant, facility_id)
+
+        address = normalize_text(facility.get('address'))
+        # 都道府県・市区町村だけの住所は名称照合より弱いので番地付きのみ登録
+        if address and re.search(r"\d", address):
+            self.address_trie.insert(address, facility_id)
+
+        city = normalize_text(facility.get('city'))
+        if city:
+            self.city_index[(prefecture, city)].add(facility_id)
+            self.city_trie.insert(city, city)
+
+    def _add_scores(self, scores: Dict[str, float], ids: Optional[Set[str]], weight: float):
+        """候補施設にスコアを加算（曖昧なキーは候補数で按分）"""
+        if not ids:
+            return
+        share = weight / len(ids)
+        for facility_id in ids:
+            scores[facility_id] = scores.get(facility_id, 0) + share
+
+    def score_candidates(self, event: dict) -> Dict[str, float]:
+        """イベントに対する施設候補とスコアを算出"""
+        scores: Dict[str, float] = {}
+
+        # 1. プラットフォームのグループID
+        group_ids: Set[str] = set()
+        for key in (event.get('series_id'), _platform_group(event.get('source_url'))):
+            if key not in (None, ""):
+                group_ids |= self.group_index.get(str(key).lower(), set())
+        self._add_scores(scores, group_ids, LINK_WEIGHTS["group"])
+
+        # 2. イベントURLが施設サイト配下か（最長一致のみ）
+        if not _platform_group(event.get('source_url')):
+            for key in _url_keys(event.get('source_url')):
+                if key in self.url_index:
+                    self._add_scores(scores, self.url_index[key], LINK_WEIGHTS["domain"])
+                    break
+
+        # 3. 会場・住所・タイトルに含まれる施設名と住所
+        venue = normalize_text(" ".join(
+            str(event.get(k) or "") for k in ('venue', 'address')
+        ))
+        title = normalize_text(event.get('title'))
+        self._add_scores(scores, self.name_trie.scan(venue + "|" + title), LINK_WEIGHTS["name"])
+        self._add_scores(scores, self.address_trie.scan(venue), LINK_WEIGHTS["address"])
+
+        # 4. 市区町村（既存候補の補強のみ）
+        if scores and venue:
+            prefecture = event.get('prefecture') or extract_prefecture(event.get('venue'))
+            for city in self.city_trie.scan(venue):
+                for facility_id in self.city_index.get((prefecture, city), set()):
+                    if facility_id in scores:
+                        scores[facility_id] += LINK_WEIGHTS["city"]
+
+        # 都道府県が明示されていて一致しない候補は除外
+        event_prefecture = event.get('prefecture')
+        if event_prefecture:
+            scores = {
+                fid: s for fid, s in scores.items()
+                if self.prefectures.get(fid) in (None, "", "不明", event_prefecture)
+            }
+        return scores
+
+    def match(self, event: dict) -> Optional[str]:
+        """イベントに最も一致する施設IDを返す（確信が持てない場合はNone）"""
+        scores = self.score_candidates(event)
+        if not scores:
+            return None
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        best_id, best_score = ranked[0]
+        if best_score < LINK_MIN_SCORE:
+            return None
+        if len(ranked) > 1 and ranked[1][1] == best_score:
+            return None
+        return best_id
+
+    def link(self, event: dict) -> dict:
+        """facility_id未設定のイベントに施設を紐付け、都道府県が未設定なら住所・会場から補う"""
+        if event is not None and not event.get('facility_id'):
+            facility_id = self.match(event)
+            if facility_id:
+                event['facility_id'] = facility_id
+        if event is not None and not event.get('prefecture'):
+            event['prefecture'] = extract_prefecture(event.get('address') or event.get('venue'))
+        return event
+
+
+def load_facility_index() -> FacilityIndex:
+    """DBから施設照合インデックスを読み込む"""
+    return FacilityIndex.from_database()
+
+
+def backfill_event_facilities(index: Optional[FacilityIndex] = None, batch_size: int = 1000) -> int:
+    """
+    facility_id未設定の既存イベントを一括で紐付け、都道府県が未設定のイベントを補う
+    （会場の住所から、なければ紐付いた施設から）
+
+    Returns:
+        紐付けたイベント件数
+    """
+    index = index or load_facility_index()
+    conn = get_connection()
+    read_cursor = conn.cursor()
+    write_cursor = conn.cursor()
+
+    read_cursor.execute("""
+        SELECT id, title, venue, source_url, event_date, facility_id, prefecture
+        FROM events
+        WHERE facility_id IS NULL OR facility_id = '' OR prefecture IS NULL
+    """)
+
+    # 走査中の行を書き換えないよう、照合結果を集めてから一括更新する
+    updates = []
+    linked = []
+    prefectures = []
+    try:
+        while True:
+            rows = read_cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                if not row['facility_id']:
+                    facility_id = index.match(dict(row))
+                    if facility_id:
+                        updates.append((facility_id, row['id']))
+                        linked.append({'facility_id': facility_id, 'event_date': row['event_date']})
+                if row['prefecture'] is None:
+                    prefecture = extract_prefecture(row['venue'])
+                    if prefecture:
+                        prefectures.append((prefecture, row['id']))
+        if updates:
+            write_cursor.executemany("UPDATE events SET facility_id = ? WHERE id = ?", updates)
+            # 紐付いたイベントで施設の最新イベント日・ステータスを更新
+            apply_event_dates(write_cursor, latest_event_dates(linked))
+        write_cursor.executemany("UPDATE events SET prefecture = ? WHERE id = ?", prefectures)
+        # 会場から分からないものは紐付いた施設の都道府県
+        write_cursor.execute("""
+            UPDATE events SET prefecture = (SELECT NULLIF(prefecture, '不明') FROM facilities WHERE id = events.facility_id)
+            WHERE prefecture IS NULL AND facility_id IS NOT NULL AND facility_id != ''
+        """)
+        conn.commit()
+    finally:
+        conn.close()
+
+    return len(updates)
+
+
+if __name__ == "__main__":
+    print("=== イベント → 施設 紐付け（バックフィル） ===")
+    index = load_facility_index()
+    print(f"インデックス施設数: {index.size}")
+    count = backfill_event_facilities(index)
+    print(f"紐付け完了: {count}件")
@@ -0,0 +1,334 @@
+"""
+RSS/Atomフィード・サイトマップによる活動シグナル取得モジュール
+自治体・大学系のインキュベーション施設はWordPress等のCMSでフィードやsitemap.xmlを
+公開していることが多い。数KBのフィードを読むだけで最新の更新日が分かるため、
+ページ巡回（HTTP取得・ブラウザ描画）より先に試す。
+
+- 発見: トップページの <link rel="alternate">、よくあるフィードのパス、
+  robots.txt の Sitemap 行、/sitemap.xml の順に探し、施設ごとにDBへ記録
+  （見つからなかったことも記録し、FEED_REDISCOVER_DAYS は再探索しない）
+- 読み取り: RSS の pubDate / dc:date、Atom の published / updated、
+  サイトマップの lastmod から日付を取り出す
+- 範囲: 施設URLがパスを含む場合（県・大学・機構のサイトの一部にある施設）は、
+  そのディレクトリ配下のフィード・サイトマップだけを探し、配下を指す項目だけを使う
+  （ホスト全体の更新で施設がアクティブに見えないようにする）
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lxml.html
+from lxml import etree
+
+from config import FEED_REDISCOVER_DAYS, FEED_MAX_BYTES, FEED_COMMON_PATHS
+from core.database import get_facility_feed, save_facility_feed
+from core.tiered_fetcher import fetch_bytes
+
+
+FEED_RSS = "rss"
+FEED_ATOM = "atom"
+FEED_SITEMAP = "sitemap"
+FEED_NONE = "none"
+
+JST = timezone(timedelta(hours=9))
+
+_FEED_LINK_TYPES = {
+    "application/rss+xml": FEED_RSS,
+    "application/atom+xml": FEED_ATOM,
+    "application/rdf+xml": FEED_RSS,
+}
+
+# 外部実体・ネットワーク参照は解決しない（XXE対策）
+_XML_PARSER = etree.XMLParser(recover=True, resolve_entities=False, no_network=True, huge_tree=False)
+
+
+class FeedEntry(NamedTuple):
+    """フィード・サイトマップの1項目"""
+    date: datetime
+    title: str
+    link: str
+
+
+def _local(tag) -> str:
+    """名前空間を除いたタグ名"""
+    return etree.QName(tag).localname if isinstance(tag, str) else ""
+
+
+def _child_text(element, *names: str) -> str:
+    """名前空間を問わず最初に見つかった子要素のテキスト"""
+    for child in element:
+        if _local(child.tag) in names and child.text:
+            return child.text.strip()
+    return ""
+
+
+def parse_feed_date(value: str) -> Optional[datetime]:
+    """RFC 822（RSS）・ISO 8601（Atom・サイトマップ）の日時を日本時間のnaive datetimeに変換"""
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(JST).replace(tzinfo=None)
+    return parsed
+
+
+def _parse_xml(content: bytes):
+    try:
+        return etree.fromstring(content, _XML_PARSER)
+    except (etree.XMLSyntaxError, ValueError):
+        return None
+
+
+def detect_feed_type(content: bytes) -> Optional[str]:
+    """XMLのルート要素からフィード種別を判定"""
+    root = _parse_xml(content)
+    if root is None:
+        return None
+    name = _local(root.tag)
+    if name in ("rss", "RDF"):
+        return FEED_RSS
+    if name == "feed":
+        return FEED_ATOM
+    if name in ("urlset", "sitemapindex"):
+        return FEED_SITEMAP
+    return None
+
+
+def parse_feed(content: bytes, base_url: str) -> Tuple[Optional[str], List[FeedEntry], List[FeedEntry]]:
+    """
+    フィード・サイトマップを解析
+
+    Returns:
+        (種別, 項目リスト, 子サイトマップのリスト) ※子サイトマップはサイトマップインデックスのみ
+    """
+    root = _parse_xml(content)
+    if root is None:
+        return None, [], []
+
+    name = _local(root.tag)
+    entries: List[FeedEntry] = []
+    children: List[FeedEntry] = []
+
+    if name in ("rss", "RDF"):
+        for item in root.iter("{*}item"):
+            date = parse_feed_date(_child_text(item, "pubDate", "date", "published", "updated"))
+            if date:
+                link = _child_text(item, "link")
+                entries.append(FeedEntry(date, _child_text(item, "title"), urljoin(base_url, link)))
+        return FEED_RSS, entries, children
+
+    if name == "feed":
+        for entry in root.iter("{*}entry"):
+            date = parse_feed_date(_child_text(entry, "published", "updated"))
+            if not date:
+                continue
+            link = ""
+            for child in entry:
+                if _local(child.tag) == "link" and child.get("rel", "alternate") == "alternate":
+                    link = child.get("href", "")
+                    break
+            entries.append(FeedEntry(date, _child_text(entry, "title"), urljoin(base_url, link)))
+        return FEED_ATOM, entries, children
+
+    if name in ("urlset", "sitemapindex"):
+        target = children if name == "sitemapindex" else entries
+        for url in root:
+            if _local(url.tag) not in ("url", "sitemap"):
+                continue
+            date = parse_feed_date(_child_text(url, "lastmod"))
+            loc = _child_text(url, "loc")
+            if date and loc:
+                target.append(FeedEntry(date, urlparse(loc).path or loc, loc))
+        return FEED_SITEMAP, entries, children
+
+    return None, [], []
+
+
+def site_scope(site_url: str) -> Optional[str]:
+    """
+    施設URLがパスを含むとき、その配下を表す「ホスト/ディレクトリ/」（スキームなし）
+
+    ドメイン直下のサイトはNone（絞り込まない）。拡張子のない末尾（/incubation）はディレクトリとみなす。
+    """
+    parsed = urlparse(site_url)
+    path = parsed.path or "/"
+    head, _, last = path.rpartition("/")
+    directory = head + "/" if "." in last else path.rstrip("/") + "/"
+    if directory == "/":
+        return None
+    return parsed.netloc.lower() + directory
+
+
+def in_scope(url: str, scope: Optional[str]) -> bool:
+    """URLが site_scope() の配下か（scope がNoneなら常にTrue）"""
+    if scope is None:
+        return True
+    parsed = urlparse(url)
+    return (parsed.netloc.lower() + parsed.path.rstrip("/") + "/").startswith(scope)
+
+
+def sitemap_is_reliable(entries: List[FeedEntry]) -> bool:
+    """全URLのlastmodが同じ日付のサイトマップ（生成日時を入れているだけ）は使わない"""
+    if len(entries) < 5:
+        return bool(entries)
+    return len({e.date.date() for e in entries}) > 1
+
+
+def read_feed(feed_url: str, traffic=None, scope: Optional[str] = None) -> Tuple[Optional[str], List[FeedEntry]]:
+    """
+    フィード・サイトマップを取得して項目を新しい順に返す
+
+    サイトマップインデックスは最も新しい子サイトマップを1つだけ読む。
+    scope（site_scope()）を指定すると、リンク先がその配下の項目だけを返す。
+    """
+    response = fetch_bytes(feed_url, max_bytes=FEED_MAX_BYTES)
+    if response is None:
+        return None, []
+    if traffic is not None:
+        traffic.add(len(response.content))
+    if response.status >= 400:
+        return None, []
+
+    feed_type, entries, children = parse_feed(response.content, response.final_url)
+    if feed_type == FEED_SITEMAP and children and not entries:
+        newest = max(children, key=lambda e: e.date)
+        child = fetch_bytes(newest.link, max_bytes=FEED_MAX_BYTES)
+        if child is not None and child.status < 400:
+            if traffic is not None:
+                traffic.add(len(child.content))
+            _, entries, _ = parse_feed(child.content, child.final_url)
+
+    entries = [e for e in entries if in_scope(e.link, scope)]
+    if feed_type == FEED_SITEMAP and not sitemap_is_reliable(entries):
+        return feed_type, []
+
+    # 未来日付（予約投稿・生成ミス）は除外
+    horizon = datetime.now() + timedelta(days=1)
+    entries = sorted((e for e in entries if e.date <= horizon), key=lambda e: e.date, reverse=True)
+    return feed_type, entries
+
+
+def _site_base(site_url: str) -> str:
+    """よくあるパスを探す基準（パスを含む施設はそのディレクトリ、それ以外はドメイン直下）"""
+    parsed = urlparse(site_url)
+    return "{}://{}".format(parsed.scheme, site_scope(site_url) or parsed.netloc + "/")
+
+
+def _feed_candidates(site_url: str, html: Optional[bytes]) -> List[str]:
+    """トップページの <link rel="alternate"> とよくあるパスからフィード候補を列挙"""
+    candidates = []
+    if html:
+        try:
+            doc = lxml.html.document_fromstring(html)
+            for link in doc.iter("link"):
+                rel = (link.get("rel") or "").lower()
+                link_type = (link.get("type") or "").lower()
+                if "alternate" in rel and link_type in _FEED_LINK_TYPES and link.get("href"):
+                    candidates.append(urljoin(site_url, link.get("href")))
+        except (etree.ParserError, ValueError):
+            pass
+
+    # よくあるパスは施設のディレクトリ基準（ドメイン直下のサイトならドメイン直下）
+    base = _site_base(site_url)
+    candidates += [base + path.lstrip("/") for path in FEED_COMMON_PATHS]
+    # 重複除去（順序維持）
+    return list(dict.fromkeys(candidates))
+
+
+def _sitemap_candidates(site_url: str) -> List[str]:
+    """robots.txt の Sitemap 行と sitemap.xml（パスを含む施設はディレクトリ直下の sitemap.xml のみ）"""
+    if site_scope(site_url) is not None:
+        return [_site_base(site_url) + "sitemap.xml"]
+    origin = "{0.scheme}://{0.netloc}".format(urlparse(site_url))
+    candidates = []
+    robots = fetch_bytes(origin + "/robots.txt", max_bytes=64 * 1024)
+    if robots is not None and robots.status < 400:
+        for line in robots.content.decode("utf-8", errors="ignore").splitlines():
+            if line.lower().startswith("sitemap:"):
+                candidates.append(line.split(":", 1)[1].strip())
+    candidates.append(origin + "/sitemap.xml")
+    return list(dict.fromkeys(candidates))
+
+
+def discover_feed(site_url: str) -> Tuple[Optional[str], str]:
+    """
+    サイトのフィード（なければサイトマップ）を探す
+
+    Returns:
+        (フィードURL, 種別) 見つからなければ (None, 'none')
+    """
+    top = fetch_bytes(site_url)
+    html = top.content if top is not None and top.status < 400 else None
+    scope = site_scope(site_url)
+
+    def covers_site(feed_url: str) -> bool:
+        # パスを含む施設では、ページが示すフィードでもホスト全体のものなら使わない
+        return scope is None or bool(read_feed(feed_url, scope=scope)[1])
+
+    for candidate in _feed_candidates(site_url, html):
+        response = fetch_bytes(candidate, max_bytes=FEED_MAX_BYTES)
+        if response is None or response.status >= 400:
+            continue
+        feed_type = detect_feed_type(response.content)
+        if feed_type in (FEED_RSS, FEED_ATOM) and covers_site(response.final_url):
+            return response.final_url, feed_type
+
+    for candidate in _sitemap_candidates(site_url):
+        response = fetch_bytes(candidate, max_bytes=FEED_MAX_BYTES)
+        if (response is not None and response.status < 400
+                and detect_feed_type(response.content) == FEED_SITEMAP and covers_site(response.final_url)):
+            return response.final_url, FEED_SITEMAP
+
+    return None, FEED_NONE
+
+
+def facility_feed_entries(facility_id: Optional[str], site_url: str, traffic=None) -> Tuple[Optional[str], List[FeedEntry]]:
+    """
+    施設のフィードから項目を取得（フィードの場所はDBのキャッシュを使う）
+
+    Returns:
+        (種別, 項目リスト) フィードがない・読めない場合は (None, [])
+    """
+    record = get_facility_feed(facility_id) if facility_id else None
+    if record:
+        try:
+            stale = datetime.now() - datetime.fromisoformat(record["discovered_at"]) > timedelta(days=FEED_REDISCOVER_DAYS)
+        except (TypeError, ValueError):
+            stale = True
+        if not stale:
+            if record["feed_type"] == FEED_NONE:
+                return None, []
+            feed_type, entries = read_feed(record["feed_url"], traffic, site_scope(site_url))
+            if feed_type:
+                return feed_type, entries
+            # 記録済みのフィードが読めなくなった: 再探索する
+
+    feed_url, feed_type = discover_feed(site_url)
+    if facility_id:
+        save_facility_feed(facility_id, feed_url, feed_type)
+    if not feed_url:
+        return None, []
+    return read_feed(feed_url, traffic, site_scope(site_url))
+
+
+async def facility_feed_entries_async(facility_id: Optional[str], site_url: str, traffic=None) -> Tuple[Optional[str], List[FeedEntry]]:
+    """facility_feed_entriesをスレッドで実行（イベントループを止めない）"""
+    try:
+        return await asyncio.to_thread(facility_feed_entries, facility_id, site_url, traffic)
+    except Exception as e:
+        print(f"  ⚠ フィード取得エラー: {e}")
+        return None, []
@@ -0,0 +1,221 @@
+"""
+ジョブのリース（排他実行）モジュール
+デーモン（core/scheduler.py --daemon・scripts/scheduler.py）、バックグラウンドスレッド、
+手動実行（--now）が同じ events.db を共有しながら同じ収集・巡回を同時に始めないよう、
+ジョブ名ごとのリースを job_leases テーブルで管理する。
+
+- 取得: 条件付きUPSERT 1文（未取得・期限切れ・自分が保持中のときだけ成功）
+- ハートビート: 保持中は LEASE_HEARTBEAT_SECONDS ごとに期限を延長（別スレッド）
+- 引き継ぎ: 保持プロセスが落ちてハートビートが LEASE_TTL_SECONDS 途絶えたら、次の取得で自動的に引き継ぐ
+- スキップ: @exclusive がスキップした回数はプロセス内で数え、skip_count() で確認できる
+  （戻り値のNoneだけでは「何も返さない関数が正常終了した」のと区別できないため）
+
+使い方:
+    @exclusive("event_collection")
+    def run_full_collection(): ...
+
+    with JobLease("dormant_check") as lease:
+        if lease.acquired: ...
+"""
+
+import functools
+import inspect
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import LEASE_TTL_SECONDS, LEASE_HEARTBEAT_SECONDS
+from core.database import get_connection, init_database
+from core.work_queue import default_worker_id
+
+
+class JobLease:
+    """
+    ジョブ名ごとのリース
+
+    Args:
+        name: ジョブ名
+        holder: 保持者の識別子（省略時はホスト名・プロセスIDから生成）
+        ttl_seconds: ハートビートが途絶えてから失効するまでの秒数
+        heartbeat_seconds: ハートビートの間隔（0で自動延長しない）
+    """
+
+    def __init__(
+        self,
+        name: str,
+        holder: Optional[str] = None,
+        ttl_seconds: float = LEASE_TTL_SECONDS,
+        heartbeat_seconds: float = LEASE_HEARTBEAT_SECONDS,
+    ):
+        self.name = name
+        self.holder = holder or default_worker_id()
+        self.ttl_seconds = ttl_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.acquired = False
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _expires(self, now: datetime) -> str:
+        return (now + timedelta(seconds=self.ttl_seconds)).isoformat()
+
+    def acquire(self) -> bool:
+        """リースを取得（他プロセスが有効なリースを保持中ならFalse）"""
+        try:
+            return self._acquire()
+        except sqlite3.OperationalError as e:
+            if "no such table" not in str(e):
+                raise
+            # 初期化前のDB（ジョブ本体より先にリースを取るため）
+            init_database()
+            return self._acquire()
+
+    def _acquire(self) -> bool:
+        now = datetime.now()
+        conn = get_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            previous = conn.execute("SELECT holder, expires_at FROM job_leases WHERE name = ?", (self.name,)).fetchone()
+            cursor = conn.execute("""
+                INSERT INTO job_leases (name, holder, acquired_at, heartbeat_at, expires_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    holder = excluded.holder,
+                    acquired_at = excluded.acquired_at,
+                    heartbeat_at = excluded.heartbeat_at,
+                    expires_at = excluded.expires_at
+                WHERE job_leases.expires_at < excluded.acquired_at OR job_leases.holder = excluded.holder
+            """, (self.name, self.holder, now.isoformat(), now.isoformat(), self._expires(now)))
+            conn.commit()
+            self.acquired = cursor.rowcount == 1
+        finally:
+            conn.close()
+
+        if self.acquired:
+            if previous and previous["holder"] != self.holder:
+                print(f"🔓 {self.name}: 失効したリースを引き継ぎました（前の保持者: {previous['holder']}）")
+            self._start_heartbeat()
+        return self.acquired
+
+    def renew(self) -> bool:
+        """期限を延長（他プロセスに引き継がれていればFalse）"""
+        now = datetime.now()
+        conn = get_connection()
+        try:
+            cursor = conn.execute(
+                "UPDATE job_leases SET heartbeat_at = ?, expires_at = ? WHERE name = ? AND holder = ?",
+                (now.isoformat(), self._expires(now), self.name, self.holder)
+            )
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def release(self):
+        """リースを解放"""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        if not self.acquired:
+            return
+        conn = get_connection()
+        try:
+            conn.execute("DELETE FROM job_leases WHERE name = ? AND holder = ?", (self.name, self.holder))
+            conn.commit()
+        finally:
+            conn.close()
+        self.acquired = False
+
+    def _start_heartbeat(self):
+        if not self.heartbeat_seconds or self._thread is not None:
+            return
+
+        def beat():
+            while not self._stop.wait(self.heartbeat_seconds):
+                try:
+                    if not self.renew():
+                        self.lost = True
+                        print(f"⚠ {self.name}: リースが他のプロセスに引き継がれました")
+                        return
+                except Exception as e:
+                    # 一時的なロック競合などは次のハートビートで再試行
+                    print(f"⚠ {self.name}: ハートビートに失敗 ({e})")
+
+        self._thread = threading.Thread(target=beat, name=f"lease-{self.name}", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "JobLease":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def get_lease_holder(name: str) -> Optional[dict]:
+    """ジョブの有効なリースの保持状況（なければNone）"""
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT * FROM job_leases WHERE name = ? AND expires_at >= ?",
+                           (name, datetime.now().isoformat())).fetchone()
+    finally:
+        conn.close()
+    return dict(row) if row else None
+
+
+_skips: Dict[str, int] = {}
+_skips_lock = threading.Lock()
+
+
+def skip_count(name: str) -> int:
+    """このプロセスで @exclusive(name) がスキップした回数"""
+    with _skips_lock:
+        return _skips.get(name, 0)
+
+
+def _skip(name: str):
+    with _skips_lock:
+        _skips[name] = _skips.get(name, 0) + 1
+    holder = get_lease_holder(name)
+    owner = f"（保持者: {holder['holder']}、開始 {holder['acquired_at'][:19]}）" if holder else ""
+    print(f"⏭ {name} は他のプロセスで実行中のためスキップします{owner}")
+
+
+def exclusive(name: str) -> Callable:
+    """
+    関数をリースで排他実行するデコレーター（同期・async関数どちらにも使える）
+
+    他のプロセスが実行中ならスキップしてNoneを返す。
+    """
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                lease = JobLease(name)
+                if not lease.acquire():
+                    _skip(name)
+                    return None
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    lease.release()
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            lease = JobLease(name)
+            if not lease.acquire():
+                _skip(name)
+                return None
+            try:
+                return func(*args, **kwargs)
+            finally:
+                lease.release()
+        return wrapper
+
+    return decorator
@@ -0,0 +1,382 @@
+"""
+実行メトリクスモジュール
+print() で流れて消えていた所要時間・失敗の情報を残し、データ量の増加でどの段階が遅くなったかを追えるようにする。
+
+- プロセス内カウンター: HTTPリクエスト数（状態別）、キャッシュの参照結果（ヒット/ミス）
+- JobRun: ジョブ1回の実行を job_runs テーブルに記録（開始・終了・所要時間・状態・エラー、
+  実行中に増えたHTTPリクエスト数・キャッシュヒット数、ソース別の取得/書き込み/変更/エラー件数）
+- Prometheusテキスト形式のエンドポイント（/metrics）: プロセス内カウンターと job_runs の集計
+
+実行中のまま残った記録（プロセスが強制終了した実行）は、次の実行の開始時と集計時に失敗にする。
+METRICS_RETENTION_DAYS より前の記録は次の実行の開始時に削除する。
+
+カウンターはプロセス全体で共有するため、同時に実行したジョブのHTTPリクエスト数・キャッシュヒット数は
+互いに重なって計上される（ソース別件数は実行ごとに正確）。
+
+使い方:
+    @track_run("event_collection")
+    def run_full_collection():
+        ...
+        record_source("connpass", fetched=120, inserted=118)
+
+    python core/metrics.py --port 9464   # job_runs の集計だけを公開
+"""
+
+import contextvars
+import functools
+import inspect
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import METRICS_HOST, METRICS_PORT, METRICS_PREFIX, METRICS_RETENTION_DAYS
+from core.database import (
+    init_database, start_job_run, finish_job_run, get_job_run_summary,
+    get_running_job_runs, fail_job_runs, prune_job_runs,
+)
+
+
+RUN_RUNNING = "running"
+RUN_SUCCESS = "success"
+RUN_FAILED = "failed"
+
+HTTP_REQUESTS = "http_requests_total"
+CACHE_LOOKUPS = "cache_lookups_total"
+
+_SOURCE_FIELDS = ("fetched", "inserted", "changed", "errors")
+
+_HELP = {
+    HTTP_REQUESTS: "HTTP requests sent by this process",
+    CACHE_LOOKUPS: "Cache lookups by cache and result",
+}
+
+
+# ----------------------------------------------------------------------
+# プロセス内カウンター
+# ----------------------------------------------------------------------
+
+_counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+_counters_lock = threading.Lock()
+
+
+def inc(name: str, value: float = 1, **labels):
+    """カウンターを増やす"""
+    key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+    with _counters_lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def counter_total(name: str, **match) -> float:
+    """ラベルが一致するカウンターの合計"""
+    wanted = {k: str(v) for k, v in match.items()}
+    with _counters_lock:
+        return sum(value for (counter, labels), value in _counters.items()
+                   if counter == name and all(dict(labels).get(k) == v for k, v in wanted.items()))
+
+
+def record_http_response(response, *args, **kwargs):
+    """requests のレスポンスフック（hooks={"response": record_http_response}）"""
+    status = getattr(response, "status_code", 0) or 0
+    inc(HTTP_REQUESTS, host=urlparse(response.url).hostname or "", code=f"{status // 100}xx")
+
+
+def record_cache(cache: str, hit: bool):
+    """キャッシュの参照結果を記録"""
+    inc(CACHE_LOOKUPS, cache=cache, result="hit" if hit else "miss")
+
+
+def _http_totals() -> Tuple[int, int]:
+    total = counter_total(HTTP_REQUESTS)
+    errors = counter_total(HTTP_REQUESTS, code="4xx") + counter_total(HTTP_REQUESTS, code="5xx")
+    return int(total), int(errors)
+
+
+def _cache_totals() -> Tuple[int, int]:
+    return int(counter_total(CACHE_LOOKUPS, result="hit")), int(counter_total(CACHE_LOOKUPS, result="miss"))
+
+
+# ----------------------------------------------------------------------
+# ジョブの実行記録
+# ----------------------------------------------------------------------
+
+def _process_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return True   # 列の追加前の記録は確認できない
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def fail_orphaned_runs() -> int:
+    """このホストで実行中のまま記録されているのにプロセスがいない実行を失敗にし、件数を返す"""
+    orphaned = [run["id"] for run in get_running_job_runs(socket.gethostname()) if not _process_alive(run["pid"])]
+    if orphaned:
+        fail_job_runs(orphaned, datetime.now().isoformat(), "プロセスが終了していました（強制終了・クラッシュ）")
+    return len(orphaned)
+
+
+def _housekeep():
+    """実行の開始時の後始末（失敗してもジョブは止めない）"""
+    try:
+        fail_orphaned_runs()
+        prune_job_runs((datetime.now() - timedelta(days=METRICS_RETENTION_DAYS)).isoformat())
+    except sqlite3.OperationalError as e:
+        print(f"⚠ 実行履歴の整理に失敗 ({e})")
+
+
+_current_run: contextvars.ContextVar[Optional["JobRun"]] = contextvars.ContextVar("current_run", default=None)
+
+
+class JobRun:
+    """
+    ジョブ1回分の実行記録
+
+    使い方:
+        with JobRun("dormant_check") as run:
+            run.add_source("facilities", fetched=120, changed=3)
+    """
+
+    def __init__(self, job: str):
+        self.job = job
+        self.run_id: Optional[int] = None
+        self.sources: Dict[str, Dict[str, int]] = {}
+        self.status = RUN_RUNNING
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._started = 0.0
+        self._http_start = (0, 0)
+        self._cache_start = (0, 0)
+        self._token = None
+
+    def start(self) -> "JobRun":
+        self._started = time.monotonic()
+        self._http_start = _http_totals()
+        self._cache_start = _cache_totals()
+        started_at = datetime.now().isoformat()
+        process = (os.getpid(), socket.gethostname())
+        try:
+            self.run_id = start_job_run(self.job, started_at, RUN_RUNNING, *process)
+        except sqlite3.OperationalError as e:
+            if "no such table" not in str(e) and "no column" not in str(e):
+                raise
+            # 初期化前のDB（ジョブ本体の init_database() より先に記録を始めるため）
+            init_database()
+            self.run_id = start_job_run(self.job, started_at, RUN_RUNNING, *process)
+        _housekeep()
+        self._token = _current_run.set(self)
+        return self
+
+    def add_source(self, source: str, **counts):
+        """ソース別件数を加算（fetched / inserted / changed / errors）"""
+        with self._lock:
+            totals = self.sources.setdefault(source, dict.fromkeys(_SOURCE_FIELDS, 0))
+            for field in _SOURCE_FIELDS:
+                totals[field] += int(counts.get(field) or 0)
+
+    def finish(self, status: str = RUN_SUCCESS, error: Optional[str] = None) -> Dict:
+        """実行結果を記録"""
+        if self._token is not None:
+            _current_run.reset(self._token)
+            self._token = None
+        self.status, self.error = status, error
+        http_total, http_errors = _http_totals()
+        cache_hits, cache_misses = _cache_totals()
+        run = {
+            "finished_at": datetime.now().isoformat(),
+            "duration_seconds": round(time.monotonic() - self._started, 3),
+            "status": status,
+            "http_requests": http_total - self._http_start[0],
+            "http_errors": http_errors - self._http_start[1],
+            "cache_hits": cache_hits - self._cache_start[0],
+            "cache_misses": cache_misses - self._cache_start[1],
+            "error": error,
+        }
+        with self._lock:
+            sources = {name: dict(counts) for name, counts in self.sources.items()}
+        finish_job_run(self.run_id, run, sources)
+        return run
+
+    def __enter__(self) -> "JobRun":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is None:
+            self.finish(RUN_SUCCESS)
+        else:
+            self.finish(RUN_FAILED, f"{exc_type.__name__}: {exc}")
+
+
+def current_run() -> Optional[JobRun]:
+    """実行中のジョブの記録（ジョブの外ではNone）"""
+    return _current_run.get()
+
+
+def record_source(source: str, **counts):
+    """実行中のジョブにソース別件数を加算（ジョブの外では何もしない）"""
+    run = current_run()
+    if run is not None:
+        run.add_source(source, **counts)
+
+
+def track_run(job: str) -> Callable:
+    """
+    関数の実行を job_runs に記録するデコレーター（同期・async関数どちらにも使える）
+
+    記録付きの関数から別の記録付き関数を呼んだ場合はそれぞれ別の実行として記録し、
+    内側の実行中の record_source() は内側の記録に入る。
+    """
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with JobRun(job):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with JobRun(job):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+# ----------------------------------------------------------------------
+# Prometheusテキスト形式
+# ----------------------------------------------------------------------
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _sample(name: str, value: float, **labels) -> str:
+    value = float(value)
+    text = str(int(value)) if value.is_integer() else repr(value)
+    label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return f"{METRICS_PREFIX}_{name}{{{label_text}}} {text}" if label_text else f"{METRICS_PREFIX}_{name} {text}"
+
+
+def _timestamp(iso: Optional[str]) -> float:
+    return datetime.fromisoformat(iso).timestamp() if iso else 0
+
+
+def render_prometheus() -> str:
+    """プロセス内カウンターと job_runs の集計をPrometheusテキスト形式で返す"""
+    lines = []
+
+    with _counters_lock:
+        counters = sorted(_counters.items())
+    for name in sorted({name for (name, _), _ in counters}):
+        lines.append(f"# HELP {METRICS_PREFIX}_{name} {_HELP.get(name, name)}")
+        lines.append(f"# TYPE {METRICS_PREFIX}_{name} counter")
+        for (counter, labels), value in counters:
+            if counter == name:
+                lines.append(_sample(name, value, **dict(labels)))
+
+    fail_orphaned_runs()
+    summary = get_job_run_summary()
+    gauges = [
+        ("job_runs", "gauge", "Recorded job runs by status (running runs move to their final status)"),
+        ("job_last_duration_seconds", "gauge", "Duration of the last finished run"),
+        ("job_last_run_timestamp_seconds", "gauge", "End time of the last finished run"),
+        ("job_last_success_timestamp_seconds", "gauge", "End time of the last successful run"),
+        ("job_last_http_requests", "gauge", "HTTP requests during the last finished run"),
+        ("job_last_cache_hit_ratio", "gauge", "Cache hit ratio during the last finished run"),
+        ("job_last_source_items", "gauge", "Items per source and kind during the last finished run"),
+    ]
+    samples = {name: [] for name, _, _ in gauges}
+    for job, info in sorted(summary.items()):
+        for status, count in sorted(info["runs"].items()):
+            samples["job_runs"].append(_sample("job_runs", count, job=job, status=status))
+        if info["last_success"]:
+            samples["job_last_success_timestamp_seconds"].append(
+                _sample("job_last_success_timestamp_seconds", _timestamp(info["last_success"]), job=job))
+        last = info["last"]
+        if not last:
+            continue
+        samples["job_last_duration_seconds"].append(
+            _sample("job_last_duration_seconds", last["duration_seconds"] or 0, job=job, status=last["status"]))
+        samples["job_last_run_timestamp_seconds"].append(
+            _sample("job_last_run_timestamp_seconds", _timestamp(last["finished_at"]), job=job))
+        samples["job_last_http_requests"].append(
+            _sample("job_last_http_requests", last["http_requests"] or 0, job=job))
+        lookups = (last["cache_hits"] or 0) + (last["cache_misses"] or 0)
+        if lookups:
+            samples["job_last_cache_hit_ratio"].append(
+                _sample("job_last_cache_hit_ratio", round(last["cache_hits"] / lookups, 4), job=job))
+        for source, counts in sorted(last.get("sources", {}).items()):
+            for kind in _SOURCE_FIELDS:
+                samples["job_last_source_items"].append(
+                    _sample("job_last_source_items", counts[kind], job=job, source=source, kind=kind))
+
+    for name, kind, help_text in gauges:
+        if samples[name]:
+            lines.append(f"# HELP {METRICS_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name} {kind}")
+            lines.extend(samples[name])
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        try:
+            body = render_prometheus().encode("utf-8")
+        except Exception:
+            traceback.print_exc()
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT) -> Optional[ThreadingHTTPServer]:
+    """メトリクスエンドポイントをバックグラウンドスレッドで起動（ポートが使用中ならNone）"""
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print(f"⚠ メトリクスエンドポイントを起動できません ({host}:{port}): {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"📈 メトリクス: http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="実行メトリクスのエンドポイント（Prometheusテキスト形式）")
+    parser.add_argument("--host", default=METRICS_HOST)
+    parser.add_argument("--port", type=int, default=METRICS_PORT)
+    args = parser.parse_args()
+
+    server = start_metrics_server(args.host, args.port)
+    if server is not None:
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
@@ -0,0 +1,117 @@
+"""
+PDF日付抽出モジュール
+募集要項・チラシのPDFを施設URLとして登録しているケース向けに、ブラウザを使わず
+PDFから活動シグナル（本文中の日付・文書の作成日/更新日）を取り出す。
+
+- 本文: pypdf がインストールされていれば先頭 PDF_MAX_PAGES ページのテキストを抽出
+- メタデータ: 情報辞書の /CreationDate・/ModDate と XMP の CreateDate・ModifyDate
+  （オブジェクトストリーム内にある場合に備え、FlateDecodeのストリームも展開して探す）
+"""
+
+import asyncio
+import io
+import re
+import zlib
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import PDF_MAX_BYTES, PDF_MAX_PAGES
+from core.tiered_fetcher import fetch_bytes
+
+try:
+    from pypdf import PdfReader
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+
+
+# 情報辞書の日付（D:YYYYMMDDHHmmSS...）
+_INFO_DATE_PATTERN = re.compile(rb"/(?:CreationDate|ModDate)\s*\(\s*(?:D:)?(\d{4})(\d{2})(\d{2})")
+# XMPメタデータの日付（要素・属性どちらの書式も）
+_XMP_DATE_PATTERN = re.compile(rb"xmp:(?:CreateDate|ModifyDate|MetadataDate)\s*(?:>|=\s*[\"'])\s*(\d{4})-(\d{2})-(\d{2})")
+_STREAM_PATTERN = re.compile(rb"stream\r?\n(.*?)endstream", re.S)
+
+# 展開するストリームの上限（画像などの大きなストリームは対象外）
+_MAX_INFLATE_STREAMS = 200
+_MAX_STREAM_BYTES = 256 * 1024
+
+
+class PdfDocument(NamedTuple):
+    """PDFから取り出した本文とメタデータの日付"""
+    text: str
+    metadata_dates: List[datetime]
+    size: int
+
+
+def is_pdf(content: bytes) -> bool:
+    """先頭のシグネチャでPDFか判定"""
+    return content.lstrip()[:5] == b"%PDF-"
+
+
+def _inflated_streams(content: bytes):
+    """FlateDecodeで圧縮されたストリームを展開して返す（展開できないものは飛ばす）"""
+    for i, match in enumerate(_STREAM_PATTERN.finditer(content)):
+        if i >= _MAX_INFLATE_STREAMS:
+            break
+        data = match.group(1)
+        if len(data) > _MAX_STREAM_BYTES:
+            continue
+        try:
+            yield zlib.decompressobj().decompress(data, _MAX_STREAM_BYTES)
+        except zlib.error:
+            continue
+
+
+def metadata_dates(content: bytes, now: Optional[datetime] = None) -> List[datetime]:
+    """文書の作成日・更新日を新しい順に取得（未来日付は除外）"""
+    horizon = (now or datetime.now()) + timedelta(days=1)
+    dates = set()
+    for source in (content, *_inflated_streams(content)):
+        for pattern in (_INFO_DATE_PATTERN, _XMP_DATE_PATTERN):
+            for year, month, day in pattern.findall(source):
+                try:
+                    date = datetime(int(year), int(month), int(day))
+                except ValueError:
+                    continue
+                if date <= horizon:
+                    dates.add(date)
+    return sorted(dates, reverse=True)
+
+
+def extract_pdf_text(content: bytes, max_pages: int = PDF_MAX_PAGES) -> str:
+    """先頭ページの本文テキストを抽出（pypdfがない・読めない場合は空文字）"""
+    if not PYPDF_AVAILABLE:
+        return ""
+    try:
+        reader = PdfReader(io.BytesIO(content))
+        pages = reader.pages[:max_pages]
+        return "\n".join(page.extract_text() or "" for page in pages).strip()
+    except Exception as e:
+        print(f"  ⚠ PDF解析エラー: {e}")
+        return ""
+
+
+def read_pdf(content: bytes) -> PdfDocument:
+    """PDFの本文とメタデータの日付を取り出す"""
+    return PdfDocument(extract_pdf_text(content), metadata_dates(content), len(content))
+
+
+def fetch_pdf(url: str, traffic=None) -> Optional[PdfDocument]:
+    """PDFを取得して解析（取得できない・PDFでない場合はNone）"""
+    response = fetch_bytes(url, max_bytes=PDF_MAX_BYTES)
+    if response is None:
+        return None
+    if traffic is not None:
+        traffic.add(len(response.content))
+    if response.status >= 400 or not is_pdf(response.content):
+        return None
+    return read_pdf(response.content)
+
+
+async def fetch_pdf_async(url: str, traffic=None) -> Optional[PdfDocument]:
+    """fetch_pdfをスレッドで実行（イベントループを止めない）"""
+    return await asyncio.to_thread(fetch_pdf, url, traffic)
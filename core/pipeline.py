@@ -0,0 +1,316 @@
+"""
+ストリーミング収集パイプライン
+取得 → 正規化・スコアリング → DB書き込み の各ステージを有界キューで接続して並行実行する
+
+- ソースごとのプロデューサースレッドがイベントを取得
+- ワーカープールが正規化とスコア計算を担当
+- 単一のライターがバッチ単位でDBへ書き込み
+キューが満杯になると上流のステージが待機するため、イベント数に関わらずメモリ使用量は一定に保たれる。
+"""
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import (
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_WORKERS,
+    PIPELINE_BATCH_SIZE,
+    PIPELINE_FLUSH_SECONDS,
+    PIPELINE_REPORT_SECONDS,
+)
+from core.database import insert_events_bulk
+from core.background_jobs import report_progress
+from core.scorer import calculate_priority_score
+
+
+# ステージ終了を下流へ伝える番兵
+_DONE = object()
+
+
+class StageMetrics:
+    """ステージごとの処理件数・所要時間の計測"""
+
+    def __init__(self, name: str, input_queue: Optional[queue.Queue] = None):
+        self.name = name
+        self.input_queue = input_queue
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0      # 実処理に費やした時間
+        self.blocked_seconds = 0.0   # 下流キューが満杯で待たされた時間
+        self.started_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, count: int = 1, busy: float = 0.0, blocked: float = 0.0, error: bool = False):
+        with self._lock:
+            self.processed += count
+            self.busy_seconds += busy
+            self.blocked_seconds += blocked
+            if error:
+                self.errors += 1
+
+    def snapshot(self) -> dict:
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        with self._lock:
+            return {
+                "processed": self.processed,
+                "errors": self.errors,
+                "throughput": round(self.processed / elapsed, 1),
+                "busy_seconds": round(self.busy_seconds, 2),
+                "blocked_seconds": round(self.blocked_seconds, 2),
+                "queue_depth": self.input_queue.qsize() if self.input_queue is not None else 0,
+            }
+
+
+def prepare_event(event: dict, facility_index=None) -> Optional[dict]:
+    """
+    イベントを正規化してスコアを付与
+
+    Args:
+        event: スクレイパーが返したイベント
+        facility_index: 施設照合インデックス（指定時は施設を紐付ける）
+
+    Returns:
+        書き込み対象のイベント。必須項目が欠けている場合はNone
+    """
+    title = (event.get('title') or '').strip()
+    if not title or not event.get('event_date'):
+        return None
+
+    event['title'] = title
+    event['description'] = event.get('description') or ''
+    event['priority_score'] = calculate_priority_score(event)
+    if facility_index is not None:
+        facility_index.link(event)
+    return event
+
+
+class CollectionPipeline:
+    """
+    複数ソースからのイベント収集を段階的に並行処理するパイプライン
+
+    Args:
+        sources: ソース名 → イベントを返すイテラブルを生成する関数
+        workers: 正規化・スコアリングのワーカー数
+        queue_size: ステージ間キューの上限
+        batch_size: DB書き込みのバッチサイズ
+        flush_seconds: バッチが溜まらない場合でも書き込む間隔
+        report_seconds: メトリクスを表示する間隔（0で無効）
+        transform: 1件ごとの正規化処理（Noneを返すと破棄）
+        writer: バッチ書き込み関数（1件ごとの書き込み成否を返す）
+    """
+
+    def __init__(
+        self,
+        sources: Dict[str, Callable[[], Iterable[dict]]],
+        workers: int = PIPELINE_WORKERS,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+        batch_size: int = PIPELINE_BATCH_SIZE,
+        flush_seconds: float = PIPELINE_FLUSH_SECONDS,
+        report_seconds: float = PIPELINE_REPORT_SECONDS,
+        transform: Callable[[dict], Optional[dict]] = prepare_event,
+        writer: Callable[[list], List[bool]] = insert_events_bulk,
+    ):
+        self.sources = sources
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.report_seconds = report_seconds
+        self.transform = transform
+        self.writer = writer
+
+        self.fetch_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.write_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+
+        self.metrics = {
+            "fetch": StageMetrics("fetch"),
+            "process": StageMetrics("process", self.fetch_queue),
+            "write": StageMetrics("write", self.write_queue),
+        }
+        self.source_counts = {
+            name: {"fetched": 0, "inserted": 0, "skipped": 0, "error": None}
+            for name in sources
+        }
+        self._counts_lock = threading.Lock()
+        self._finished = threading.Event()
+
+    # --- ステージ実装 ---
+
+    def _put(self, q: queue.Queue, item) -> float:
+        """キューに投入し、待たされた時間を返す（バックプレッシャー計測）"""
+        start = time.monotonic()
+        q.put(item)
+        return time.monotonic() - start
+
+    def _produce(self, name: str, fetch: Callable[[], Iterable[dict]]):
+        """ソースからイベントを取得して処理キューへ流す"""
+        metrics = self.metrics["fetch"]
+        try:
+            iterator = iter(fetch())
+            while True:
+                start = time.monotonic()
+                try:
+                    event = next(iterator)
+                except StopIteration:
+                    break
+                busy = time.monotonic() - start
+                blocked = self._put(self.fetch_queue, (name, event))
+                metrics.record(busy=busy, blocked=blocked)
+                with self._counts_lock:
+                    self.source_counts[name]["fetched"] += 1
+        except Exception as e:
+            metrics.record(count=0, error=True)
+            with self._counts_lock:
+                self.source_counts[name]["error"] = str(e)
+            print(f"[{datetime.now()}] {name}エラー: {e}")
+
+    def _process(self):
+        """正規化・スコアリングを行い書き込みキューへ流す"""
+        metrics = self.metrics["process"]
+        while True:
+            item = self.fetch_queue.get()
+            if item is _DONE:
+                self._put(self.write_queue, _DONE)
+                return
+
+            name, event = item
+            start = time.monotonic()
+            try:
+                prepared = self.transform(event)
+            except Exception as e:
+                print(f"[{datetime.now()}] {name}の正規化エラー: {e}")
+                metrics.record(busy=time.monotonic() - start, error=True)
+                continue
+            busy = time.monotonic() - start
+
+            if prepared is None:
+                with self._counts_lock:
+                    self.source_counts[name]["skipped"] += 1
+                metrics.record(busy=busy)
+                continue
+
+            blocked = self._put(self.write_queue, (name, prepared))
+            metrics.record(busy=busy, blocked=blocked)
+
+    def _write(self):
+        """バッチ単位でDBへ書き込む（単一ライター）"""
+        metrics = self.metrics["write"]
+        batch = []
+        remaining_workers = self.workers
+        last_flush = time.monotonic()
+
+        def flush():
+            nonlocal batch, last_flush
+            if batch:
+                start = time.monotonic()
+                try:
+                    results = self.writer([event for _, event in batch])
+                except Exception as e:
+                    # 接続・ロックのエラーでライターが止まると上流がキューで詰まるため、
+                    # バッチを失敗として数えて読み出しを続ける
+                    print(f"[{datetime.now()}] 書き込みエラー（{len(batch)}件）: {e}")
+                    results = [False] * len(batch)
+                written = sum(1 for ok in results if ok)
+                metrics.record(count=written, busy=time.monotonic() - start,
+                               error=written < len(batch))
+                with self._counts_lock:
+                    for (name, _), ok in zip(batch, results):
+                        if ok:
+                            self.source_counts[name]["inserted"] += 1
+                batch = []
+            last_flush = time.monotonic()
+
+        while remaining_workers > 0:
+            timeout = max(self.flush_seconds - (time.monotonic() - last_flush), 0.05)
+            try:
+                item = self.write_queue.get(timeout=timeout)
+            except queue.Empty:
+                flush()
+                continue
+
+            if item is _DONE:
+                remaining_workers -= 1
+                continue
+
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                flush()
+
+        flush()
+
+    def _report(self):
+        """一定間隔でステージごとのスループットとキュー深さを表示"""
+        while not self._finished.wait(self.report_seconds):
+            print(f"[{datetime.now()}] [pipeline] {self.format_metrics()}")
+            fetched = self.metrics["fetch"].snapshot()["processed"]
+            written = self.metrics["write"].snapshot()["processed"]
+            report_progress(written, message=f"取得 {fetched}件 / 書き込み {written}件")
+
+    # --- 公開API ---
+
+    def format_metrics(self) -> str:
+        """メトリクスを1行の文字列に整形"""
+        parts = []
+        for name, stage in self.metrics.items():
+            snap = stage.snapshot()
+            parts.append(
+                f"{name}: {snap['processed']}件 {snap['throughput']}/s "
+                f"q={snap['queue_depth']} busy={snap['busy_seconds']}s "
+                f"blocked={snap['blocked_seconds']}s"
+            )
+        return " | ".join(parts)
+
+    def stats(self) -> dict:
+        """ソース別件数とステージ別メトリクスを取得"""
+        with self._counts_lock:
+            sources = {name: dict(counts) for name, counts in self.source_counts.items()}
+        return {
+            "sources": sources,
+            "stages": {name: stage.snapshot() for name, stage in self.metrics.items()},
+        }
+
+    def run(self) -> dict:
+        """パイプラインを実行し、完了まで待機して統計を返す"""
+        producers = [
+            threading.Thread(target=self._produce, args=(name, fetch), name=f"fetch-{name}", daemon=True)
+            for name, fetch in self.sources.items()
+        ]
+        processors = [
+            threading.Thread(target=self._process, name=f"process-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        writer = threading.Thread(target=self._write, name="writer", daemon=True)
+        reporter = None
+        if self.report_seconds:
+            reporter = threading.Thread(target=self._report, name="reporter", daemon=True)
+
+        for thread in [writer, *processors, *producers]:
+            thread.start()
+        if reporter:
+            reporter.start()
+
+        for thread in producers:
+            thread.join()
+        for _ in processors:
+            self.fetch_queue.put(_DONE)
+        for thread in processors:
+            thread.join()
+        writer.join()
+
+        self._finished.set()
+        if reporter:
+            reporter.join()
+
+        return self.stats()
+
+
+def run_pipeline(sources: Dict[str, Callable[[], Iterable[dict]]], **kwargs) -> dict:
+    """パイプラインを構築して実行するショートカット"""
+    pipeline = CollectionPipeline(sources, **kwargs)
+    result = pipeline.run()
+    print(f"[{datetime.now()}] [pipeline] {pipeline.format_metrics()}")
+    return result
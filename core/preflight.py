@@ -0,0 +1,202 @@
+"""
+URL事前判定（プリフライト）モジュール
+施設URLにはPDF・ダウンロードファイル・消滅したページ・駐車ドメインが混じっており、
+そのままPlaywrightで開くと "Download is starting" などで失敗し、巡回のたびにChromiumを起動してしまう。
+先頭 PREFLIGHT_PROBE_BYTES だけの範囲GETでステータス・Content-Type・本文の冒頭を確認し、
+判定結果をURLごとにDBへ記録する。
+
+- html: 通常の取得（フィード → HTTP → ブラウザ）へ
+- redirect: 別ホストへ移転済み。移転先のURLで通常の取得へ
+- pdf: PDFから日付を抽出（core.pdf_extractor）
+- unknown: 403/5xx等（ボット対策・一時障害）。判定を記録せず通常の取得へ
+- gone（404/410）・parked（駐車ドメイン）・error（接続不可）: 取得せず、
+  PREFLIGHT_BACKOFF_DAYS から連続回数に応じて倍々に再確認を先送り
+- download: HTML・PDF以外のファイル。取得しない
+"""
+
+import asyncio
+import re
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+from urllib.parse import urlparse
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    PREFLIGHT_PROBE_BYTES,
+    PREFLIGHT_TTL_DAYS,
+    PREFLIGHT_BACKOFF_DAYS,
+    PREFLIGHT_BACKOFF_MAX_DAYS,
+    PARKED_DOMAIN_MARKERS,
+)
+from core.database import get_url_preflight, save_url_preflight
+from core.metrics import record_cache
+from core.pdf_extractor import is_pdf
+from core.tiered_fetcher import RawResponse, fetch_bytes
+
+
+KIND_HTML = "html"
+KIND_REDIRECT = "redirect"
+KIND_PDF = "pdf"
+KIND_UNKNOWN = "unknown"
+KIND_GONE = "gone"
+KIND_PARKED = "parked"
+KIND_ERROR = "error"
+KIND_DOWNLOAD = "download"
+
+# 取得しない種別
+SKIP_KINDS = (KIND_GONE, KIND_PARKED, KIND_ERROR, KIND_DOWNLOAD)
+# 連続回数に応じて再確認を先送りする種別
+_BACKOFF_KINDS = (KIND_GONE, KIND_PARKED, KIND_ERROR)
+
+_KIND_REASONS = {
+    KIND_GONE: "ページが削除されています",
+    KIND_PARKED: "ドメインが売却・失効しています（駐車ページ）",
+    KIND_ERROR: "サーバーに接続できません",
+    KIND_DOWNLOAD: "HTML・PDF以外のファイルです",
+}
+
+_PARKED_MARKERS = [re.sub(r"\s+", "", marker.lower()) for marker in PARKED_DOMAIN_MARKERS]
+
+
+class Preflight(NamedTuple):
+    """URLの事前判定結果"""
+    url: str
+    kind: str
+    status: Optional[int]
+    final_url: Optional[str]
+    content_type: str
+    next_check_at: Optional[str]
+    failures: int
+    cached: bool
+
+    @property
+    def skip(self) -> bool:
+        """ページ取得を行わない（無効なURL・対象外のファイル）"""
+        return self.kind in SKIP_KINDS
+
+    @property
+    def target_url(self) -> str:
+        """取得に使うURL（リダイレクト先があればそちら）"""
+        return self.final_url or self.url
+
+    def describe(self) -> str:
+        """判定結果の説明（結果のreason用）"""
+        reason = _KIND_REASONS.get(self.kind, self.kind)
+        if self.status:
+            reason += f"（HTTP {self.status}）"
+        if self.next_check_at:
+            reason += f" 次回確認: {self.next_check_at[:10]}"
+        return reason
+
+
+def _host(url: str) -> str:
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def looks_parked(content: bytes) -> bool:
+    """駐車ドメイン（売却・失効）のページか判定"""
+    text = re.sub(r"\s+", "", content.decode("utf-8", errors="ignore").lower())
+    return any(marker in text for marker in _PARKED_MARKERS)
+
+
+def classify(url: str, response: Optional[RawResponse]) -> str:
+    """範囲GETのレスポンスからURLの種別を判定"""
+    if response is None:
+        return KIND_ERROR
+    if response.status in (404, 410):
+        return KIND_GONE
+    if response.status >= 400:
+        return KIND_UNKNOWN
+    # application/octet-stream で配信されるPDFもあるため中身も見る
+    if "pdf" in response.content_type or is_pdf(response.content):
+        return KIND_PDF
+    head = response.content[:1024].lstrip().lower()
+    if ("html" not in response.content_type and "xml" not in response.content_type
+            and not head.startswith((b"<!doctype", b"<html", b"<?xml"))):
+        return KIND_DOWNLOAD
+    if looks_parked(response.content):
+        return KIND_PARKED
+    if _host(response.final_url) != _host(url):
+        return KIND_REDIRECT
+    return KIND_HTML
+
+
+def _next_check_at(kind: str, failures: int, now: datetime) -> datetime:
+    """種別と連続失敗回数から次回の判定時刻を決める"""
+    if kind == KIND_UNKNOWN:
+        return now
+    if kind not in _BACKOFF_KINDS:
+        return now + timedelta(days=PREFLIGHT_TTL_DAYS)
+    # 接続不可は一時的な障害のことが多いため2回連続から先送りする
+    exponent = failures - 2 if kind == KIND_ERROR else failures - 1
+    if exponent < 0:
+        return now
+    return now + timedelta(days=min(PREFLIGHT_BACKOFF_DAYS * 2 ** exponent, PREFLIGHT_BACKOFF_MAX_DAYS))
+
+
+def preflight(url: str, traffic=None, now: Optional[datetime] = None) -> Preflight:
+    """
+    URLの種別を判定（前回の判定が有効期間内ならDBの記録を返す）
+
+    Args:
+        url: 施設URL
+        traffic: 転送量の集計（TrafficCounter）
+        now: 現在時刻（テスト用）
+    """
+    now = now or datetime.now()
+    record = get_url_preflight(url)
+    cached = bool(record and record["next_check_at"] > now.isoformat())
+    record_cache("preflight", cached)
+    if cached:
+        return Preflight(url, record["kind"], record["status"], record["final_url"],
+                         record["content_type"] or "", record["next_check_at"], record["failures"], True)
+
+    response = fetch_bytes(url, max_bytes=PREFLIGHT_PROBE_BYTES,
+                           headers={"Range": f"bytes=0-{PREFLIGHT_PROBE_BYTES - 1}"})
+    # 範囲指定に対応していないサーバー（416）は通常のGETで判定し直す
+    if response is not None and response.status == 416:
+        response = fetch_bytes(url, max_bytes=PREFLIGHT_PROBE_BYTES)
+    if response is not None and traffic is not None:
+        traffic.add(len(response.content))
+
+    kind = classify(url, response)
+    previous_failures = record["failures"] if record and record["kind"] in _BACKOFF_KINDS else 0
+    failures = previous_failures + 1 if kind in _BACKOFF_KINDS else 0
+    next_check_at = _next_check_at(kind, failures, now).isoformat()
+
+    result = Preflight(
+        url, kind,
+        response.status if response is not None else None,
+        response.final_url if response is not None and response.final_url != url else None,
+        response.content_type if response is not None else "",
+        next_check_at if next_check_at > now.isoformat() else None,
+        failures, False,
+    )
+    try:
+        save_url_preflight({
+            "url": url,
+            "kind": kind,
+            "status": result.status,
+            "final_url": result.final_url,
+            "content_type": result.content_type,
+            "checked_at": now.isoformat(),
+            "next_check_at": next_check_at,
+            "failures": failures,
+        })
+    except Exception as e:
+        print(f"  ⚠ URL判定の記録に失敗: {e}")
+    return result
+
+
+async def preflight_async(url: str, traffic=None) -> Preflight:
+    """preflightをスレッドで実行（イベントループを止めない）"""
+    try:
+        return await asyncio.to_thread(preflight, url, traffic)
+    except Exception as e:
+        # 判定できない場合は従来どおり取得を試みる
+        print(f"  ⚠ URL判定エラー: {e}")
+        return Preflight(url, KIND_UNKNOWN, None, None, "", None, 0, False)
@@ -0,0 +1,177 @@
+"""
+適応的再チェックスケジューラー
+全施設を一律3日ごとに巡回する代わりに、施設ごとに次回チェック時刻を計算し、
+優先度付きキュー（次回チェック時刻の早い順）から期限が来た施設だけを取り出す。
+
+次回チェックまでの間隔:
+- 活動中: 休眠判定（最新イベント + DORMANT_THRESHOLD_DAYS）までの残り時間の半分
+  → 境界が近い施設ほど頻繁に、先のイベントが確定している施設はまばらに確認
+- 休眠中: 休眠期間が長いほど間隔を延ばす（再開の検知だけが目的）
+- 日付不明: RECHECK_DEFAULT_DAYS
+- ページの更新頻度が高い施設は短く、低い施設は長く補正
+- 取得失敗が続く施設は RECHECK_RETRY_HOURS から倍々に延ばす
+"""
+
+import heapq
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    DORMANT_THRESHOLD_DAYS,
+    RECHECK_MIN_HOURS,
+    RECHECK_MAX_DAYS,
+    RECHECK_DEFAULT_DAYS,
+    RECHECK_RETRY_HOURS,
+    RECHECK_BATCH_LIMIT,
+)
+from core.database import (
+    get_all_facilities,
+    get_check_schedules,
+    save_check_schedule,
+    get_next_event_dates,
+)
+
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value[:10], '%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def compute_interval(
+    now: datetime,
+    latest_date: Optional[str],
+    next_event_date: Optional[str] = None,
+    change_rate: float = 0.5,
+    consecutive_failures: int = 0,
+    threshold_days: int = DORMANT_THRESHOLD_DAYS,
+) -> timedelta:
+    """
+    次回チェックまでの間隔を計算
+
+    Args:
+        now: 現在時刻
+        latest_date: 最新（過去）イベント日 YYYY-MM-DD
+        next_event_date: 今後の確定イベント日 YYYY-MM-DD
+        change_rate: 過去のチェックでページが変わっていた割合（0〜1）
+        consecutive_failures: 連続失敗回数
+    """
+    min_interval = timedelta(hours=RECHECK_MIN_HOURS)
+    max_interval = timedelta(days=RECHECK_MAX_DAYS)
+
+    if consecutive_failures > 0:
+        retry = timedelta(hours=RECHECK_RETRY_HOURS) * (2 ** min(consecutive_failures - 1, 8))
+        return min(retry, max_interval)
+
+    # 今後のイベントが確定していれば、その日までは活動中とみなせる
+    anchor = _parse_date(next_event_date) or _parse_date(latest_date)
+    if anchor is None:
+        interval = timedelta(days=RECHECK_DEFAULT_DAYS)
+    else:
+        dormant_at = anchor + timedelta(days=threshold_days)
+        if dormant_at > now:
+            # 活動中: 休眠判定の境界までの残り時間の半分
+            interval = (dormant_at - now) / 2
+        else:
+            # 休眠中: 休眠が長いほど間隔を延ばす
+            interval = (now - dormant_at) / 4 + timedelta(days=RECHECK_DEFAULT_DAYS)
+
+    # 更新頻度で補正（0.5倍〜1.5倍）
+    change_rate = max(0.0, min(1.0, change_rate))
+    interval = interval * (1.5 - change_rate)
+
+    return max(min_interval, min(interval, max_interval))
+
+
+def is_fetch_failure(result: dict) -> bool:
+    """ページを取得できなかった結果か（日付が見つからなかっただけの場合は含めない）"""
+    return bool(result.get('fetch_failed') or ('error' in result and not result.get('event_list')))
+
+
+class RecheckQueue:
+    """
+    次回チェック時刻の優先度付きキュー
+
+    DB（facility_check_schedule）の予定から構築し、予定のない施設は即時チェック対象とする。
+    """
+
+    def __init__(self, threshold_days: int = DORMANT_THRESHOLD_DAYS):
+        self.threshold_days = threshold_days
+        self._heap: List[Tuple[str, str]] = []
+        self._schedules: Dict[str, dict] = {}
+        self._facilities: Dict[str, dict] = {}
+
+    @classmethod
+    def load(cls, threshold_days: int = DORMANT_THRESHOLD_DAYS) -> "RecheckQueue":
+        """DBの施設と予定からキューを構築（閉鎖施設・URLなしは対象外）"""
+        queue = cls(threshold_days)
+        schedules = get_check_schedules()
+        epoch = datetime.min.isoformat()
+        for facility in get_all_facilities():
+            if facility.get('status') == 'closed' or not facility.get('website'):
+                continue
+            schedule = schedules.get(facility['id'])
+            queue._facilities[facility['id']] = facility
+            if schedule:
+                queue._schedules[facility['id']] = schedule
+            queue._push(facility['id'], schedule['next_check_at'] if schedule else epoch)
+        return queue
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def _push(self, facility_id: str, next_check_at: str):
+        heapq.heappush(self._heap, (next_check_at, facility_id))
+
+    def next_due_at(self) -> Optional[str]:
+        """最も早い次回チェック時刻"""
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: Optional[datetime] = None, limit: int = RECHECK_BATCH_LIMIT) -> List[dict]:
+        """期限が来た施設を次回チェック時刻の早い順に取り出す"""
+        now_iso = (now or datetime.now()).isoformat()
+        due = []
+        while self._heap and self._heap[0][0] <= now_iso and len(due) < limit:
+            _, facility_id = heapq.heappop(self._heap)
+            due.append(self._facilities[facility_id])
+        return due
+
+    def reschedule(self, facility: dict, result: dict, now: Optional[datetime] = None) -> dict:
+        """チェック結果から次回チェック時刻を計算してキューとDBに戻す"""
+        now = now or datetime.now()
+        facility_id = facility['id']
+        previous = self._schedules.get(facility_id, {})
+
+        failed = is_fetch_failure(result)
+        checks = (previous.get('checks') or 0) + 1
+        changes = (previous.get('changes') or 0) + (1 if result.get('page_changed') else 0)
+        failures = (previous.get('consecutive_failures') or 0) + 1 if failed else 0
+
+        latest_date = result.get('latest_date') or result.get('last_event_date') or facility.get('last_event_date')
+        next_event = get_next_event_dates([facility_id], now.strftime('%Y-%m-%d')).get(facility_id)
+        # 変更率はラプラス平滑化（チェック回数が少ないうちは0.5寄り）
+        change_rate = (changes + 1) / (checks + 2)
+
+        interval = compute_interval(now, latest_date, next_event, change_rate, failures, self.threshold_days)
+        schedule = {
+            "facility_id": facility_id,
+            "next_check_at": (now + interval).isoformat(),
+            "last_checked_at": now.isoformat(),
+            "interval_hours": round(interval.total_seconds() / 3600, 2),
+            "checks": checks,
+            "changes": changes,
+            "consecutive_failures": failures,
+        }
+        save_check_schedule(schedule)
+        self._schedules[facility_id] = schedule
+        if latest_date:
+            facility['last_event_date'] = latest_date
+        self._push(facility_id, schedule["next_check_at"])
+        return schedule
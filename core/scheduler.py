@@ -1,9 +1,8 @@
 """
 自動実行スケジューラー
 定期的にイベント情報を収集し、休眠判定を行う
+（実行時刻・制限時間などは config.SCHEDULER_JOBS、実行は core.async_scheduler）
 """
-import schedule
-import time
 from datetime import datetime
 import threading
 
@@ -11,89 +10,124 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from core.database import init_database, insert_event, load_initial_facilities
-from core.scorer import calculate_priority_score
-from core.dormant_checker import update_all_facility_statuses
+from config import METRICS_PORT
+from core.database import init_database, load_initial_facilities
+from core.pipeline import run_pipeline, prepare_event
+from core.facility_linker import load_facility_index, backfill_event_facilities
+from core.dormant_checker import update_all_facility_statuses, demote_dormant_facilities
+from core.async_scheduler import load_jobs, run_scheduler
+from core.job_lease import exclusive
+from core.metrics import track_run, record_source, start_metrics_server
+from core.background_jobs import report_progress
+
+
+def _fetch_connpass():
+    from scrapers.connpass import fetch_startup_events
+    return fetch_startup_events(months_ahead=2)
+
+
+def _fetch_peatix():
+    from scrapers.peatix import fetch_all_startup_events
+    return fetch_all_startup_events()
+
+
+def _fetch_doorkeeper():
+    from scrapers.doorkeeper import fetch_all_startup_events
+    return fetch_all_startup_events()
+
+
+# ソース名 → イベント取得関数
+EVENT_SOURCES = {
+    "connpass": _fetch_connpass,
+    "Peatix": _fetch_peatix,
+    "Doorkeeper": _fetch_doorkeeper,
+}
+
+
+def collect_events(source_names: list = None) -> dict:
+    """
+    指定ソースからパイプライン経由でイベントを収集
+
+    取得・スコアリング・施設紐付け・DB書き込みを並行に実行する。ソースはそれぞれ別ホストのため同時に取得する。
+    """
+    facility_index = load_facility_index()
+    sources = {
+        name: fetch for name, fetch in EVENT_SOURCES.items()
+        if source_names is None or name in source_names
+    }
+    for name in sources:
+        print(f"[{datetime.now()}] {name}からイベント収集開始...")
+
+    result = run_pipeline(
+        sources,
+        transform=lambda event: prepare_event(event, facility_index),
+    )
+
+    for name, counts in result["sources"].items():
+        if counts["error"]:
+            print(f"[{datetime.now()}] {name}エラー: {counts['error']}")
+        print(f"[{datetime.now()}] {name}から{counts['inserted']}件のイベントを収集")
+        record_source(name, fetched=counts["fetched"], inserted=counts["inserted"], errors=1 if counts["error"] else 0)
+
+    return result
 
 
 def collect_events_from_connpass():
     """connpassからイベントを収集"""
-    print(f"[{datetime.now()}] connpassからイベント収集開始...")
-    
-    try:
-        from scrapers.connpass import fetch_startup_events
-        
-        count = 0
-        for event in fetch_startup_events(months_ahead=2):
-            event['priority_score'] = calculate_priority_score(event)
-            if insert_event(event):
-                count += 1
-        
-        print(f"[{datetime.now()}] connpassから{count}件のイベントを収集")
-    except Exception as e:
-        print(f"[{datetime.now()}] connpassエラー: {e}")
+    return collect_events(["connpass"])
 
 
 def collect_events_from_peatix():
     """Peatixからイベントを収集"""
-    print(f"[{datetime.now()}] Peatixからイベント収集開始...")
-    
-    try:
-        from scrapers.peatix import fetch_all_startup_events
-        
-        count = 0
-        for event in fetch_all_startup_events():
-            event['priority_score'] = calculate_priority_score(event)
-            if insert_event(event):
-                count += 1
-        
-        print(f"[{datetime.now()}] Peatixから{count}件のイベントを収集")
-    except Exception as e:
-        print(f"[{datetime.now()}] Peatixエラー: {e}")
+    return collect_events(["Peatix"])
 
 
 def collect_events_from_doorkeeper():
     """Doorkeeperからイベントを収集"""
-    print(f"[{datetime.now()}] Doorkeeperからイベント収集開始...")
-    
-    try:
-        from scrapers.doorkeeper import fetch_all_startup_events
-        
-        count = 0
-        for event in fetch_all_startup_events():
-            event['priority_score'] = calculate_priority_score(event)
-            if insert_event(event):
-                count += 1
-        
-        print(f"[{datetime.now()}] Doorkeeperから{count}件のイベントを収集")
-    except Exception as e:
-        print(f"[{datetime.now()}] Doorkeeperエラー: {e}")
+    return collect_events(["Doorkeeper"])
 
 
+@exclusive("event_collection")
+@track_run("event_collection")
 def run_full_collection():
     """全ソースからイベントを収集"""
     print(f"\n{'='*50}")
     print(f"[{datetime.now()}] 全体収集開始")
     print(f"{'='*50}\n")
     
-    collect_events_from_connpass()
-    time.sleep(5)  # API負荷軽減
+    result = collect_events()
     
-    collect_events_from_peatix()
-    time.sleep(5)
-    
-    collect_events_from_doorkeeper()
+    # 施設追加前に収集された未紐付けイベントを補完
+    inserted = sum(counts["inserted"] for counts in result["sources"].values())
+    report_progress(inserted, message="既存イベントの施設紐付け")
+    linked = backfill_event_facilities()
+    print(f"[{datetime.now()}] 既存イベントの施設紐付け: {linked}件")
     
     print(f"\n[{datetime.now()}] 全体収集完了")
 
 
+@exclusive("dormant_check")
+@track_run("dormant_check")
 def run_dormant_check():
     """休眠チェックを実行"""
     print(f"\n[{datetime.now()}] 休眠チェック開始...")
     counts = update_all_facility_statuses()
+    changed = sum(v for k, v in counts.items() if k != "unchanged")
+    record_source("facilities", fetched=changed + counts["unchanged"], changed=changed)
     print(f"[{datetime.now()}] 休眠チェック完了: {counts}")
 
 
+@exclusive("dormant_check")
+@track_run("daily_demotion")
+def run_daily_demotion():
+    """閾値をまたいだ施設だけを休眠にする（アクティブへの昇格はイベント書き込み時に済んでいる）"""
+    print(f"\n[{datetime.now()}] 休眠判定開始...")
+    changed = demote_dormant_facilities()
+    dormant = sum(1 for facility in changed if facility['status'] == 'dormant')
+    record_source("facilities", changed=len(changed))
+    print(f"[{datetime.now()}] 休眠判定完了: {dormant}施設を休眠に、{len(changed) - dormant}施設を未判定に変更")
+
+
 def run_daily_job():
     """日次ジョブを実行"""
     print(f"\n{'='*50}")
@@ -101,33 +135,27 @@ def run_daily_job():
     print(f"{'='*50}\n")
     
     run_full_collection()
-    run_dormant_check()
+    run_daily_demotion()
     
     print(f"\n[{datetime.now()}] 日次ジョブ完了")
 
 
-def start_scheduler():
-    """スケジューラーを開始"""
+def start_scheduler(names: list = None):
+    """スケジューラーを開始（names を指定するとそのジョブのみ）"""
     print("スケジューラーを開始します...")
     
     # 初期化
     init_database()
     load_initial_facilities()
     
-    # 日次ジョブ（毎朝6時）
-    schedule.every().day.at("06:00").do(run_daily_job)
-    
-    # 週次休眠チェック（毎週月曜9時）
-    schedule.every().monday.at("09:00").do(run_dormant_check)
-    
-    print("スケジュール設定完了:")
-    print("  - 日次イベント収集: 毎朝 06:00")
-    print("  - 週次休眠チェック: 毎週月曜 09:00")
+    print("スケジュール設定:")
+    for job in load_jobs(names=names):
+        print(f"  - {job.name}: {job.describe()}")
     print("\nCtrl+C で停止")
     
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
+    if METRICS_PORT:
+        start_metrics_server()
+    run_scheduler(names)
 
 
 def run_scheduler_in_background():
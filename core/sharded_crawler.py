@@ -0,0 +1,180 @@
+"""
+マルチプロセス分割巡回モジュール
+1つのイベントループ・1つのブラウザではテキスト抽出・正規表現が1コアで頭打ちになるため、
+施設をシャードに分けてプロセスプールで並行チェックする。
+
+- 分割方法: ホスト名のハッシュ（既定、同一ホストは必ず同じワーカー → ホスト単位の礼儀を保てる）
+  または config.REGIONS の地方単位（件数が均等になるよう地方をワーカーに詰める）
+- 各ワーカーは自分のイベントループ・ブラウザプール・ConcurrentRunnerを持つ
+- チェック結果はキュー経由で親プロセスに集め、施設ステータス・作業キューへの反映は親の1か所（単一ライター）で行う
+  （クロールキャッシュ・取得方式などの小さな書き込みはWALモードのDBへ各ワーカーが直接行う）
+"""
+
+import asyncio
+import multiprocessing
+import os
+import queue as queue_module
+import zlib
+from typing import Callable, Dict, List, Optional
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import REGIONS, SHARD_PROCESSES, SHARD_STRATEGY, CHECK_CONCURRENCY
+from core.concurrent_runner import domain_of, facility_url
+
+
+STRATEGY_HASH = "hash"
+STRATEGY_REGION = "region"
+
+_PREFECTURE_REGION = {pref: region for region, prefs in REGIONS.items() for pref in prefs}
+
+# ワーカー → 親プロセスへのメッセージ種別
+_MSG_RESULT = "result"
+_MSG_DONE = "done"
+_MSG_ERROR = "error"
+
+
+def default_processes() -> int:
+    return SHARD_PROCESSES or os.cpu_count() or 1
+
+
+def shard_facilities(facilities: List[Dict], shards: int, strategy: str = SHARD_STRATEGY) -> List[List[Dict]]:
+    """
+    施設をシャードに分割
+
+    Args:
+        facilities: 施設リスト
+        shards: シャード数
+        strategy: 'hash'（ホスト名のハッシュ）または 'region'（地方単位）
+    """
+    shards = max(1, shards)
+    buckets: List[List[Dict]] = [[] for _ in range(shards)]
+
+    if strategy == STRATEGY_REGION:
+        # 地方ごとにまとめ、大きい地方から順に最も空いているシャードへ詰める
+        by_region: Dict[str, List[Dict]] = {}
+        for facility in facilities:
+            region = _PREFECTURE_REGION.get(facility.get('prefecture', ''), 'other')
+            by_region.setdefault(region, []).append(facility)
+        for region_facilities in sorted(by_region.values(), key=len, reverse=True):
+            min(buckets, key=len).extend(region_facilities)
+    else:
+        for facility in facilities:
+            host = domain_of(facility_url(facility)) or facility.get('id', '')
+            buckets[zlib.crc32(host.encode('utf-8')) % shards].append(facility)
+
+    return [bucket for bucket in buckets if bucket]
+
+
+def _worker_main(shard_index: int, facilities: List[Dict], results, concurrency: int,
+                 work_run_id: Optional[int], work_kind: Optional[str], work_worker_id: Optional[str]):
+    """
+    ワーカープロセス: 自分のブラウザプールでシャードをチェックし、結果を親へ送る
+
+    作業項目の取得は親と同じワーカーIDで行い、完了・失敗の記録と中断時の解放は親が担当する。
+    """
+    try:
+        from core.activity_checker import SimpleActivityChecker
+        from core.concurrent_runner import ConcurrentRunner
+
+        claim = None
+        if work_run_id is not None:
+            from core.work_queue import WorkQueue
+            work_queue = WorkQueue(work_run_id, work_kind, worker_id=work_worker_id)
+            claim = lambda facility: work_queue.claim(facility['id'])
+
+        def send(i: int, facility: Dict, result: Dict):
+            results.put((_MSG_RESULT, shard_index, facility, result))
+
+        async def run():
+            checker = SimpleActivityChecker()
+            await checker.check_all_facilities(
+                facilities, runner=ConcurrentRunner(concurrency=concurrency),
+                on_result=send, claim=claim
+            )
+
+        asyncio.run(run())
+        results.put((_MSG_DONE, shard_index, None, None))
+    except BaseException as e:
+        results.put((_MSG_ERROR, shard_index, None, f"{e.__class__.__name__}: {e}"))
+
+
+def run_sharded(
+    facilities: List[Dict],
+    on_result: Callable[[Dict, Dict], None],
+    processes: Optional[int] = None,
+    strategy: str = SHARD_STRATEGY,
+    concurrency: int = CHECK_CONCURRENCY,
+    work_run_id: Optional[int] = None,
+    work_kind: Optional[str] = None,
+    work_worker_id: Optional[str] = None,
+) -> Dict[str, int]:
+    """
+    施設をシャードに分けてプロセスプールでチェック
+
+    Args:
+        facilities: チェック対象
+        on_result: 結果の反映 (施設, 結果)。親プロセスでのみ呼ばれる（単一ライター）
+        processes: ワーカー数（省略時は SHARD_PROCESSES / CPUコア数）
+        strategy: シャード分割方法
+        concurrency: ワーカーごとの同時チェック数
+        work_run_id / work_kind / work_worker_id: 作業キューの実行とワーカーID
+            （指定時はワーカーが施設ごとに取得してから処理。完了の記録は on_result 側で行う）
+
+    Returns:
+        {"shards": シャード数, "results": 受信件数, "failed_shards": 異常終了したシャード数}
+    """
+    shards = shard_facilities(facilities, processes or default_processes(), strategy)
+    if not shards:
+        return {"shards": 0, "results": 0, "failed_shards": 0}
+
+    print(f"🧩 {len(shards)} プロセスで分割巡回（{strategy}）: " + ", ".join(str(len(s)) for s in shards))
+
+    # Playwright・スレッドを含むため fork ではなく spawn で起動
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    workers = [
+        context.Process(
+            target=_worker_main,
+            args=(i, shard, results, concurrency, work_run_id, work_kind, work_worker_id),
+            name=f"shard-{i}",
+            daemon=True,
+        )
+        for i, shard in enumerate(shards)
+    ]
+    for worker in workers:
+        worker.start()
+
+    finished = set()
+    failed = 0
+    received = 0
+    try:
+        while len(finished) < len(workers):
+            try:
+                kind, shard_index, facility, payload = results.get(timeout=1.0)
+            except queue_module.Empty:
+                # 終了通知を送れずに落ちたワーカーを検出
+                for i, worker in enumerate(workers):
+                    if i not in finished and not worker.is_alive() and results.empty():
+                        print(f"  ✗ shard-{i} が異常終了しました（exitcode={worker.exitcode}）")
+                        finished.add(i)
+                        failed += 1
+                continue
+
+            if kind == _MSG_RESULT:
+                received += 1
+                on_result(facility, payload)
+            elif kind == _MSG_DONE:
+                finished.add(shard_index)
+            elif kind == _MSG_ERROR:
+                print(f"  ✗ shard-{shard_index} でエラー: {payload}")
+                finished.add(shard_index)
+                failed += 1
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join(timeout=5)
+
+    return {"shards": len(shards), "results": received, "failed_shards": failed}
@@ -0,0 +1,143 @@
+"""
+施設サイト巡回イベントの保存モジュール
+AdvancedActivityChecker が施設サイトから集めた event_list を events テーブルへ書き込む。
+
+- source は "site_crawl"、施設IDを付けて保存（IDは施設・日付・タイトルから決まるため再実行してもUPSERTになる）
+- 同じ施設・同じ日のプラットフォーム（connpass/Peatix等）由来のイベントと同じものは書き込まない
+  （URL一致、またはタイトルの正規化文字列の一部一致）
+- イベントの書き込みと施設の last_event_date・ステータスの更新は1トランザクションで行う
+"""
+
+import hashlib
+import re
+from typing import Dict, List, Optional
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database import get_connection, apply_event_dates
+from core.facility_linker import normalize_text
+from core.scorer import calculate_priority_score
+
+
+SOURCE_SITE_CRAWL = "site_crawl"
+
+# タイトル照合に使う先頭文字数
+_TITLE_KEY_CHARS = 8
+
+_ONLINE_KEYWORDS = ('オンライン', 'online', 'ウェビナー', 'webinar', 'zoom')
+
+# 日付表記（タイトル照合時に除く）
+_DATE_TOKEN_PATTERN = re.compile(r"[\d年月日]+")
+
+UPSERT_SQL = """
+    INSERT INTO events
+    (id, facility_id, title, description, event_date, event_time,
+     venue, event_type, source, source_url, priority_score, is_online, prefecture)
+    VALUES (:id, :facility_id, :title, :description, :event_date, :event_time,
+            :venue, :event_type, :source, :source_url, :priority_score, :is_online,
+            COALESCE(:prefecture, (SELECT NULLIF(prefecture, '不明') FROM facilities WHERE id = :facility_id)))
+    ON CONFLICT(id) DO UPDATE SET
+        title = excluded.title,
+        prefecture = excluded.prefecture,
+        source_url = excluded.source_url,
+        priority_score = excluded.priority_score,
+        is_online = excluded.is_online
+"""
+
+
+def site_event_id(facility_id: str, event_date: str, title: str) -> str:
+    """施設・日付・タイトルからイベントIDを生成"""
+    return hashlib.md5(f"{SOURCE_SITE_CRAWL}_{facility_id}_{event_date}_{title}".encode()).hexdigest()[:16]
+
+
+def _title_key(title: Optional[str]) -> str:
+    """タイトル照合用のキー（正規化して日付表記を除いた先頭部分）"""
+    return _DATE_TOKEN_PATTERN.sub("", normalize_text(title))[:_TITLE_KEY_CHARS]
+
+
+def to_event_rows(facility_id: str, event_list: List[Dict]) -> List[Dict]:
+    """event_list を events テーブルの行に変換（日付・タイトルのないものは除く）"""
+    rows = {}
+    for event in event_list:
+        title = (event.get('title') or '').strip()
+        event_date = event.get('date')
+        if not title or not event_date:
+            continue
+        row = {
+            'id': site_event_id(facility_id, event_date, title),
+            'facility_id': facility_id,
+            'title': title,
+            'description': '',
+            'event_date': event_date,
+            'event_time': None,
+            'venue': None,
+            'event_type': None,
+            'source': SOURCE_SITE_CRAWL,
+            'source_url': event.get('link'),
+            'is_online': 1 if any(k in title.lower() for k in _ONLINE_KEYWORDS) else 0,
+            'prefecture': event.get('prefecture') or None,   # 未設定なら施設の都道府県（UPSERT_SQL）
+        }
+        row['priority_score'] = calculate_priority_score(row)
+        rows[row['id']] = row
+    return list(rows.values())
+
+
+def _is_duplicate(row: Dict, platform_events: List) -> bool:
+    """同じ日のプラットフォーム由来イベントと同じものか"""
+    key = _title_key(row['title'])
+    for event in platform_events:
+        if event['event_date'] != row['event_date']:
+            continue
+        if row['source_url'] and event['source_url'] == row['source_url']:
+            return True
+        other = _title_key(event['title'])
+        if key and other and (key in normalize_text(event['title']) or other in normalize_text(row['title'])):
+            return True
+    return False
+
+
+def persist_site_events(facility_id: str, event_list: List[Dict], last_event_date: Optional[str] = None) -> Dict[str, int]:
+    """
+    施設サイトのイベントを一括UPSERTし、施設の last_event_date を同じトランザクションで更新
+
+    Args:
+        facility_id: 施設ID
+        event_list: AdvancedActivityChecker の event_list（title, date, link）
+        last_event_date: 施設の最新イベント日（省略時は event_list の最大日付）
+
+    Returns:
+        {"written": 書き込んだ件数, "duplicates": プラットフォーム由来と重複した件数}
+    """
+    rows = to_event_rows(facility_id, event_list)
+    last_event_date = last_event_date or max((row['event_date'] for row in rows), default=None)
+    if not rows and not last_event_date:
+        return {"written": 0, "duplicates": 0}
+
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        dates = sorted({row['event_date'] for row in rows})
+        urls = sorted({row['source_url'] for row in rows if row['source_url']})
+        platform_events = []
+        if dates:
+            platform_events = conn.execute(f"""
+                SELECT event_date, title, source_url FROM events
+                WHERE source != ? AND event_date IN ({",".join("?" * len(dates))})
+                  AND (facility_id = ? OR source_url IN ({",".join("?" * len(urls)) or "NULL"}))
+            """, (SOURCE_SITE_CRAWL, *dates, facility_id, *urls)).fetchall()
+
+        new_rows = [row for row in rows if not _is_duplicate(row, platform_events)]
+        conn.executemany(UPSERT_SQL, new_rows)
+
+        if last_event_date:
+            apply_event_dates(conn.cursor(), {facility_id: last_event_date})
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return {"written": len(new_rows), "duplicates": len(rows) - len(new_rows)}
@@ -0,0 +1,264 @@
+"""
+段階的ページ取得モジュール
+施設サイトの大半は静的なCMSページのため、まずコネクションプール付きのHTTP GETと
+lxmlでテキスト・リンクを取り出し、以下の場合のみPlaywrightにフォールバックする。
+
+- HTTPで取得できない / 日付が1件も見つからない
+- クライアントサイドレンダリング（SPA）と判定された
+
+施設ごとに成功した方式をDBに記録し、次回はその方式から始める。
+"""
+
+import asyncio
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import urljoin
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import lxml.html
+from lxml import etree
+
+from config import (
+    BROWSER_USER_AGENT,
+    HTTP_TIMEOUT_SECONDS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_MAX_BYTES,
+    FETCH_TIER_REPROBE_DAYS,
+)
+from core.database import get_fetch_tier, set_fetch_tier
+from core.metrics import record_http_response
+
+
+TIER_FEED = "feed"        # RSS/Atom・サイトマップ（core.feed_discovery）
+TIER_HTTP = "http"
+TIER_BROWSER = "browser"
+TIER_PDF = "pdf"          # PDFのテキスト・メタデータ（core.pdf_extractor）
+
+# 本文抽出時に除去する要素
+_NON_CONTENT_TAGS = ("script", "style", "noscript", "template", "svg")
+_LAYOUT_TAGS = ("nav", "footer", "header")
+
+# 改行を入れるブロック要素（innerText相当の行構造を保つ）
+_BLOCK_TAGS = {
+    "p", "div", "li", "tr", "td", "th", "dt", "dd", "br", "section", "article",
+    "h1", "h2", "h3", "h4", "h5", "h6", "time", "table", "ul", "ol", "dl",
+}
+
+# 文字コード宣言（Content-Type / meta charset）
+_CHARSET_PATTERN = re.compile(rb'charset\s*=\s*["\']?([A-Za-z0-9_\-]+)', re.I)
+
+# SPAのマウントポイント
+_SPA_ROOT_PATTERN = re.compile(r'<div[^>]+id=["\'](?:root|app|__next|__nuxt)["\'][^>]*>\s*</div>', re.I)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """全チェックで共有するコネクションプール付きセッション"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_MAXSIZE,
+                pool_maxsize=HTTP_POOL_MAXSIZE,
+                max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504)),
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.hooks["response"].append(record_http_response)
+            session.headers.update({
+                "User-Agent": BROWSER_USER_AGENT,
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": "ja,en;q=0.8",
+            })
+            _session = session
+        return _session
+
+
+class StaticPage:
+    """HTTPで取得・解析したページ"""
+
+    def __init__(self, url: str, final_url: str, status: int, text: str,
+                 links: List[Dict], client_rendered: bool, size: int):
+        self.url = url
+        self.final_url = final_url
+        self.status = status
+        self.text = text
+        self.links = links
+        self.client_rendered = client_rendered
+        self.size = size
+
+
+def html_to_text(doc, drop_layout: bool = False) -> str:
+    """lxmlの文書からinnerText相当のテキストを抽出"""
+    etree.strip_elements(doc, *_NON_CONTENT_TAGS, with_tail=False)
+    if drop_layout:
+        etree.strip_elements(doc, *_LAYOUT_TAGS, with_tail=False)
+    for el in doc.iter(*_BLOCK_TAGS):
+        el.tail = "\n" + (el.tail or "")
+    body = doc.find("body")
+    text = (body if body is not None else doc).text_content()
+    # 連続する空白行を詰める
+    return re.sub(r"\n\s*\n+", "\n", text).strip()
+
+
+def extract_links(doc, base_url: str) -> List[Dict]:
+    """ページ内のリンクを {text, href} のリストで取得（絶対URL化）"""
+    links = []
+    for a in doc.iter("a"):
+        href = a.get("href")
+        if not href or href.startswith(("javascript:", "mailto:", "tel:", "#")):
+            continue
+        links.append({
+            "text": (a.text_content() or "").strip().lower(),
+            "href": urljoin(base_url, href),
+            "ariaLabel": a.get("aria-label") or "",
+        })
+    return links
+
+
+def looks_client_rendered(html: str, text: str) -> bool:
+    """クライアントサイドレンダリングのページか判定"""
+    if len(text) >= 500:
+        return False
+    if _SPA_ROOT_PATTERN.search(html):
+        return True
+    lowered = html.lower()
+    if "enable javascript" in lowered or "javascriptを有効" in html:
+        return True
+    # 本文がほぼ空でスクリプトだけのページ
+    return len(text) < 200 and lowered.count("<script") >= 3
+
+
+def detect_encoding(content: bytes, content_type: str = "") -> str:
+    """Content-Type → meta charset の順に文字コードを判定（宣言がなければUTF-8）"""
+    for source in (content_type.encode("ascii", errors="ignore"), content[:4096]):
+        match = _CHARSET_PATTERN.search(source)
+        if match:
+            encoding = match.group(1).decode("ascii").lower()
+            # Shift_JISの拡張文字を取りこぼさないようcp932として扱う
+            return "cp932" if encoding in ("shift_jis", "shift-jis", "sjis", "x-sjis") else encoding
+    return "utf-8"
+
+
+def parse_html(content: bytes, base_url: str, drop_layout: bool = False, content_type: str = "") -> tuple:
+    """HTMLを解析して (テキスト, リンク, CSR判定) を返す"""
+    try:
+        html = content.decode(detect_encoding(content, content_type), errors="replace")
+    except LookupError:
+        html = content.decode("utf-8", errors="replace")
+    # XML宣言付きの文字列はlxmlが受け付けないため除去
+    html = re.sub(r"^\s*<\?xml[^>]*\?>", "", html)
+    doc = lxml.html.document_fromstring(html)
+    links = extract_links(doc, base_url)
+    raw_html = html[:200_000]
+    text = html_to_text(doc, drop_layout=drop_layout)
+    return text, links, looks_client_rendered(raw_html, text)
+
+
+def _read_limited(response: requests.Response, max_bytes: int) -> bytes:
+    """ストリーミングでmax_bytesまで読み込んで接続を閉じる"""
+    chunks = []
+    size = 0
+    for chunk in response.iter_content(64 * 1024):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= max_bytes:
+            break
+    response.close()
+    return b"".join(chunks)
+
+
+class RawResponse(NamedTuple):
+    """HTTP GETの生レスポンス"""
+    final_url: str
+    status: int
+    content_type: str
+    content: bytes
+
+
+def fetch_bytes(url: str, timeout: float = HTTP_TIMEOUT_SECONDS, max_bytes: int = HTTP_MAX_BYTES,
+                headers: Optional[Dict[str, str]] = None) -> Optional[RawResponse]:
+    """HTTP GETで本文をmax_bytesまで取得（ステータスは問わない、通信エラー時はNone）"""
+    try:
+        response = get_http_session().get(url, timeout=timeout, stream=True, headers=headers)
+        content = _read_limited(response, max_bytes)
+        return RawResponse(response.url, response.status_code,
+                           response.headers.get("Content-Type", "").lower(), content)
+    except Exception as e:
+        print(f"  ⚠ HTTP取得エラー: {url} ({e})")
+        return None
+
+
+def fetch_static(url: str, drop_layout: bool = False, timeout: float = HTTP_TIMEOUT_SECONDS) -> Optional[StaticPage]:
+    """HTTP GETでページを取得して解析（HTML以外・エラー時はNone）"""
+    try:
+        response = get_http_session().get(url, timeout=timeout, stream=True)
+        content_type = response.headers.get("Content-Type", "").lower()
+        if response.status_code >= 400 or ("html" not in content_type and "xml" not in content_type):
+            response.close()
+            return None
+
+        content = _read_limited(response, HTTP_MAX_BYTES)
+
+        text, links, client_rendered = parse_html(content, response.url, drop_layout, content_type)
+        return StaticPage(url, response.url, response.status_code, text, links, client_rendered, len(content))
+    except Exception as e:
+        print(f"  ⚠ HTTP取得エラー: {url} ({e})")
+        return None
+
+
+async def fetch_static_async(url: str, drop_layout: bool = False) -> Optional[StaticPage]:
+    """fetch_staticをスレッドで実行（イベントループを止めない）"""
+    return await asyncio.to_thread(fetch_static, url, drop_layout)
+
+
+def preferred_tier(facility_id: Optional[str]) -> str:
+    """施設で最初に試す取得方式"""
+    if not facility_id:
+        return TIER_HTTP
+    record = get_fetch_tier(facility_id)
+    if not record or record["tier"] != TIER_BROWSER:
+        return TIER_HTTP
+    # ブラウザ必須と判定して（最後にHTTPを試して）から時間が経っていればHTTPを再試行（サイト改修に追従）
+    try:
+        probed = datetime.fromisoformat(record.get("http_probed_at") or record["updated_at"])
+    except (TypeError, ValueError):
+        return TIER_BROWSER
+    if datetime.now() - probed > timedelta(days=FETCH_TIER_REPROBE_DAYS):
+        return TIER_HTTP
+    return TIER_BROWSER
+
+
+def remember_tier(facility_id: Optional[str], tier: str, http_probed: bool = False):
+    """
+    施設で成功した取得方式を記録
+
+    Args:
+        http_probed: 今回HTTPを試した上でこの方式になったか（ブラウザ必須のまま再試行の時刻だけ進める）
+    """
+    if facility_id:
+        try:
+            set_fetch_tier(facility_id, tier, http_probed)
+        except Exception as e:
+            print(f"  ⚠ 取得方式の記録に失敗: {e}")
+
+
+async def preferred_tier_async(facility_id: Optional[str]) -> str:
+    """preferred_tierをスレッドで実行（DBのロック待ちでイベントループを止めない）"""
+    return await asyncio.to_thread(preferred_tier, facility_id)
+
+
+async def remember_tier_async(facility_id: Optional[str], tier: str, http_probed: bool = False):
+    """remember_tierをスレッドで実行（DBのロック待ちでイベントループを止めない）"""
+    await asyncio.to_thread(remember_tier, facility_id, tier, http_probed)
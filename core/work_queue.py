@@ -0,0 +1,286 @@
+"""
+再開可能なバッチ実行（作業キュー）モジュール
+施設チェック・イベントJSON生成などの一括処理を、施設ごとの作業項目としてDBに記録する。
+
+- 項目の状態: pending（未処理）→ running（処理中）→ done（完了）/ failed（失敗）
+- 中断（クラッシュ・Ctrl+C・ハング）後は同じ実行を再開し、完了済みの項目は飛ばす
+  （WORK_RESUME_MAX_AGE_HOURS より古い実行は結果が古いため再開しない）
+- 新しい実行を作ると、同じ種類の未完了の実行は abandoned（破棄）にする
+- 失敗した項目は WORK_MAX_ATTEMPTS 回まで再試行
+- 項目の取得は条件付きUPDATE 1文で行うため、複数ワーカーが同時に動いても二重処理しない
+- WORK_ITEM_STALE_SECONDS を超えて running のままの項目は異常終了とみなし再取得できる
+"""
+
+import json
+import os
+import socket
+import sys
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import WORK_MAX_ATTEMPTS, WORK_ITEM_STALE_SECONDS, WORK_RESUME_MAX_AGE_HOURS
+from core.database import get_connection
+
+
+STATE_PENDING = "pending"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+
+RUN_RUNNING = "running"
+RUN_DONE = "done"
+RUN_ABANDONED = "abandoned"
+
+
+def default_worker_id() -> str:
+    """ホスト名・プロセスIDと乱数からワーカーIDを生成"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class WorkQueue:
+    """
+    1回のバッチ実行の作業項目キュー
+
+    Args:
+        run_id: batch_runs のID
+        kind: 処理の種類（'activity_check' など）
+        worker_id: 項目を取得するワーカーの識別子
+    """
+
+    def __init__(
+        self,
+        run_id: int,
+        kind: str,
+        worker_id: Optional[str] = None,
+        max_attempts: int = WORK_MAX_ATTEMPTS,
+        stale_seconds: float = WORK_ITEM_STALE_SECONDS,
+    ):
+        self.run_id = run_id
+        self.kind = kind
+        self.worker_id = worker_id or default_worker_id()
+        self.max_attempts = max_attempts
+        self.stale_seconds = stale_seconds
+
+    # ------------------------------------------------------------------
+    # 実行の作成・再開
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def create(cls, kind: str, item_keys: Iterable[str], params: Optional[dict] = None, **kwargs) -> "WorkQueue":
+        """新しい実行を作成し、作業項目を登録（同じ種類の未完了の実行は破棄する）"""
+        now = datetime.now().isoformat()
+        conn = get_connection()
+        try:
+            abandoned = conn.execute(
+                "UPDATE batch_runs SET status = ?, finished_at = ? WHERE kind = ? AND status = ?",
+                (RUN_ABANDONED, now, kind, RUN_RUNNING)
+            ).rowcount
+            cursor = conn.execute(
+                "INSERT INTO batch_runs (kind, status, params, created_at) VALUES (?, ?, ?, ?)",
+                (kind, RUN_RUNNING, json.dumps(params or {}, ensure_ascii=False), now)
+            )
+            run_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT OR IGNORE INTO work_items (run_id, item_key, position, state, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(run_id, key, i, STATE_PENDING, now) for i, key in enumerate(item_keys)]
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        if abandoned:
+            print(f"🗑 未完了の {kind} 実行 {abandoned} 件を破棄しました（実行#{run_id} に置き換え）")
+        return cls(run_id, kind, **kwargs)
+
+    @classmethod
+    def latest(
+        cls,
+        kind: str,
+        include_finished: bool = False,
+        max_age_hours: Optional[float] = None,
+        **kwargs,
+    ) -> Optional["WorkQueue"]:
+        """種類ごとの最新の実行（既定では未完了のもののみ。max_age_hours を指定するとそれより新しいもののみ）"""
+        conn = get_connection()
+        try:
+            sql, params = "SELECT id FROM batch_runs WHERE kind = ?", [kind]
+            if not include_finished:
+                sql += f" AND status = '{RUN_RUNNING}'"
+            if max_age_hours is not None:
+                sql += " AND created_at >= ?"
+                params.append((datetime.now() - timedelta(hours=max_age_hours)).isoformat())
+            row = conn.execute(sql + " ORDER BY id DESC LIMIT 1", params).fetchone()
+        finally:
+            conn.close()
+        return cls(row["id"], kind, **kwargs) if row else None
+
+    @classmethod
+    def resume_or_create(
+        cls,
+        kind: str,
+        item_keys: Iterable[str],
+        params: Optional[dict] = None,
+        fresh: bool = False,
+        max_age_hours: float = WORK_RESUME_MAX_AGE_HOURS,
+        **kwargs,
+    ) -> Tuple["WorkQueue", bool]:
+        """
+        max_age_hours 以内に始まった未完了の実行があれば再開、なければ新規作成
+
+        Returns:
+            (キュー, 再開したか)
+        """
+        if not fresh:
+            queue = cls.latest(kind, max_age_hours=max_age_hours, **kwargs)
+            if queue is not None:
+                return queue, True
+        return cls.create(kind, item_keys, params, **kwargs), False
+
+    @property
+    def params(self) -> dict:
+        conn = get_connection()
+        try:
+            row = conn.execute("SELECT params FROM batch_runs WHERE id = ?", (self.run_id,)).fetchone()
+        finally:
+            conn.close()
+        return json.loads(row["params"]) if row and row["params"] else {}
+
+    # ------------------------------------------------------------------
+    # 項目の取得・完了
+    # ------------------------------------------------------------------
+
+    def _stale_before(self) -> str:
+        return (datetime.now() - timedelta(seconds=self.stale_seconds)).isoformat()
+
+    def claimable_keys(self) -> List[str]:
+        """処理待ちの項目（未処理・再試行可能な失敗・異常終了した処理中）を登録順に取得"""
+        conn = get_connection()
+        try:
+            rows = conn.execute("""
+                SELECT item_key FROM work_items
+                WHERE run_id = ? AND attempts < ? AND (
+                    state IN (?, ?) OR (state = ? AND claimed_at < ?)
+                )
+                ORDER BY position
+            """, (self.run_id, self.max_attempts, STATE_PENDING, STATE_FAILED,
+                  STATE_RUNNING, self._stale_before())).fetchall()
+        finally:
+            conn.close()
+        return [row["item_key"] for row in rows]
+
+    def claim(self, item_key: str) -> bool:
+        """
+        項目を処理中にする（他のワーカーが取得済みならFalse）
+
+        条件付きUPDATE 1文で状態確認と更新を行うため、同時に取得しても成功するのは1ワーカーのみ。
+        """
+        now = datetime.now().isoformat()
+        conn = get_connection()
+        try:
+            cursor = conn.execute("""
+                UPDATE work_items
+                SET state = ?, claimed_by = ?, claimed_at = ?, attempts = attempts + 1, updated_at = ?
+                WHERE run_id = ? AND item_key = ? AND attempts < ? AND (
+                    state IN (?, ?) OR (state = ? AND claimed_at < ?)
+                )
+            """, (STATE_RUNNING, self.worker_id, now, now,
+                  self.run_id, item_key, self.max_attempts,
+                  STATE_PENDING, STATE_FAILED, STATE_RUNNING, self._stale_before()))
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def _finish_item(self, item_key: str, state: str, result: Any = None, error: Optional[str] = None):
+        conn = get_connection()
+        try:
+            conn.execute("""
+                UPDATE work_items SET state = ?, result = ?, error = ?, updated_at = ?
+                WHERE run_id = ? AND item_key = ? AND claimed_by = ?
+            """, (state, json.dumps(result, ensure_ascii=False) if result is not None else None, error,
+                  datetime.now().isoformat(), self.run_id, item_key, self.worker_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def complete(self, item_key: str, result: Any = None):
+        """項目を完了にする（resultはJSON化して保存）"""
+        self._finish_item(item_key, STATE_DONE, result)
+
+    def fail(self, item_key: str, error: str, result: Any = None):
+        """項目を失敗にする（試行回数が上限未満なら次回再試行される）"""
+        self._finish_item(item_key, STATE_FAILED, result, error)
+
+    def release(self):
+        """このワーカーが処理中の項目を未処理に戻す（Ctrl+C等で中断した場合）"""
+        conn = get_connection()
+        try:
+            conn.execute("""
+                UPDATE work_items SET state = ?, attempts = MAX(attempts - 1, 0), claimed_by = NULL, updated_at = ?
+                WHERE run_id = ? AND state = ? AND claimed_by = ?
+            """, (STATE_PENDING, datetime.now().isoformat(), self.run_id, STATE_RUNNING, self.worker_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def reset_failed(self) -> int:
+        """失敗した項目の試行回数をリセットして再試行可能にし、実行を再開状態にする"""
+        conn = get_connection()
+        try:
+            cursor = conn.execute("""
+                UPDATE work_items SET state = ?, attempts = 0, updated_at = ?
+                WHERE run_id = ? AND state = ?
+            """, (STATE_PENDING, datetime.now().isoformat(), self.run_id, STATE_FAILED))
+            conn.execute("UPDATE batch_runs SET status = ?, finished_at = NULL WHERE id = ?",
+                         (RUN_RUNNING, self.run_id))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # 集計
+    # ------------------------------------------------------------------
+
+    def summary(self) -> Dict[str, int]:
+        """状態ごとの項目数"""
+        conn = get_connection()
+        try:
+            rows = conn.execute(
+                "SELECT state, COUNT(*) AS n FROM work_items WHERE run_id = ? GROUP BY state",
+                (self.run_id,)
+            ).fetchall()
+        finally:
+            conn.close()
+        counts = {STATE_PENDING: 0, STATE_RUNNING: 0, STATE_DONE: 0, STATE_FAILED: 0}
+        counts.update({row["state"]: row["n"] for row in rows})
+        return counts
+
+    def results(self, states: Iterable[str] = (STATE_DONE,)) -> List[Tuple[str, Any]]:
+        """指定状態の項目の (キー, 結果) を登録順に取得"""
+        states = list(states)
+        conn = get_connection()
+        try:
+            rows = conn.execute(f"""
+                SELECT item_key, result FROM work_items
+                WHERE run_id = ? AND state IN ({",".join("?" * len(states))})
+                ORDER BY position
+            """, (self.run_id, *states)).fetchall()
+        finally:
+            conn.close()
+        return [(row["item_key"], json.loads(row["result"]) if row["result"] else None) for row in rows]
+
+    def finish_if_complete(self) -> bool:
+        """処理待ち・処理中の項目がなければ実行を完了にする"""
+        if self.claimable_keys() or self.summary()[STATE_RUNNING]:
+            return False
+        conn = get_connection()
+        try:
+            conn.execute("UPDATE batch_runs SET status = ?, finished_at = ? WHERE id = ?",
+                         (RUN_DONE, datetime.now().isoformat(), self.run_id))
+            conn.commit()
+        finally:
+            conn.close()
+        return True
@@ -12,6 +12,8 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from config import CONNPASS_API_URL, CONNPASS_SEARCH_KEYWORDS, REQUEST_DELAY_SECONDS
+from core.facility_linker import extract_prefecture
+from core.metrics import record_http_response
 
 
 def generate_event_id(source: str, original_id: str) -> str:
@@ -62,7 +64,8 @@ def fetch_events(
         response = requests.get(
             CONNPASS_API_URL, 
             params=params,
-            headers={"User-Agent": "StartupEventAggregator/1.0"}
+            headers={"User-Agent": "StartupEventAggregator/1.0"},
+            hooks={"response": record_http_response}
         )
         response.raise_for_status()
         return response.json()
@@ -126,7 +129,8 @@ def fetch_events_by_group(series_id: int) -> list:
         response = requests.get(
             CONNPASS_API_URL,
             params=params,
-            headers={"User-Agent": "StartupEventAggregator/1.0"}
+            headers={"User-Agent": "StartupEventAggregator/1.0"},
+            hooks={"response": record_http_response}
         )
         response.raise_for_status()
         data = response.json()
@@ -168,6 +172,7 @@ def normalize_event(raw_event: dict) -> dict:
         "event_date": event_date,
         "event_time": event_time,
         "venue": place or address,
+        "address": address,
         "source": "connpass",
         "source_url": raw_event.get("event_url", ""),
         "is_online": is_online,
@@ -181,24 +186,6 @@ def normalize_event(raw_event: dict) -> dict:
     }
 
 
-def extract_prefecture(address: str) -> Optional[str]:
-    """住所から都道府県を抽出"""
-    prefectures = [
-        "北海道", "青森県", "岩手県", "宮城県", "秋田県", "山形県", "福島県",
-        "茨城県", "栃木県", "群馬県", "埼玉県", "千葉県", "東京都", "神奈川県",
-        "新潟県", "富山県", "石川県", "福井県", "山梨県", "長野県", "岐阜県",
-        "静岡県", "愛知県", "三重県", "滋賀県", "京都府", "大阪府", "兵庫県",
-        "奈良県", "和歌山県", "鳥取県", "島根県", "岡山県", "広島県", "山口県",
-        "徳島県", "香川県", "愛媛県", "高知県", "福岡県", "佐賀県", "長崎県",
-        "熊本県", "大分県", "宮崎県", "鹿児島県", "沖縄県"
-    ]
-    
-    for pref in prefectures:
-        if pref in address:
-            return pref
-    return None
-
-
 if __name__ == "__main__":
     print("=== connpass イベント取得テスト ===")
     
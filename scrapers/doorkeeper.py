@@ -5,7 +5,6 @@ Doorkeeperからスタートアップ関連イベントを取得
 import requests
 from bs4 import BeautifulSoup
 import time
-from datetime import datetime
 from typing import Generator, Optional
 import hashlib
 import re
@@ -14,6 +13,8 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from config import REQUEST_DELAY_SECONDS
+from core.date_extractor import parse_date_text
+from core.metrics import record_http_response
 
 
 DOORKEEPER_SEARCH_URL = "https://www.doorkeeper.jp/events"
@@ -49,7 +50,8 @@ def search_events(keyword: str, page: int = 1) -> list:
     }
     
     try:
-        response = requests.get(DOORKEEPER_SEARCH_URL, params=params, headers=headers)
+        response = requests.get(DOORKEEPER_SEARCH_URL, params=params, headers=headers,
+                                hooks={"response": record_http_response})
         response.raise_for_status()
         return parse_search_results(response.text)
     except requests.RequestException as e:
@@ -134,38 +136,6 @@ def extract_event_from_card(card) -> Optional[dict]:
     }
 
 
-def parse_date_text(date_text: str) -> tuple:
-    """
-    日時テキストをパース
-    """
-    if not date_text:
-        return "", ""
-    
-    patterns = [
-        r'(\d{4})[年/\-](\d{1,2})[月/\-](\d{1,2})',
-        r'(\d{1,2})[月/](\d{1,2})',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, date_text)
-        if match:
-            groups = match.groups()
-            if len(groups) == 3:
-                year, month, day = groups
-                event_date = f"{year}-{int(month):02d}-{int(day):02d}"
-            else:
-                month, day = groups
-                year = datetime.now().year
-                event_date = f"{year}-{int(month):02d}-{int(day):02d}"
-            
-            time_match = re.search(r'(\d{1,2}):(\d{2})', date_text)
-            event_time = f"{time_match.group(1)}:{time_match.group(2)}" if time_match else ""
-            
-            return event_date, event_time
-    
-    return "", ""
-
-
 def fetch_all_startup_events() -> Generator[dict, None, None]:
     """
     全スタートアップ関連イベントを取得
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+日付抽出エンジンのスループット計測スクリプト
+数MBのポータルページ相当のテキストを生成し、旧実装（行×パターンの多重ループ）と比較する
+"""
+
+import re
+import sys
+import os
+import time
+import random
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.date_extractor import DateExtractor
+
+
+REFERENCE_DATE = datetime(2026, 2, 4)
+
+# 旧 advanced_activity_checker の実装（比較用）
+_LEGACY_PATTERNS = [
+    (r'(\d{4})年\s*(\d{1,2})月\s*(\d{1,2})日', 'ymd'),
+    (r'(\d{4})/(\d{1,2})/(\d{1,2})', 'ymd'),
+    (r'(\d{4})-(\d{2})-(\d{2})', 'ymd'),
+    (r'(\d{4})\.(\d{1,2})\.(\d{1,2})', 'ymd'),
+    (r'令和(\d{1,2})年\s*(\d{1,2})月\s*(\d{1,2})日', 'reiwa'),
+    (r'R(\d{1,2})\.(\d{1,2})\.(\d{1,2})', 'reiwa'),
+    (r'(\d{1,2})/(\d{1,2})(?!\d)', 'md'),
+    (r'(\d{1,2})月\s*(\d{1,2})日', 'md'),
+]
+
+
+def _legacy_parse(text):
+    for pattern, date_type in _LEGACY_PATTERNS:
+        match = re.search(pattern, text.strip())
+        if match:
+            g = match.groups()
+            try:
+                if date_type == 'ymd':
+                    y, m, d = int(g[0]), int(g[1]), int(g[2])
+                elif date_type == 'reiwa':
+                    y, m, d = 2018 + int(g[0]), int(g[1]), int(g[2])
+                else:
+                    m, d = int(g[0]), int(g[1])
+                    y = REFERENCE_DATE.year + (1 if m < REFERENCE_DATE.month else 0)
+                if 1 <= m <= 12 and 1 <= d <= 31:
+                    return datetime(y, m, d)
+            except ValueError:
+                continue
+    return None
+
+
+def legacy_extract(text):
+    results = []
+    for line in text.split('\n'):
+        for pattern, _ in _LEGACY_PATTERNS:
+            for match in re.finditer(pattern, line):
+                parsed = _legacy_parse(match.group())
+                if parsed and 2020 <= parsed.year <= 2030:
+                    results.append((parsed, line.strip()[:100]))
+    return results
+
+
+def generate_page(size_mb: float, seed: int = 0) -> str:
+    """お知らせ一覧風のテキストを生成"""
+    rng = random.Random(seed)
+    templates = [
+        "{y}年{m}月{d}日 スタートアップピッチイベント開催のお知らせ",
+        "{y}.{m:02d}.{d:02d} 【セミナー】補助金活用講座を開催しました",
+        "令和{r}年{m}月{d}日 交流会レポートを公開",
+        "NEWS {y}/{m}/{d} 入居企業募集のご案内",
+        "{m}月{d}日（土）13:00〜 ワークショップ",
+        "更新: {n}日前 ・ 施設の利用案内を更新しました",
+        "アクセス 〒100-0005 東京都千代田区丸の内3-8-3 TEL 03-1234-5678",
+        "Copyright (c) Startup Support Center. All rights reserved.",
+    ]
+    lines = []
+    size = 0
+    target = int(size_mb * 1024 * 1024)
+    while size < target:
+        y = rng.randint(2019, 2027)
+        line = rng.choice(templates).format(
+            y=y, r=max(y - 2018, 1), m=rng.randint(1, 12), d=rng.randint(1, 28), n=rng.randint(1, 30)
+        )
+        lines.append(line)
+        size += len(line.encode('utf-8')) + 1
+    return '\n'.join(lines)
+
+
+def bench(label, func, text, repeat=3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        best = min(best, time.perf_counter() - start)
+    mb = len(text.encode('utf-8')) / (1024 * 1024)
+    print(f"  {label:<28} {best * 1000:8.1f} ms  {mb / best:7.1f} MB/s  ({len(result)} 件)")
+    return best
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='日付抽出スループット計測')
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1, 4, 8], help='ページサイズ(MB)')
+    parser.add_argument('--repeat', type=int, default=3, help='計測回数（最良値を採用）')
+    parser.add_argument('--skip-legacy', action='store_true', help='旧実装の計測を省略')
+    args = parser.parse_args()
+
+    extractor = DateExtractor(REFERENCE_DATE)
+
+    print(f"\n{'='*60}")
+    print("📏 日付抽出スループット")
+    print(f"{'='*60}")
+
+    for size in args.sizes:
+        text = generate_page(size)
+        print(f"\n[{size} MB]")
+        new = bench("single-pass (全日付)", extractor.extract_dates, text, args.repeat)
+        bench("single-pass (日付+文脈)", extractor.extract_dates_with_context, text, args.repeat)
+        if not args.skip_legacy:
+            old = bench("legacy (行×パターン)", legacy_extract, text, args.repeat)
+            print(f"  → {old / new:.1f}倍高速")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,19 @@
 """
 全施設の活動状況をチェックし、データベースを更新するバッチスクリプト
 3日に1回のスケジュール実行を想定
+
+進捗は作業キュー（core.work_queue）に施設単位で記録される。
+中断した場合は再実行すると未完了・失敗した施設だけを処理する。
+
+使い方:
+    python scripts/check_all_facilities.py                 # 未完了の実行があれば再開
+    python scripts/check_all_facilities.py --fresh         # 新しい実行を開始
+    python scripts/check_all_facilities.py --retry-failed  # 直近の実行の失敗施設だけ再試行
+    python scripts/check_all_facilities.py --processes 8   # 8プロセスで分割巡回
 """
 
 import asyncio
+import itertools
 import sys
 import os
 from datetime import datetime
@@ -12,11 +22,33 @@ from datetime import datetime
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from core.activity_checker import SimpleActivityChecker
+from core.concurrent_runner import ConcurrentRunner
 from core.database import get_all_facilities, update_facility_status, init_database
+from core.recheck_scheduler import is_fetch_failure
+from core.sharded_crawler import run_sharded, STRATEGY_HASH, STRATEGY_REGION
+from core.work_queue import WorkQueue
+from core.job_lease import exclusive
+from core.metrics import track_run, record_source
+from core.background_jobs import report_progress
+
+WORK_KIND = "activity_check"
 
 
-async def run_activity_check():
-    """全施設の活動チェックを実行"""
+@exclusive("facility_check")
+@track_run("facility_check")
+async def run_activity_check(facilities: list = None, on_checked=None, fresh: bool = False, retry_failed: bool = False,
+                             processes: int = 1, shard_by: str = STRATEGY_HASH):
+    """
+    全施設の活動チェックを実行
+    
+    Args:
+        facilities: チェック対象（省略時は全施設を再開可能なバッチとして実行）
+        on_checked: 施設ごとの結果通知 (施設, 結果)。再チェック予定の更新などに使う
+        fresh: 未完了の実行があっても新しい実行を始める
+        retry_failed: 直近の実行で失敗した施設だけ再試行する
+        processes: 2以上なら施設を分割して複数プロセスでチェック（DB更新はこのプロセスで行う）
+        shard_by: 分割方法（'hash' / 'region'）
+    """
     print(f"\n{'='*60}")
     print(f"🔍 活動状況チェック開始: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"{'='*60}\n")
@@ -24,8 +56,11 @@ async def run_activity_check():
     # データベース初期化
     init_database()
     
-    # 全施設取得
-    facilities = get_all_facilities()
+    # 全施設取得（全施設の一括実行は作業キューで進捗を記録）
+    queue = None
+    if facilities is None:
+        facilities = get_all_facilities()
+        facilities, queue = _prepare_work_queue(facilities, fresh, retry_failed)
     total = len(facilities)
     
     if not facilities:
@@ -42,47 +77,93 @@ async def run_activity_check():
         'active': 0,
         'dormant': 0,
         'unknown': 0,
-        'error': 0
+        'error': 0,
+        'unchanged': 0
     }
+    transferred = {'bytes': 0}
+    
+    # URLのない施設は対象外
+    targets = [f for f in facilities if f.get('website')]
+    for facility in facilities:
+        if not facility.get('website'):
+            print(f"⚠ {facility.get('name', '')}: URLなし")
+            stats['unknown'] += 1
     
-    # 全施設をチェック
-    for i, facility in enumerate(facilities, 1):
-        url = facility.get('website')
+    def report(i: int, facility: dict, result: dict):
+        """入力順に結果を表示してDBを更新"""
         name = facility.get('name', '')
-        facility_id = facility.get('id')
-        
-        print(f"[{i}/{total}] ", end="")
+        status = result.get('status', 'unknown')
+        report_progress(i, len(targets), name)
+        if status == 'skipped':
+            print(f"[{i}/{len(targets)}] ⏭ {name}: 他のワーカーが処理中")
+            return
+        stats[status] = stats.get(status, 0) + 1
+        transferred['bytes'] += result.get('bytes_transferred') or 0
         
-        if not url:
-            print(f"⚠ {name}: URLなし")
-            stats['unknown'] += 1
-            continue
+        # ページが前回から変わらず判定も同じなら書き込みを省略
+        unchanged = (
+            result.get('page_changed') is False
+            and facility.get('status') == status
+            and facility.get('last_event_date') == result.get('latest_date')
+        )
+        if unchanged:
+            stats['unchanged'] += 1
+        record_source(WORK_KIND, fetched=1, errors=1 if is_fetch_failure(result) else 0)
         
         try:
-            result = await checker.check_facility(url, name)
-            
-            status = result.get('status', 'unknown')
-            stats[status] = stats.get(status, 0) + 1
+            # 再チェック予定の更新など（DBのロック等で失敗してもこの施設だけの失敗にする）
+            if on_checked:
+                on_checked(facility, result)
             
             # ステータス更新
-            if status in ['active', 'dormant']:
+            if status in ['active', 'dormant'] and not unchanged:
                 update_facility_status(
-                    facility_id,
+                    facility.get('id'),
                     status,
                     result.get('latest_date'),
                     result.get('reason')
                 )
-            
-            # 結果表示
-            emoji = "✅" if status == 'active' else "💤" if status == 'dormant' else "❓"
-            print(f"{emoji} {name}: {result.get('reason', status)}")
-            
+                record_source(WORK_KIND, changed=1)
         except Exception as e:
-            print(f"✗ {name}: エラー - {e}")
+            print(f"[{i}/{len(targets)}] ✗ {name}: エラー - {e}")
             stats['error'] += 1
+            record_source(WORK_KIND, errors=1)
+            if queue:
+                queue.fail(facility['id'], str(e))
+            return
+        
+        if queue:
+            summary = {k: result.get(k) for k in ('status', 'latest_date', 'reason', 'fetch_tier')}
+            if is_fetch_failure(result):
+                queue.fail(facility['id'], result.get('reason') or result.get('error') or 'fetch failed', summary)
+            else:
+                queue.complete(facility['id'], summary)
         
-        # レート制限
-        await asyncio.sleep(1.5)
+        # 結果表示
+        emoji = "✅" if status == 'active' else "💤" if status == 'dormant' else "❓"
+        note = "（ページ変更なし）" if result.get('page_changed') is False else ""
+        print(f"[{i}/{len(targets)}] {emoji} {name}: {result.get('reason', status)}{note}")
+    
+    # 全施設を並行チェック（同一ホストはアクセス間隔を空ける）
+    try:
+        if processes > 1:
+            # 各ワーカーが自分のブラウザプールでチェックし、結果の反映はこのプロセスのみ
+            counter = itertools.count(1)
+            await asyncio.to_thread(
+                run_sharded, targets, lambda facility, result: report(next(counter), facility, result),
+                processes, shard_by,
+                work_run_id=queue.run_id if queue else None, work_kind=WORK_KIND,
+                work_worker_id=queue.worker_id if queue else None
+            )
+        else:
+            runner = ConcurrentRunner()
+            claim = (lambda facility: queue.claim(facility['id'])) if queue else None
+            await checker.check_all_facilities(targets, runner=runner, on_result=report, claim=claim)
+    finally:
+        if queue:
+            # 中断時は処理中の施設を未処理に戻す（次回の再開で処理される）
+            queue.release()
+            queue.finish_if_complete()
     
     # サマリー表示
     print(f"\n{'='*60}")
@@ -92,14 +173,55 @@ async def run_activity_check():
     print(f"  💤 休眠: {stats['dormant']} 施設")
     print(f"  ❓ 不明: {stats['unknown']} 施設")
     print(f"  ✗ エラー: {stats['error']} 施設")
+    print(f"  ♻ 変更なし（更新省略）: {stats['unchanged']} 施設")
+    print(f"  📦 総転送量: {transferred['bytes'] / 1024 / 1024:.1f}MB")
+    if queue:
+        progress = queue.summary()
+        print(f"  🗂 実行#{queue.run_id}: 完了 {progress['done']} / 失敗 {progress['failed']} / 未処理 {progress['pending']}")
     print(f"{'='*60}\n")
     
     return stats
 
 
+def _prepare_work_queue(facilities: list, fresh: bool, retry_failed: bool) -> tuple:
+    """
+    作業キューを用意し、処理待ちの施設だけを返す
+    
+    Returns:
+        (処理対象の施設リスト, 作業キュー)
+    """
+    keys = [f['id'] for f in facilities if f.get('website')]
+    if retry_failed and (latest := WorkQueue.latest(WORK_KIND, include_finished=True)):
+        queue = latest
+        print(f"🔁 実行#{queue.run_id} の失敗施設を再試行: {queue.reset_failed()} 施設")
+    else:
+        queue, resumed = WorkQueue.resume_or_create(WORK_KIND, keys, fresh=fresh)
+        if resumed:
+            progress = queue.summary()
+            print(f"⏯ 実行#{queue.run_id} を再開（完了済み {progress['done']} 施設をスキップ）")
+    
+    pending = set(queue.claimable_keys())
+    if not pending:
+        queue.finish_if_complete()
+    return [f for f in facilities if f['id'] in pending], queue
+
+
 def main():
     """メイン実行"""
-    asyncio.run(run_activity_check())
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='全施設の活動状況チェック')
+    parser.add_argument('--fresh', action='store_true', help='未完了の実行を再開せず新しく開始')
+    parser.add_argument('--retry-failed', action='store_true', help='直近の実行で失敗した施設だけ再試行')
+    parser.add_argument('-p', '--processes', type=int, default=1, help='ワーカープロセス数 (0でCPUコア数、デフォルト: 1)')
+    parser.add_argument('--shard-by', choices=[STRATEGY_HASH, STRATEGY_REGION], default=STRATEGY_HASH,
+                        help='プロセスへの分割方法 (デフォルト: hash)')
+    args = parser.parse_args()
+    
+    processes = args.processes if args.processes > 0 else (os.cpu_count() or 1)
+    asyncio.run(run_activity_check(
+        fresh=args.fresh, retry_failed=args.retry_failed, processes=processes, shard_by=args.shard_by
+    ))
 
 
 if __name__ == "__main__":
@@ -2,6 +2,13 @@
 """
 施設の活動状況を調査し、JSON形式でイベントデータを出力するスクリプト
 GitHub PagesやAPIエンドポイントとして利用可能
+
+施設ごとの調査結果は作業キュー（core.work_queue）に保存されるため、
+中断しても再実行すれば未調査・失敗した施設だけを調査して出力を作り直す。
+見つかったイベントは施設ごとに events テーブルへも保存する（source="site_crawl"）。
+
+--ndjson を指定すると施設の調査が終わるたびにNDJSONへ追記し、--shards を指定すると
+実行完了後に都道府県×開催月のgzip済みファイルとマニフェストを書き出す（core.event_export）。
 """
 
 import asyncio
@@ -13,12 +20,31 @@ from pathlib import Path
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from config import WORK_RESUME_MAX_AGE_HOURS
 from core.advanced_activity_checker import AdvancedActivityChecker
 from core.database import get_all_facilities, init_database
+from core.recheck_scheduler import is_fetch_failure
+from core.site_events import persist_site_events, SOURCE_SITE_CRAWL
+from core.event_export import NdjsonWriter, export_shards
+from core.job_lease import exclusive
+from core.metrics import track_run, record_source
+from core.work_queue import WorkQueue, STATE_DONE, STATE_FAILED
+
+WORK_KIND = "event_json"
 
 
-async def generate_event_data(output_file: str = None, limit: int = 10):
-    """施設のイベントデータをJSON形式で生成"""
+@exclusive("event_json")
+@track_run("event_json")
+async def generate_event_data(output_file: str = None, limit: int = 10, fresh: bool = False,
+                              save_to_db: bool = True, ndjson_file: str = None, shard_dir: str = None):
+    """
+    施設のイベントデータをJSON形式で生成（未完了の実行があれば再開、イベントはDBにも保存）
+    
+    Args:
+        output_file: 1ファイルのJSON出力先（省略時かつストリーミング出力もなければ標準出力）
+        ndjson_file: 施設ごとに追記するNDJSONの出力先
+        shard_dir: 都道府県×開催月の分割gzipファイルとマニフェストの出力先
+    """
     
     print(f"""
 ╔════════════════════════════════════════════════════════════╗
@@ -36,31 +62,94 @@ async def generate_event_data(output_file: str = None, limit: int = 10):
     if limit:
         facilities = facilities[:limit]
     
-    print(f"📊 調査対象: {len(facilities)} 施設\n")
+    # 作業キュー（同じ件数上限で WORK_RESUME_MAX_AGE_HOURS 以内の未完了実行があれば再開）
+    queue = WorkQueue.latest(WORK_KIND, max_age_hours=WORK_RESUME_MAX_AGE_HOURS) if not fresh else None
+    resumed = queue is not None and queue.params.get('limit') == limit
+    if resumed:
+        print(f"⏯ 実行#{queue.run_id} を再開（完了済み {queue.summary()['done']} 施設をスキップ）")
+    else:
+        queue = WorkQueue.create(WORK_KIND, [f['id'] for f in facilities], {'limit': limit})
+    
+    # ストリーミング出力（再開時は前回の続きに追記）
+    if shard_dir and not ndjson_file:
+        ndjson_file = str(Path(shard_dir) / "records.ndjson")
+    writer = NdjsonWriter(ndjson_file, append=resumed) if ndjson_file else None
+    pending = set(queue.claimable_keys())
+    targets = [f for f in facilities if f['id'] in pending]
+    
+    print(f"📊 調査対象: {len(targets)} / {len(facilities)} 施設\n")
+    
+    saved = {"written": 0, "duplicates": 0}
+    
+    def collect(i: int, facility: dict, result: dict):
+        """施設ごとの結果を作業キューに保存し、イベントをDBへ書き込む"""
+        if result.get('status') == 'skipped':
+            return
+        result['prefecture'] = facility.get('prefecture', '')
+        if is_fetch_failure(result):
+            queue.fail(facility['id'], result.get('error') or 'fetch failed', result)
+            record_source(SOURCE_SITE_CRAWL, errors=1)
+            return
+        record_source(SOURCE_SITE_CRAWL, fetched=len(result.get('event_list', [])))
+        if save_to_db and result.get('event_list'):
+            try:
+                counts = persist_site_events(facility['id'], result['event_list'], result.get('last_event_date'))
+                saved["written"] += counts["written"]
+                saved["duplicates"] += counts["duplicates"]
+                record_source(SOURCE_SITE_CRAWL, inserted=counts["written"])
+            except Exception as e:
+                print(f"  ⚠ イベントの保存に失敗: {facility.get('name', '')} ({e})")
+                record_source(SOURCE_SITE_CRAWL, errors=1)
+        # 先にNDJSONへ書く（完了の記録後に中断すると再開時に飛ばされ、出力から漏れるため。
+        # 書いた後に中断した分は再開時に書き直され、export_shards が最後のものだけを使う）
+        if writer is not None:
+            writer.write_facility(facility, result)
+        queue.complete(facility['id'], result)
     
+    by_id = {f['id']: f for f in facilities}
+    
+    # 全施設を並行調査（同一ホストはアクセス間隔を空ける）
+    try:
+        await checker.check_multiple_facilities(
+            targets, on_result=collect, claim=lambda facility: queue.claim(facility['id'])
+        )
+    finally:
+        queue.release()
+        finished = queue.finish_if_complete()
+        if writer is not None:
+            # 再試行の上限に達した失敗は実行の完了時に1度だけ書く
+            if finished:
+                for facility_id, result in queue.results((STATE_FAILED,)):
+                    if result:
+                        writer.write_facility(by_id.get(facility_id, {'id': facility_id}), result)
+            writer.close()
+            print(f"\n📝 NDJSON: {ndjson_file}（今回 {writer.count} レコード）")
+    
+    if shard_dir:
+        # 再試行待ちの施設は次回の実行で完了した時点で追加される
+        manifest = export_shards(ndjson_file, shard_dir)
+        print(f"🗂 分割出力: {shard_dir}（{len(manifest['shards'])} ファイル、イベント {manifest['summary']['total_events']} 件）")
+    
+    # ストリーミング出力のみの場合は全件をメモリに集めない
+    if (ndjson_file or shard_dir) and not output_file:
+        print(f"💾 DB保存: {saved['written']} 件（プラットフォームと重複 {saved['duplicates']} 件）")
+        return None
+    
+    # 今回と過去の実行分を合わせて出力を組み立てる
     all_results = []
     all_events = []
-    
-    for facility in facilities:
-        url = facility.get('website')
-        if not url:
+    for facility_id, result in queue.results((STATE_DONE, STATE_FAILED)):
+        if not result:
             continue
-        
-        result = await checker.check_facility(url, facility.get('name', ''))
-        result['facility_id'] = facility.get('id', '')
-        result['prefecture'] = facility.get('prefecture', '')
-        
+        facility = by_id.get(facility_id, {})
         all_results.append(result)
         
         # イベントを統合リストに追加
         for event in result.get('event_list', []):
             event['facility_name'] = facility.get('name', '')
-            event['facility_id'] = facility.get('id', '')
+            event['facility_id'] = facility_id
             event['prefecture'] = facility.get('prefecture', '')
             all_events.append(event)
-        
-        # レート制限
-        await asyncio.sleep(2)
     
     # 統計サマリー
     active_count = sum(1 for r in all_results if r.get('status') == 'active')
@@ -96,6 +185,7 @@ async def generate_event_data(output_file: str = None, limit: int = 10):
   ✅ アクティブ: {active_count} 施設
   💤 休眠: {dormant_count} 施設
   📅 イベント総数: {len(all_events)} 件
+  💾 DB保存: {saved['written']} 件（プラットフォームと重複 {saved['duplicates']} 件）
 {'='*60}
     """)
     
@@ -108,10 +198,15 @@ def main():
     parser = argparse.ArgumentParser(description='施設イベントデータ生成')
     parser.add_argument('-o', '--output', help='出力ファイルパス (例: data/events.json)')
     parser.add_argument('-n', '--limit', type=int, default=10, help='調査施設数の上限 (デフォルト: 10)')
+    parser.add_argument('--fresh', action='store_true', help='未完了の実行を再開せず新しく開始')
+    parser.add_argument('--no-db', action='store_true', help='イベントをDBに保存しない（JSON出力のみ）')
+    parser.add_argument('--ndjson', help='施設ごとに追記するNDJSONの出力先 (例: data/events.ndjson)')
+    parser.add_argument('--shards', help='都道府県×月の分割gzip出力先ディレクトリ (例: public/events)')
     
     args = parser.parse_args()
     
-    asyncio.run(generate_event_data(args.output, args.limit))
+    asyncio.run(generate_event_data(args.output, args.limit, args.fresh, save_to_db=not args.no_db,
+                                    ndjson_file=args.ndjson, shard_dir=args.shards))
 
 
 if __name__ == "__main__":
@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
 """
-3日間隔で活動チェックを自動実行するスケジューラー
+活動チェックを自動実行するスケジューラー
 バックグラウンドで常駐実行する場合に使用
+
+RECHECK_TICK_MINUTES ごとに次回チェック時刻が来た施設だけをチェックする。
+施設ごとの間隔は core.recheck_scheduler が休眠判定までの残り日数・更新頻度・失敗回数から決める。
+施設チェック以外の定期ジョブ（イベント収集・休眠チェック）も同じスケジューラー（core.async_scheduler）で実行する。
 """
 
-import schedule
-import time
 import asyncio
 from datetime import datetime
 import sys
@@ -13,40 +15,53 @@ import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from config import RECHECK_BATCH_LIMIT, METRICS_PORT
+from core.database import init_database
+from core.recheck_scheduler import RecheckQueue
+from core.async_scheduler import run_scheduler
+from core.metrics import start_metrics_server
 from scripts.check_all_facilities import run_activity_check
 
 
-def job():
-    """定期ジョブ"""
-    print(f"\n🔔 定期チェック開始: {datetime.now()}")
-    asyncio.run(run_activity_check())
-    print(f"✅ 定期チェック完了: {datetime.now()}")
+async def run_recheck_sweep():
+    """定期ジョブ（期限が来た施設だけチェック）"""
+    init_database()
+    queue = RecheckQueue.load()
+    due = queue.pop_due(limit=RECHECK_BATCH_LIMIT)
+    if not due:
+        print(f"💤 {datetime.now():%H:%M} チェック期限の施設なし（次回: {queue.next_due_at()}）")
+        return
+    
+    print(f"\n🔔 定期チェック開始: {datetime.now()}（{len(due)}/{len(due) + len(queue)} 施設）")
+    await run_activity_check(due, on_checked=queue.reschedule)
+    print(f"✅ 定期チェック完了: {datetime.now()}（次回: {queue.next_due_at()}）")
 
 
 def main():
     """メイン実行"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="活動チェック スケジューラー")
+    parser.add_argument("--now", action="store_true", help="期限の来た施設を今すぐ1回だけチェックして終了")
+    parser.add_argument("--jobs", nargs="+", help="実行するジョブ名（省略時は config.SCHEDULER_JOBS の全ジョブ）")
+    args = parser.parse_args()
+    
+    if args.now:
+        asyncio.run(run_recheck_sweep())
+        return
+    
     print("""
 ╔════════════════════════════════════════════════════════════╗
 ║       スタートアップ施設 活動チェック スケジューラー            ║
-║                  3日間隔で自動実行                          ║
+║          施設ごとの適応的な間隔で自動実行                    ║
 ╚════════════════════════════════════════════════════════════╝
     """)
-    
-    # 3日ごとに実行（毎日6:00にチェックし、3日経過していれば実行）
-    schedule.every(3).days.at("06:00").do(job)
-    
-    print(f"📅 次回実行予定: {schedule.next_run()}")
     print("💡 停止するには Ctrl+C を押してください\n")
     
-    # 初回は即座に実行するかどうか
-    run_now = input("今すぐ実行しますか？ (y/N): ").strip().lower()
-    if run_now == 'y':
-        job()
-    
-    # スケジューラーループ
-    while True:
-        schedule.run_pending()
-        time.sleep(60)  # 1分ごとにチェック
+    init_database()
+    if METRICS_PORT:
+        start_metrics_server()
+    run_scheduler(args.jobs)
 
 
 if __name__ == "__main__":